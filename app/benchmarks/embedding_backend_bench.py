@@ -0,0 +1,85 @@
+"""임베딩 백엔드 벤치마크: PyTorch vs ONNX Runtime(int8) vs 다국어 소형 모델
+
+백엔드마다 처리량(문장/초, 배치 인코딩), 단일 문장 인코딩 p50/p99 지연 시간을 재고,
+기준 백엔드(기본 torch)로 찾은 top-k와 얼마나 같은 대화를 찾는지(retrieval agreement)를 비교한다.
+임베딩 캐시를 거치지 않고 embedder.encode를 직접 호출한다.
+
+    cd app && EMBEDDING_THREADS=4 python -m benchmarks.embedding_backend_bench --backends torch onnx multilingual
+"""
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from benchmarks.korean_corpus import make_corpus
+from db.embedders import get_embedder
+
+
+def encode_all(embedder, texts, batch_size):
+    vectors = np.vstack([embedder.encode(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)])
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def top_k(vectors, query_vectors, k):
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    return index.search(query_vectors, k)[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "multilingual"])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    messages, questions = make_corpus(args.messages, args.queries, args.seed)
+    report = {"config": vars(args), "results": []}
+    reference = None  # ✅ 첫 번째 백엔드의 검색 결과를 기준으로 비교
+
+    for backend in args.backends:
+        started = time.perf_counter()
+        embedder = get_embedder(backend)
+        load_seconds = time.perf_counter() - started
+        embedder.encode(questions[:8])  # ✅ 워밍업
+
+        started = time.perf_counter()
+        vectors = encode_all(embedder, messages, args.batch_size)
+        batch_seconds = time.perf_counter() - started
+
+        latencies = []
+        query_vectors = np.empty((len(questions), embedder.dimension), dtype=np.float32)
+        for i, question in enumerate(questions):
+            started = time.perf_counter()
+            query_vectors[i] = embedder.encode([question])[0]
+            latencies.append(time.perf_counter() - started)
+        faiss.normalize_L2(query_vectors)
+
+        found = top_k(vectors, query_vectors, args.k)
+        if reference is None:
+            reference = found
+        agreement = np.mean([len(set(found[i]) & set(reference[i])) / args.k for i in range(len(found))])
+
+        report["results"].append({
+            "backend": backend,
+            "model": embedder.name,
+            "dimension": embedder.dimension,
+            "load_seconds": load_seconds,
+            "sentences_per_second": len(messages) / batch_seconds,
+            "single_p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "single_p99_ms": float(np.percentile(latencies, 99) * 1000),
+            f"agreement@{args.k}": float(agreement),
+            "top1_agreement": float(np.mean(found[:, 0] == reference[:, 0]))
+        })
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""이벤트 루프 지연 벤치마크: 벡터 작업을 루프 안에서 실행(inline) vs 전용 풀에서 실행(executor)
+
+동시에 여러 요청이 "질의 임베딩 + FAISS 검색"을 수행하는 동안, 10ms마다 깨어나는 탐침 코루틴이
+예정보다 얼마나 늦게 깨어나는지(이벤트 루프 지연)를 측정한다. inline 모드는 기존 send_message처럼
+async 함수 안에서 동기 호출을 하고, executor 모드는 vector_executor.run_async로 넘긴다.
+
+    cd app && VECTOR_EXECUTOR_WORKERS=4 python -m benchmarks.event_loop_lag_bench --requests 200 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import faiss
+import numpy as np
+
+from benchmarks.korean_corpus import make_corpus
+from db.faiss_db import dimension, encode_texts
+from db.vector_executor import vector_executor
+
+PROBE_INTERVAL = 0.01
+
+
+def handle_query(index, query, k):
+    """한 요청의 CPU 작업: 질의 임베딩 + 검색"""
+    vector = encode_texts([query])
+    faiss.normalize_L2(vector)
+    return index.search(vector, k)
+
+
+async def probe(lags, stop):
+    """PROBE_INTERVAL마다 깨어나 예정 시각 대비 지연을 기록"""
+    while not stop.is_set():
+        expected = time.perf_counter() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run_mode(mode, index, queries, concurrency, k):
+    lags, latencies = [], []
+    stop = asyncio.Event()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(query):
+        async with semaphore:
+            started = time.perf_counter()
+            if mode == "inline":
+                handle_query(index, query, k)
+            else:
+                await vector_executor.run_async(handle_query, index, query, k)
+            latencies.append(time.perf_counter() - started)
+
+    probe_task = asyncio.create_task(probe(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(request(query) for query in queries))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+
+    return {
+        "requests_per_second": len(queries) / elapsed,
+        "request_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "request_p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "loop_lag_p50_ms": float(np.percentile(lags, 50) * 1000) if lags else None,
+        "loop_lag_p99_ms": float(np.percentile(lags, 99) * 1000) if lags else None,
+        "loop_lag_max_ms": float(max(lags) * 1000) if lags else None,
+        "probe_samples": len(lags)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100000, help="검색 대상 인덱스 크기 (CPU 부하 조절)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = rng.standard_normal((args.vectors, dimension)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    index = faiss.IndexFlatL2(dimension)
+    index.add(vectors)
+
+    # ✅ 질의마다 다른 문장을 써서 임베딩 캐시 적중으로 작업이 사라지지 않게 함
+    _, questions = make_corpus(0, args.requests * 2, args.seed)
+    random.Random(args.seed).shuffle(questions)
+    questions = [f"{question} #{i}" for i, question in enumerate(questions)]
+
+    report = {"config": vars(args), "workers": vector_executor.max_workers}
+    for i, mode in enumerate(("inline", "executor")):
+        queries = questions[i * args.requests:(i + 1) * args.requests]
+        report[mode] = asyncio.run(run_mode(mode, index, queries, args.concurrency, args.k))
+    report["vector_executor"] = vector_executor.get_stats()
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""FAISS 저장 방식 벤치마크: 채팅방별 파일(per_chat) vs 샤드 통합 인덱스(sharded)
+
+임의의 정규화 벡터로 채팅방 N개를 만든 뒤 디스크 파일 수/크기와
+채팅방 한 곳을 검색할 때의 p50/p99 지연 시간(콜드: 디스크에서 읽기, 핫: 메모리)을 비교한다.
+임베딩 모델 대신 임의 벡터를 쓰고, Firestore에는 접근하지 않는다.
+
+    cd app && python -m benchmarks.faiss_backend_bench --chats 2000 --messages 50 --factory HNSW32
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+from db.doc_sidecar import DocSidecar
+from db.faiss_shards import ShardedVectorStore
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000) if samples else 0.0
+
+
+def disk_usage(root):
+    files = [os.path.join(dirpath, name) for dirpath, _, names in os.walk(root) for name in names]
+    return {"files": len(files), "bytes": sum(os.path.getsize(path) for path in files)}
+
+
+def make_chat(rng, dimension, count):
+    vectors = rng.standard_normal((count, dimension)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    docs = [(f"msg{i}", f"테스트 메시지 {i}번입니다") for i in range(count)]
+    return vectors, docs
+
+
+def bench_per_chat(root, chats, queries, k):
+    """기존 방식: 채팅방마다 IndexFlatL2(.bin) + 문서 사이드카"""
+    started = time.perf_counter()
+    for chat_id, (vectors, docs) in chats.items():
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(vectors)
+        faiss.write_index(index, os.path.join(root, f"faiss_index_{chat_id}.bin"))
+        DocSidecar.write(os.path.join(root, f"faiss_index_{chat_id}.docs"), os.path.join(root, f"faiss_index_{chat_id}.offsets"), docs)
+    build_seconds = time.perf_counter() - started
+
+    cold, hot, loaded = [], [], {}
+    for chat_id, query in queries:
+        started = time.perf_counter()
+        if chat_id not in loaded:
+            loaded[chat_id] = faiss.read_index(os.path.join(root, f"faiss_index_{chat_id}.bin"))
+            samples = cold
+        else:
+            samples = hot
+        loaded[chat_id].search(query, k)
+        samples.append(time.perf_counter() - started)
+
+    return build_seconds, cold, hot
+
+
+def bench_sharded(root, chats, queries, k, dimension, shards, factory):
+    """샤드 방식: ShardedVectorStore (채팅방 ID 구간 필터 검색)"""
+    started = time.perf_counter()
+    store = ShardedVectorStore(root, dimension, shards, factory)
+    for chat_id, (vectors, docs) in chats.items():
+        store.add(chat_id, vectors, docs)
+    for shard_no in list(store.shards):
+        store.merge(shard_no)
+    build_seconds = time.perf_counter() - started
+
+    store = ShardedVectorStore(root, dimension, shards, factory)  # ✅ 재시작 후 상태에서 측정
+    cold, hot = [], []
+    for chat_id, query in queries:
+        shard_no = store._chat(chat_id)["shard"]
+        samples = hot if shard_no in store.shards else cold
+        started = time.perf_counter()
+        store.search(chat_id, query, k)
+        samples.append(time.perf_counter() - started)
+
+    return build_seconds, cold, hot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--factory", default="Flat")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    chats = {f"user{i}-char{i % 7}": make_chat(rng, args.dimension, args.messages) for i in range(args.chats)}
+
+    # ✅ 최근 채팅방에 질의가 몰리는 분포 (앞쪽 채팅방일수록 자주 검색)
+    random.seed(args.seed)
+    chat_ids = list(chats)
+    queries = []
+    for _ in range(args.queries):
+        chat_id = chat_ids[min(int(random.expovariate(10 / len(chat_ids))), len(chat_ids) - 1)]
+        query = chats[chat_id][0][random.randrange(args.messages)][None, :].copy()
+        queries.append((chat_id, query))
+
+    report = {"config": vars(args)}
+    with tempfile.TemporaryDirectory() as per_chat_root, tempfile.TemporaryDirectory() as sharded_root:
+        for name, root, run in (
+            ("per_chat", per_chat_root, lambda: bench_per_chat(per_chat_root, chats, queries, args.k)),
+            ("sharded", sharded_root, lambda: bench_sharded(sharded_root, chats, queries, args.k, args.dimension, args.shards, args.factory)),
+        ):
+            build_seconds, cold, hot = run()
+            report[name] = {
+                "build_seconds": build_seconds,
+                "cold_queries": len(cold),
+                "cold_p50_ms": percentile_ms(cold, 50),
+                "cold_p99_ms": percentile_ms(cold, 99),
+                "hot_p50_ms": percentile_ms(hot, 50),
+                "hot_p99_ms": percentile_ms(hot, 99),
+                **disk_usage(root)
+            }
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
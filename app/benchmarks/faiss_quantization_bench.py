@@ -0,0 +1,80 @@
+"""FAISS 양자화 벤치마크: recall@k vs 메모리
+
+합성 한국어 대화 말뭉치를 실제 임베딩 파이프라인(encode_texts)으로 벡터화한 뒤,
+FAISS_INDEX_FACTORY 후보마다 Flat(정확 검색) 대비 recall@k, 벡터당 바이트, 압축률,
+학습 시간과 질의 지연 시간을 비교한다.
+
+    cd app && python -m benchmarks.faiss_quantization_bench --messages 10000 --k 5
+"""
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from benchmarks.korean_corpus import make_corpus
+from db.faiss_db import encode_texts, quantize_faiss_index
+
+DEFAULT_FACTORIES = ["Flat", "SQfp16", "SQ8", "PCA384,SQfp16", "PCA384,SQ8", "PQ96", "PQ48"]
+
+
+def embed(texts, batch_size=256):
+    vectors = np.vstack([encode_texts(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)])
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=10000)  # ✅ PQ 학습에는 256 × 39개 이상의 벡터가 필요
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--factories", nargs="+", default=DEFAULT_FACTORIES, help="예: --factories Flat SQ8 PCA384,SQ8")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    messages, questions = make_corpus(args.messages, args.queries, args.seed)
+    started = time.perf_counter()
+    vectors, query_vectors = embed(messages), embed(questions)
+    embed_seconds = time.perf_counter() - started
+
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+    _, truth = flat.search(query_vectors, args.k)
+    flat_bytes = len(faiss.serialize_index(flat))
+
+    report = {"config": vars(args), "embed_seconds": embed_seconds, "results": []}
+    for factory in args.factories:
+        started = time.perf_counter()
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(vectors)
+        index = quantize_faiss_index(index, factory)
+        train_seconds = time.perf_counter() - started
+
+        latencies = []
+        found = np.empty_like(truth)
+        for i, query in enumerate(query_vectors):
+            started = time.perf_counter()
+            found[i] = index.search(query[None, :], args.k)[1][0]
+            latencies.append(time.perf_counter() - started)
+
+        recall = np.mean([len(set(found[i]) & set(truth[i])) / args.k for i in range(len(truth))])
+        index_bytes = len(faiss.serialize_index(index))
+        report["results"].append({
+            "factory": factory,
+            f"recall@{args.k}": float(recall),
+            "top1_agreement": float(np.mean(found[:, 0] == truth[:, 0])),
+            "bytes": index_bytes,
+            "bytes_per_vector": index_bytes / len(vectors),
+            "compression": flat_bytes / index_bytes,
+            "train_seconds": train_seconds,
+            "query_p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "query_p99_ms": float(np.percentile(latencies, 99) * 1000)
+        })
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
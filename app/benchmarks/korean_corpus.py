@@ -0,0 +1,62 @@
+"""벤치마크용 합성 한국어 대화 말뭉치"""
+import random
+
+SUBJECTS = ["나는", "내 친구는", "우리 엄마는", "동생이", "회사 동료가", "우리 강아지는"]
+TOPICS = {
+    "취미": ["자전거 타기", "그림 그리기", "등산", "요리", "독서", "피아노 연주", "사진 찍기", "보드게임"],
+    "음식": ["떡볶이", "김치찌개", "초밥", "파스타", "삼겹살", "비빔밥", "치킨", "냉면"],
+    "장소": ["서울", "부산", "제주도", "강릉", "대전", "전주", "한강 공원", "동네 카페"],
+    "감정": ["행복했어", "조금 우울했어", "너무 피곤했어", "설렜어", "화가 났어", "심심했어"]
+}
+TEMPLATES = [
+    "{subject} 요즘 {취미}에 푹 빠졌어",
+    "오늘 점심으로 {음식} 먹었는데 정말 맛있었어",
+    "주말에 {장소}에 다녀왔는데 {감정}",
+    "{subject} {음식}을 제일 좋아해",
+    "다음 달에 {장소}로 여행 가려고 해",
+    "어제 {취미} 하다가 {감정}",
+    "{subject} {장소}에 살고 있어",
+    "{음식} 먹으면서 {취미} 얘기를 했어"
+]
+QUERY_TEMPLATES = [
+    "내가 {취미} 얘기한 적 있지?",
+    "{음식} 먹었던 날 기억나?",
+    "{장소} 갔던 얘기 해줘",
+    "내가 {감정}라고 말했던 날 기억해?"
+]
+
+# ✅ 검색 품질 측정용으로 대화 중간에 심어 두는 사실 (사실 문장, 그 사실을 찾는 질문, 채울 값 후보)
+PLANTED_FACTS = [
+    ("우리 집 강아지 이름은 {value}야", "우리 강아지 이름이 뭐였더라?", ["초코", "콩이", "보리", "두부", "망고", "호두"]),
+    ("내 생일은 {value}이야", "내 생일이 언제라고 했지?", ["3월 14일", "7월 2일", "11월 23일", "1월 9일", "9월 30일"]),
+    ("나는 알레르기가 있어서 {value}는 절대 못 먹어", "내가 못 먹는 음식이 뭐였지?", ["복숭아", "새우", "땅콩", "게", "메밀"]),
+    ("다음 주 {value}에 치과 예약이 잡혀 있어", "치과 예약이 무슨 요일이었지?", ["월요일", "화요일", "수요일", "목요일", "금요일"]),
+    ("내 직업은 {value}야", "내가 무슨 일을 한다고 했지?", ["간호사", "초등학교 교사", "소방관", "바리스타", "웹 개발자"]),
+    ("어릴 때는 {value}에서 자랐어", "내가 어릴 때 어디서 자랐다고 했지?", ["목포", "춘천", "안동", "여수", "청주"]),
+    ("제일 좋아하는 색깔은 {value}이야", "내가 좋아하는 색깔 기억나?", ["보라색", "연두색", "하늘색", "주황색", "남색"]),
+    ("요즘 {value}라는 책을 읽고 있어", "내가 읽고 있다는 책 제목이 뭐였지?", ["어린 왕자", "데미안", "채식주의자", "노인과 바다", "연금술사"])
+]
+
+
+def fill(template, rng):
+    values = {key: rng.choice(options) for key, options in TOPICS.items()}
+    return template.format(subject=rng.choice(SUBJECTS), **values)
+
+
+def make_corpus(count, queries, seed):
+    """템플릿 조합 + 순번 꼬리표로 서로 다른 대화 문장과 질의 생성"""
+    rng = random.Random(seed)
+    messages = [f"{fill(rng.choice(TEMPLATES), rng)} ({i}번째 대화)" for i in range(count)]
+    questions = [fill(rng.choice(QUERY_TEMPLATES), rng) for _ in range(queries)]
+    return messages, questions
+
+
+def make_chat_with_facts(count, seed):
+    """대화 count개 중간중간에 PLANTED_FACTS를 하나씩 심은 채팅 기록과 (질문, 정답 문장) 목록 생성"""
+    rng = random.Random(seed)
+    facts = [(template.format(value=rng.choice(values)), question) for template, question, values in PLANTED_FACTS[:count]]
+    messages, _ = make_corpus(count - len(facts), 0, seed)
+
+    for position, (fact, _) in zip(sorted(rng.sample(range(count), len(facts))), facts):
+        messages.insert(position, fact)
+    return messages, [(question, fact) for fact, question in facts]
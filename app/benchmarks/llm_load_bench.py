@@ -0,0 +1,76 @@
+"""LLM 호출 부하 벤치마크: 공유 비동기 클라이언트로 동시 요청을 보내 처리량과 지연 시간을 측정
+
+네트워크 없이 돌리려면 가짜 제공자를 쓴다. 가짜 제공자는 프롬프트마다 같은 답을 내고
+LLM_FAKE_LATENCY_MS / LLM_FAKE_TOKEN_MS만큼 기다리므로, 이벤트 루프 하나가 동시에 몇 개의
+호출을 기다릴 수 있는지(스레드를 잡아 두지 않는지)와 첫 토큰까지의 시간을 확인할 수 있다.
+
+    cd app && LLM_PROVIDER=fake python -m benchmarks.llm_load_bench --requests 500 --concurrency 100
+    cd app && LLM_PROVIDER=fake python -m benchmarks.llm_load_bench --stream --requests 500 --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from services.llm_client import get_llm_client
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * q), len(samples) - 1)] if samples else 0.0
+
+
+async def one_request(client, prompt, stream, latencies, first_tokens):
+    started = time.perf_counter()
+    if stream:
+        first = None
+        async for _ in client.stream(prompt):
+            if first is None:
+                first = time.perf_counter() - started
+        first_tokens.append(first or 0.0)
+    else:
+        await client.generate(prompt)
+    latencies.append(time.perf_counter() - started)
+
+
+async def run(requests, concurrency, stream):
+    client = get_llm_client()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, first_tokens = [], []
+
+    async def limited(i):
+        async with semaphore:
+            await one_request(client, f"사용자 {i}: 오늘 뭐 했어?", stream, latencies, first_tokens)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "mode": "stream" if stream else "generate",
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "p50_latency_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p95_latency_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "llm": client.get_stats()
+    }
+    if stream:
+        result["p50_ttft_ms"] = round(percentile(first_tokens, 0.5) * 1000, 1)
+        result["p95_ttft_ms"] = round(percentile(first_tokens, 0.95) * 1000, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--stream", action="store_true", help="generate 대신 stream으로 호출하고 TTFT도 측정")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args.requests, args.concurrency, args.stream)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
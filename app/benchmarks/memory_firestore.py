@@ -0,0 +1,164 @@
+"""벤치마크용 메모리 Firestore
+
+faiss_db / chat_profiles가 쓰는 만큼만 구현한 Firestore 대역이다
+(collection/document 경로, get/set/update/delete, add, order_by/start_at/limit/where("==")/stream).
+install_memory_firestore()를 db.faiss_db보다 먼저 호출하면 core.firebase.db가 이 저장소를 쓴다.
+"""
+import copy
+import itertools
+from datetime import datetime, timezone
+
+import firebase_admin
+from firebase_admin import firestore
+
+
+class MemorySnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None  # ✅ 실제 Firestore처럼 중첩 map도 복사본
+
+
+def merge_fields(target, data):
+    """set(merge=True)처럼 중첩된 map은 필드 단위로 병합"""
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            target[key] = dict(target[key])
+            merge_fields(target[key], value)
+        else:
+            target[key] = value
+
+
+class MemoryDocument:
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def get(self):
+        self.store.reads += 1
+        return MemorySnapshot(self, self.store.docs.get(self.path))
+
+    def set(self, data, merge=False):
+        self.store.writes += 1
+        data = self.store.resolve(data)
+        if merge and self.path in self.store.docs:
+            merge_fields(self.store.docs[self.path], data)
+        else:
+            self.store.docs[self.path] = data
+
+    def update(self, data):
+        self.store.writes += 1
+        self.store.docs[self.path].update(self.store.resolve(data))
+
+    def delete(self):
+        self.store.writes += 1
+        self.store.docs.pop(self.path, None)
+
+    def collection(self, name):
+        return MemoryQuery(self.store, f"{self.path}/{name}")
+
+
+class MemoryQuery:
+    def __init__(self, store, path, orders=(), start=None, count=None, filters=()):
+        self.store = store
+        self.path = path
+        self.orders = orders
+        self.start = start
+        self.count = count
+        self.filters = filters
+
+    def _copy(self, **changes):
+        state = {"orders": self.orders, "start": self.start, "count": self.count, "filters": self.filters, **changes}
+        return MemoryQuery(self.store, self.path, **state)
+
+    def document(self, doc_id):
+        return MemoryDocument(self.store, f"{self.path}/{doc_id}")
+
+    def add(self, data):
+        reference = self.document(f"auto{next(self.store.ids):09d}")
+        reference.set(data)
+        return self.store.now(), reference
+
+    def order_by(self, field, direction=firestore.Query.ASCENDING):
+        return self._copy(orders=self.orders + ((field, direction),))
+
+    def start_at(self, values):
+        return self._copy(start=values)
+
+    def limit(self, count):
+        return self._copy(count=count)
+
+    def where(self, field, op, value):
+        if op != "==":
+            raise NotImplementedError(f"메모리 Firestore는 '==' 조건만 지원합니다: {op}")
+        return self._copy(filters=self.filters + ((field, value),))
+
+    def stream(self):
+        prefix = self.path + "/"
+        items = [
+            (path, data) for path, data in self.store.docs.items()
+            if path.startswith(prefix) and "/" not in path[len(prefix):]
+        ]
+        for field, value in self.filters:
+            items = [item for item in items if item[1].get(field) == value]
+
+        # ✅ 뒤 정렬 기준부터 안정 정렬 → 앞 기준이 우선
+        for field, direction in reversed(self.orders):
+            items = [item for item in items if field in item[1]]
+            items.sort(key=lambda item: item[1][field], reverse=direction == firestore.Query.DESCENDING)
+
+        if self.start and self.orders:
+            field, direction = self.orders[0]
+            if direction == firestore.Query.DESCENDING:
+                items = [item for item in items if item[1][field] <= self.start[field]]
+            else:
+                items = [item for item in items if item[1][field] >= self.start[field]]
+        if self.count is not None:
+            items = items[:self.count]
+
+        self.store.reads += max(len(items), 1)
+        return iter([MemorySnapshot(MemoryDocument(self.store, path), data) for path, data in items])
+
+    def get(self):
+        return list(self.stream())
+
+
+class MemoryFirestore:
+    """문서 경로 → dict 저장소 (읽기/쓰기 횟수 집계)"""
+
+    def __init__(self):
+        self.docs = {}
+        self.ids = itertools.count()
+        self.reads = 0
+        self.writes = 0
+
+    def now(self):
+        return datetime.now(timezone.utc)
+
+    def resolve(self, data):
+        """SERVER_TIMESTAMP를 현재 시각으로 바꾼 복사본"""
+        return {key: self.now() if value is firestore.SERVER_TIMESTAMP else value for key, value in data.items()}
+
+    def collection(self, path):
+        return MemoryQuery(self, path)
+
+    def get_all(self, references):
+        return [reference.get() for reference in references]
+
+
+def install_memory_firestore():
+    """Firebase 인증 없이 core.firebase.db를 메모리 Firestore로 교체"""
+    if not firebase_admin._apps:
+        # ✅ 인증 키 없이 앱만 등록 (core.firebase가 인증서를 읽지 않도록)
+        firebase_admin.initialize_app(options={"projectId": "retrieval-bench"})
+
+    from core.firebase import db
+
+    store = MemoryFirestore()
+    db.use_client(store)
+    return store
@@ -0,0 +1,173 @@
+"""검색 품질/지연 시간 벤치마크: store_chat_in_faiss + search_similar_messages
+
+채팅 길이(메시지 수)마다 사실 문장을 심어 둔 합성 한국어 대화를 메모리 Firestore에 넣고,
+store_chat_in_faiss로 색인한 뒤 질문을 던져서 다음을 잰다.
+
+- recall@k, MRR: 심어 둔 사실 문장이 검색 결과(search_chat_index, 중복 제거 후) 몇 번째에 있는지
+- answer_rate: search_similar_messages 응답에 사실 문장이 들어 있는 비율
+- 질의 지연 시간 p50/p95/p99 (search_similar_messages 전체, 질문 임베딩은 캐시된 상태, 첫 질의는 따로 기록,
+  검색 결과 캐시는 --query-cache를 줄 때만 사용)
+- 색인 시간, 디스크 사용량
+
+실제 임베딩 백엔드와 FAISS 설정(EMBEDDING_BACKEND, FAISS_BACKEND, FAISS_INDEX_FACTORY 등 환경 변수)을
+그대로 쓰고, 인덱스/임베딩 캐시 파일은 임시 디렉터리에 만든다. 결과는 JSON으로 남겨 커밋끼리 비교한다.
+
+    cd app && python -m benchmarks.retrieval_bench --sizes 100 1000 10000 --output retrieval.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import faiss
+import numpy as np
+
+from benchmarks.korean_corpus import make_chat_with_facts, make_corpus
+from benchmarks.memory_firestore import install_memory_firestore
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000) if samples else 0.0
+
+
+def disk_usage(root):
+    files = [os.path.join(dirpath, name) for dirpath, _, names in os.walk(root) for name in names]
+    return {"files": len(files), "bytes": sum(os.path.getsize(path) for path in files)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def put_messages(store, chat_id, messages):
+    """메시지를 1ms 간격 timestamp로 저장 (실제 채팅처럼 순서가 정해진 기록)"""
+    started = datetime.now(timezone.utc) - timedelta(milliseconds=len(messages))
+    for i, text in enumerate(messages):
+        sender = "user" if i % 2 == 0 else "AI"
+        store.docs[f"chats/{chat_id}/messages/m{i:07d}"] = {
+            "sender": sender, "content": text, "timestamp": started + timedelta(milliseconds=i), "is_response": sender == "AI"
+        }
+    store.docs[f"chats/{chat_id}"] = {"chat_id": chat_id, "last_active_at": started + timedelta(milliseconds=len(messages))}
+
+
+def ranked_texts(faiss_db, chat_id, query, k):
+    """search_similar_messages와 같은 경로로 검색한 상위 k개 문장 (중복 제거)"""
+    query_vector = faiss_db.encode_texts([query])
+    faiss.normalize_L2(query_vector)
+    _, labels, docs = faiss_db.search_chat_index(chat_id, query_vector, k)
+
+    texts = []
+    for label in labels[0]:
+        if label in docs and docs[label] not in texts:
+            texts.append(docs[label])
+    return texts
+
+
+def bench_chat(faiss_db, store, root, size, questions, args):
+    chat_id, charac_id = f"bench{size}-pet", "pet"
+    messages, facts = make_chat_with_facts(size, args.seed + size)
+    put_messages(store, chat_id, messages)
+
+    before = disk_usage(root)
+    started = time.perf_counter()
+    faiss_db.store_chat_in_faiss(chat_id, charac_id)
+    build_seconds = time.perf_counter() - started
+    after = disk_usage(root)
+
+    # ✅ 질문 임베딩은 미리 캐시에 넣어 두고 (채팅 길이끼리 비교할 수 있도록) 검색 경로만 측정
+    queries = [question for question, _ in facts] + questions
+    faiss_db.encode_texts(queries)
+
+    # ✅ 재시작 직후처럼 인덱스 캐시를 비우고 첫 질의(디스크 로드 포함)부터 측정
+    faiss_db.index_cache.pop(chat_id)
+
+    latencies, first_query = [], None
+    for query in queries:
+        started = time.perf_counter()
+        faiss_db.search_similar_messages(chat_id, charac_id, query, top_k=args.k)
+        elapsed = time.perf_counter() - started
+        if first_query is None:
+            first_query = elapsed
+        else:
+            latencies.append(elapsed)
+
+    hits, reciprocal_ranks, answered = 0, [], 0
+    for question, fact in facts:
+        texts = ranked_texts(faiss_db, chat_id, question, args.k)
+        rank = texts.index(fact) + 1 if fact in texts else None
+        hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        answered += any(fact in response for response in faiss_db.search_similar_messages(chat_id, charac_id, question, top_k=args.k))
+
+    return {
+        "messages": size,
+        "facts": len(facts),
+        "queries": len(latencies) + 1,
+        "build_seconds": build_seconds,
+        "recall_at_k": hits / len(facts) if facts else 0.0,
+        "mrr": float(np.mean(reciprocal_ranks)) if reciprocal_ranks else 0.0,
+        "answer_rate": answered / len(facts) if facts else 0.0,
+        "first_query_ms": (first_query or 0.0) * 1000,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+        "disk_files": after["files"] - before["files"],
+        "disk_bytes": after["bytes"] - before["bytes"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="채팅방별 메시지 수 (100 ~ 100000)")
+    parser.add_argument("--queries", type=int, default=200, help="사실 질문 외에 지연 시간 측정용으로 던질 일반 질문 수")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--query-cache", action="store_true", help="검색 결과 캐시 사용 (기본은 끄고 검색 경로만 측정)")
+    parser.add_argument("--output", help="결과 JSON 파일 경로 (없으면 표준 출력)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        # ✅ 인덱스/임베딩 캐시는 임시 디렉터리에 (이전 실행의 캐시가 색인 시간에 섞이지 않도록)
+        os.environ.setdefault("FAISS_SHARD_DIR", os.path.join(root, "faiss_shards"))
+        os.environ["EMBEDDING_CACHE_DIR"] = os.path.join(root, "embedding_cache")
+        store = install_memory_firestore()
+
+        from db import faiss_db
+        faiss_db.FAISS_INDEX_DIR = os.path.join(root, "faiss")
+        if not args.query_cache:
+            faiss_db.query_cache.max_entries = 0
+
+        _, questions = make_corpus(0, args.queries, args.seed)
+        results = [bench_chat(faiss_db, store, root, size, questions, args) for size in args.sizes]
+
+        report = {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "config": {
+                **vars(args),
+                "embedding_model": faiss_db.EMBEDDING_MODEL_NAME,
+                "faiss_backend": faiss_db.FAISS_BACKEND,
+                "faiss_index_factory": faiss_db.FAISS_INDEX_FACTORY,
+                "faiss_mmap": faiss_db.FAISS_MMAP
+            },
+            "firestore": {"reads": store.reads, "writes": store.writes},
+            "query_cache": faiss_db.get_query_cache_stats(),
+            "results": results
+        }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""워커별 메모리 측정: 워커마다 모델 로드(per_worker) vs 마스터에서 preload 후 fork(preload)
+
+각 모드를 새 인터프리터에서 실행해 워커 N개를 fork하고, 워커가 문장을 인코딩한 뒤의
+RSS / PSS / USS(그 워커만 가진 페이지 = Private_Clean + Private_Dirty)를 /proc/<pid>/smaps_rollup에서 읽는다.
+preload 모드는 gunicorn.conf.py와 같이 core.preload.freeze_preloaded()를 부른 뒤 fork한다. (Linux 전용)
+
+    cd app && python -m benchmarks.worker_rss_bench --workers 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+
+def memory_usage(pid="self"):
+    """smaps_rollup에서 RSS/PSS/USS(MB) 읽기"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss_mb": fields.get("Rss", 0) / 1024,
+        "pss_mb": fields.get("Pss", 0) / 1024,
+        "uss_mb": (fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024
+    }
+
+
+def worker(write_fd, texts):
+    """워커 프로세스: (필요하면 모델을 로드하고) 인코딩한 뒤 메모리 사용량 보고"""
+    from db.faiss_db import encode_texts
+
+    encode_texts([f"{text} #{os.getpid()}" for text in texts])  # ✅ 워커마다 다른 문장 (임베딩 캐시를 거치지 않고 실제 인코딩)
+    with os.fdopen(write_fd, "w") as f:
+        json.dump(memory_usage(), f)
+    os._exit(0)
+
+
+def run_mode(mode, workers, texts):
+    """한 모드를 현재 프로세스에서 실행 (fork해서 워커별 측정값 수집)"""
+    if mode == "preload":
+        from core.preload import freeze_preloaded
+
+        freeze_preloaded()
+    master = memory_usage()
+
+    pipes = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        if os.fork() == 0:
+            os.close(read_fd)
+            worker(write_fd, texts)
+        os.close(write_fd)
+        pipes.append(read_fd)
+
+    results = []
+    for read_fd in pipes:
+        with os.fdopen(read_fd) as f:
+            results.append(json.load(f))
+    for _ in range(workers):
+        os.wait()
+
+    return {
+        "master": master,
+        "workers": results,
+        "avg_worker_uss_mb": float(np.mean([r["uss_mb"] for r in results])),
+        "avg_worker_pss_mb": float(np.mean([r["pss_mb"] for r in results])),
+        "total_pss_mb": master["pss_mb"] + sum(r["pss_mb"] for r in results)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--texts", type=int, default=64, help="워커마다 인코딩할 문장 수")
+    parser.add_argument("--mode", choices=["per_worker", "preload"], help="내부용: 한 모드만 실행")
+    args = parser.parse_args()
+
+    from benchmarks.korean_corpus import make_corpus
+
+    texts, _ = make_corpus(args.texts, 0, seed=0)
+    if args.mode:
+        if args.mode == "preload":
+            import db.faiss_db  # noqa: F401 (마스터에서 모델 로드)
+        print(json.dumps(run_mode(args.mode, args.workers, texts)))
+        return
+
+    # ✅ 모드마다 새 인터프리터에서 실행 (앞 모드에서 로드한 모델이 섞이지 않게)
+    report = {"config": vars(args)}
+    for mode in ("per_worker", "preload"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.worker_rss_bench", "--mode", mode, "--workers", str(args.workers), "--texts", str(args.texts)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        report[mode] = json.loads(output.strip().splitlines()[-1])
+
+    report["uss_saved_per_worker_mb"] = report["per_worker"]["avg_worker_uss_mb"] - report["preload"]["avg_worker_uss_mb"]
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.cloud import firestore as google_firestore
 import os
+import threading
 
 # ✅ Firebase 인증 키 경로 설정 (환경 변수 우선, 없으면 기본값 사용)
 FIREBASE_CRED_PATH = os.getenv("FIREBASE_CRED_PATH", os.path.join(os.path.dirname(__file__), "firebase_config.json"))
@@ -13,5 +15,40 @@ if not firebase_admin._apps:
 else:
     print("⚠️ Firebase가 이미 초기화되었습니다.")
 
-# ✅ Firestore 클라이언트 생성
-db = firestore.client()
+
+
+class ForkSafeFirestoreClient:
+    """처음 사용할 때 현재 프로세스 전용 Firestore 클라이언트를 만드는 지연 프록시
+
+    Firestore 클라이언트(gRPC 채널)는 fork 이후 자식 프로세스에서 안전하게 쓸 수 없다.
+    preload 모드에서 마스터가 모듈을 import해도 클라이언트는 워커가 처음 쓸 때 만들어지고,
+    프로세스 ID가 바뀌면(fork) 새로 만든다. 나머지 속성은 실제 클라이언트로 그대로 전달한다.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    app = firebase_admin.get_app()
+                    # ✅ firestore.client()는 앱 단위로 캐시되므로 프로세스마다 직접 생성
+                    self._client = google_firestore.Client(project=app.project_id, credentials=app.credential.get_credential())
+                    self._pid = os.getpid()
+        return self._client
+
+    def use_client(self, client):
+        """현재 프로세스에서 쓸 클라이언트를 직접 지정 (벤치마크용 메모리 Firestore 등)"""
+        with self._lock:
+            self._client = client
+            self._pid = os.getpid()
+
+    def __getattr__(self, name):
+        return getattr(self._get_client(), name)
+
+
+# ✅ Firestore 클라이언트 (워커 프로세스에서 처음 사용할 때 생성)
+db = ForkSafeFirestoreClient()
@@ -0,0 +1,16 @@
+import gc
+
+# ✅ preload 모드 (gunicorn --preload)
+# 마스터 프로세스가 앱을 import하면서 임베딩 모델과 읽기 전용 데이터를 한 번만 올리고,
+# 워커는 fork로 그 메모리 페이지를 공유한다. Firestore 클라이언트처럼 프로세스마다 따로 가져야 하는
+# 상태는 core.firebase.db처럼 워커에서 처음 사용할 때 만들어진다.
+# 주의: 마스터에서는 인코딩을 실행하지 말 것 (추론 스레드 풀이 fork 이후 자식에서 멈출 수 있음).
+
+
+def freeze_preloaded():
+    """fork 직전에 호출: 모델 가중치를 고정하고 지금까지 만든 객체를 GC 대상에서 제외"""
+    from db.faiss_db import embedder
+
+    embedder.freeze()
+    gc.collect()
+    gc.freeze()  # ✅ 자식의 GC가 공유 객체 헤더에 쓰지 않으므로 copy-on-write 복사가 일어나지 않음
@@ -1,3 +1,5 @@
 from .firestore import get_user, create_user, update_user, delete_user, get_user_pet, get_character
 
-from .faiss_db import get_faiss_index_path, ensure_faiss_directory, save_faiss_index, load_faiss_index, load_existing_faiss_indices, delete_faiss_index, store_chat_in_faiss, get_recent_messages, search_user_hobby, search_similar_messages
\ No newline at end of file
+from .faiss_db import get_faiss_index_path, ensure_faiss_directory, save_faiss_index, load_faiss_index, load_existing_faiss_indices, delete_faiss_index, store_chat_in_faiss, get_recent_messages, search_user_hobby, search_similar_messages, encode_texts, get_embedding_cache_stats, get_embedding_batcher_stats, get_index_cache_stats, get_query_cache_stats, prefetch_recent_faiss_indices, start_faiss_prefetch, get_warmup_status, encode_texts_async, store_chat_in_faiss_async, search_similar_messages_async, search_messages_batch, search_messages_batch_async, get_vector_executor_stats, enqueue_chat_indexing, get_index_queue_stats, get_index_lock_stats, resolve_message_doc, compact_chat_memory, load_memory_summaries
+from .catalog_cache import get_catalog, start_catalog_listeners, get_catalog_cache_stats
+from .doc_cache import get_cached_doc, invalidate_doc, get_doc_cache_stats
\ No newline at end of file
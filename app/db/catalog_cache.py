@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+
+from fastapi.encoders import jsonable_encoder
+from core.firebase import db  # ✅ 프로세스별로 처음 사용할 때 생성 (fork 안전)
+
+# ✅ 기준 데이터 캐시 설정 (환경 변수 우선)
+CATALOG_TTL_SECONDS = float(os.getenv("CATALOG_TTL_SECONDS", "600"))  # ✅ 다시 읽기까지의 시간 (리스너가 없거나 끊긴 컬렉션만)
+CATALOG_LISTENER = os.getenv("CATALOG_LISTENER", "1") == "1"  # ✅ Firestore 스냅샷 리스너로 변경 즉시 반영
+
+# ✅ core/initialize_* 스크립트가 채우는 거의 바뀌지 않는 컬렉션
+CATALOG_COLLECTIONS = ("personality_traits", "animals", "appearance_traits")
+
+
+class Catalog:
+    """컬렉션 하나의 스냅샷: 문서 목록(문서 ID 순), 문서 ID → 문서, 필드 값 → 문서 ID 조회표"""
+
+    def __init__(self, name, docs):
+        self.name = name
+        self.docs = docs  # ✅ [(문서 ID, dict)]
+        self.by_id = dict(docs)
+        self.loaded_at = time.monotonic()
+        self.lookups = {}  # ✅ {필드: {값: 문서 ID}} (필드마다 처음 찾을 때 만듦)
+
+    def get(self, doc_id):
+        """문서 ID로 문서 찾기 (없으면 None)"""
+        return self.by_id.get(doc_id)
+
+    def find_id(self, field, value):
+        """필드 값이 같은 첫 번째 문서 ID (예: animals의 korean "개" → "dog")"""
+        lookup = self.lookups.get(field)
+        if lookup is None:
+            lookup = {}
+            for doc_id, data in self.docs:
+                key = data.get(field)
+                if isinstance(key, (str, int, float, bool)):
+                    lookup.setdefault(key, doc_id)  # ✅ 같은 값이 여러 개면 첫 번째 (Firestore where 조회와 같음)
+            self.lookups[field] = lookup
+        return lookup.get(value)
+
+
+class CatalogCache:
+    """기준 데이터 컬렉션(성격, 동물, 외모)을 프로세스마다 한 번 읽어 두는 캐시
+
+    처음 조회할 때 컬렉션 전체를 읽고, 이후에는 Firestore를 읽지 않는다. 스냅샷 리스너가 살아
+    있으면 변경될 때마다 리스너가 받은 스냅샷으로 바로 교체하고 TTL로는 다시 읽지 않는다.
+    리스너가 없거나 끊긴 컬렉션만 TTL이 지나면 다시 읽는다. 다시 읽다 실패하면 기존 스냅샷을 계속 쓴다. 목록 API 응답은 JSON 바이트로 만들어 두고
+    스냅샷이 바뀔 때만 다시 만든다.
+    """
+
+    def __init__(self, collections=CATALOG_COLLECTIONS, ttl=CATALOG_TTL_SECONDS):
+        self.collections = collections
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.pid = None
+        self.catalogs = {}  # ✅ {컬렉션: Catalog}
+        self.responses = {}  # ✅ {응답 키: (만들 때의 Catalog들, JSON 바이트)}
+        self.watches = {}  # ✅ {컬렉션: 스냅샷 리스너}
+        self.stats = {"hits": 0, "loads": 0, "documents_read": 0, "listener_updates": 0, "listener_errors": 0, "refresh_errors": 0, "serialized": 0}
+
+    def _check_pid(self):
+        if self.pid != os.getpid():
+            # ✅ fork 이전 프로세스의 리스너(스레드)는 자식 프로세스에 없음
+            self.catalogs, self.responses, self.watches = {}, {}, {}
+            self.pid = os.getpid()
+
+    def _watching(self, name):
+        """리스너가 살아 있는지 (lock 안에서 호출, 끊긴 리스너는 빼서 TTL로 갱신하게 함)"""
+        watch = self.watches.get(name)
+        if watch is None:
+            return False
+        if getattr(watch, "is_active", True):
+            return True
+
+        del self.watches[name]
+        self.stats["listener_errors"] += 1
+        print(f"⚠️ {name} 스냅샷 리스너가 끊겼습니다 (TTL로 갱신).")
+        return False
+
+    def _load(self, name):
+        docs = sorted(((doc.id, doc.to_dict()) for doc in db.collection(name).stream()), key=lambda item: item[0])
+        with self.lock:
+            self.stats["loads"] += 1
+            self.stats["documents_read"] += len(docs)
+        return Catalog(name, docs)
+
+    def get(self, name):
+        """컬렉션 스냅샷 (없거나, 리스너 없이 TTL이 지났으면 Firestore에서 다시 읽음)"""
+        with self.lock:
+            self._check_pid()
+            catalog = self.catalogs.get(name)
+            if catalog is not None and (self._watching(name) or time.monotonic() - catalog.loaded_at < self.ttl):
+                self.stats["hits"] += 1
+                return catalog
+
+        try:
+            fresh = self._load(name)
+        except Exception:
+            if catalog is None:
+                raise
+            with self.lock:
+                self.stats["refresh_errors"] += 1
+            print(f"⚠️ {name} 기준 데이터를 다시 읽지 못해 기존 데이터를 사용합니다.")
+            return catalog
+
+        with self.lock:
+            self.catalogs[name] = fresh
+        return fresh
+
+    def serialized(self, key, names, build):
+        """목록 API용 JSON 바이트 (build(카탈로그들)의 결과를 스냅샷이 바뀔 때만 다시 직렬화)"""
+        catalogs = tuple(self.get(name) for name in names)
+        with self.lock:
+            entry = self.responses.get(key)
+            if entry is not None and all(a is b for a, b in zip(entry[0], catalogs)):
+                return entry[1]
+
+        # ✅ FastAPI 기본 JSONResponse와 같은 형식
+        body = json.dumps(jsonable_encoder(build(*catalogs)), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+        with self.lock:
+            self.responses[key] = (catalogs, body)
+            self.stats["serialized"] += 1
+        return body
+
+    def invalidate(self, name=None):
+        """컬렉션(없으면 전부)을 버려서 다음 조회 때 다시 읽게 함 (초기화 스크립트 실행 후 등)"""
+        with self.lock:
+            if name is None:
+                self.catalogs.clear()
+            else:
+                self.catalogs.pop(name, None)
+
+    def _on_snapshot(self, name):
+        def callback(snapshot, changes, read_time):
+            catalog = Catalog(name, sorted(((doc.id, doc.to_dict()) for doc in snapshot), key=lambda item: item[0]))
+            with self.lock:
+                self.catalogs[name] = catalog
+                self.stats["listener_updates"] += 1
+        return callback
+
+    def start_listeners(self):
+        """컬렉션마다 스냅샷 리스너 등록 (워커 프로세스에서 호출, 리스너를 못 쓰는 클라이언트면 TTL만 사용)"""
+        with self.lock:
+            self._check_pid()
+        for name in self.collections:
+            if name in self.watches:
+                continue
+            try:
+                self.watches[name] = db.collection(name).on_snapshot(self._on_snapshot(name))
+            except Exception as e:
+                print(f"⚠️ {name} 스냅샷 리스너를 시작하지 못했습니다 (TTL로 갱신): {str(e)}")
+
+    def get_stats(self):
+        """적중/읽기 횟수, 리스너 갱신 횟수와 컬렉션별 문서 수/경과 시간"""
+        with self.lock:
+            now = time.monotonic()
+            return {
+                **self.stats,
+                "listeners": sorted(self.watches),
+                "catalogs": {name: {"documents": len(catalog.docs), "age_seconds": round(now - catalog.loaded_at, 1)} for name, catalog in self.catalogs.items()}
+            }
+
+
+catalog_cache = CatalogCache()
+
+
+def get_catalog(name):
+    """기준 데이터 컬렉션 스냅샷 (personality_traits, animals, appearance_traits)"""
+    return catalog_cache.get(name)
+
+
+def start_catalog_listeners():
+    """CATALOG_LISTENER=1이면 기준 데이터 변경을 스냅샷 리스너로 받음"""
+    if CATALOG_LISTENER:
+        catalog_cache.start_listeners()
+
+
+def get_catalog_cache_stats():
+    """기준 데이터 캐시 통계"""
+    return catalog_cache.get_stats()
@@ -0,0 +1,110 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from firebase_admin import firestore
+from core.firebase import db
+
+# ✅ 사용자 정보 패턴 (슬롯 → 정규식, 값은 첫 번째 그룹)
+USER_PATTERNS = {
+    "정체성": re.compile(r"나는 (.+?)(야|이야|해)"),
+    "취미": re.compile(r"내 취미는 (.+?)(야|이야)"),
+    "직업": re.compile(r"내 직업은 (.+?)(야|이야)"),
+    "사는 곳": re.compile(r"내가 사는 곳은 (.+?)(야|이야)"),
+    "나이": re.compile(r"나는 (\d+)살(이야|야)"),
+    "MBTI": re.compile(r"내 MBTI는 (.+?)(야|이야)")
+}
+
+# ✅ AI 캐릭터 정보 패턴 (값은 두 번째 그룹)
+CHARAC_PATTERNS = {
+    "성향": re.compile(r"(넌|너는) (.+?)(야|이야|하는 걸 좋아해)")
+}
+
+# ✅ 모든 패턴의 시작 문구를 하나로 합친 사전 필터 (대부분의 메시지는 이 한 번의 검색으로 끝남)
+PROFILE_TRIGGER = re.compile(r"나는 |내 취미는 |내 직업은 |내가 사는 곳은 |내 MBTI는 |넌 |너는 ")
+
+PROFILE_COLLECTION = "chat_profiles"  # ✅ 채팅방별 프로필 문서 {chat_id: {"user": {...}, "character": {...}}}
+
+# ✅ 채팅방 프로필 캐시 설정 (환경 변수 우선)
+CHAT_PROFILE_CACHE_SIZE = int(os.getenv("CHAT_PROFILE_CACHE_SIZE", "10000"))  # ✅ 메모리에 둘 채팅방 수
+CHAT_PROFILE_TTL_SECONDS = float(os.getenv("CHAT_PROFILE_TTL_SECONDS", "60"))  # ✅ 이 시간이 지나면 다시 읽음 (다른 워커가 쓴 슬롯 반영)
+
+
+def extract_profile_slots(text):
+    """메시지 하나에서 (사용자 슬롯, 캐릭터 슬롯) 추출"""
+    user_slots, charac_slots = {}, {}
+    if not PROFILE_TRIGGER.search(text):
+        return user_slots, charac_slots
+
+    for key, pattern in USER_PATTERNS.items():
+        match = pattern.search(text)
+        if match:
+            user_slots[key] = match.group(1).strip()
+
+    for key, pattern in CHARAC_PATTERNS.items():
+        match = pattern.search(text)
+        if match:
+            charac_slots[key] = match.group(2).strip()
+
+    return user_slots, charac_slots
+
+
+class ChatProfileStore:
+    """채팅방별 사용자/캐릭터 프로필 (Firestore 문서 + 프로세스 내 TTL/LRU 캐시)
+
+    캐시에 없거나 TTL이 지난 채팅방만 Firestore에서 읽는다. 새 메시지에서 바뀐 슬롯이 있으면
+    그 슬롯만 문서에 병합 저장하므로, 다른 워커가 쓴 나머지 슬롯을 캐시 내용으로 덮어쓰지 않는다.
+    """
+
+    def __init__(self, max_entries=CHAT_PROFILE_CACHE_SIZE, ttl=CHAT_PROFILE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.profiles = OrderedDict()  # ✅ {chat_id: {"profile": {"user": {...}, "character": {...}}, "loaded_at": 시각}} (LRU 순서)
+        self.lock = threading.Lock()
+
+    def get(self, chat_id):
+        """채팅방 프로필 반환 (캐시 → Firestore 순)"""
+        with self.lock:
+            entry = self.profiles.get(chat_id)
+            if entry is not None and time.monotonic() - entry["loaded_at"] < self.ttl:
+                self.profiles.move_to_end(chat_id)
+                return entry["profile"]
+
+        doc = db.collection(PROFILE_COLLECTION).document(chat_id).get()
+        data = doc.to_dict() if doc.exists else {}
+        profile = {"user": data.get("user", {}), "character": data.get("character", {})}
+
+        with self.lock:
+            self.profiles[chat_id] = {"profile": profile, "loaded_at": time.monotonic()}
+            self.profiles.move_to_end(chat_id)
+            while len(self.profiles) > self.max_entries:
+                self.profiles.popitem(last=False)
+        return profile
+
+    def update(self, chat_id, user_slots, charac_slots):
+        """추출한 슬롯을 프로필에 반영하고, 바뀐 값이 있으면 Firestore에 저장"""
+        profile = self.get(chat_id)
+        changed = {}
+        fields = {}  # ✅ 바뀐 슬롯만 담은 중첩 map (merge=True는 map 안의 필드 단위로 병합)
+        with self.lock:
+            for section, slots in (("user", user_slots), ("character", charac_slots)):
+                for key, value in slots.items():
+                    if profile[section].get(key) != value:
+                        profile[section][key] = value
+                        changed[f"{section}.{key}"] = value
+                        fields.setdefault(section, {})[key] = value
+
+        if changed:
+            db.collection(PROFILE_COLLECTION).document(chat_id).set({**fields, "updated_at": firestore.SERVER_TIMESTAMP}, merge=True)
+        return changed
+
+    def delete(self, chat_id):
+        """채팅방 삭제 시 프로필 문서와 캐시 삭제"""
+        with self.lock:
+            self.profiles.pop(chat_id, None)
+        db.collection(PROFILE_COLLECTION).document(chat_id).delete()
+
+
+profile_store = ChatProfileStore()
@@ -0,0 +1,64 @@
+import hashlib
+import os
+
+import faiss
+import numpy as np
+
+# ✅ 중복 문장 억제 설정 (환경 변수 우선)
+FAISS_NEAR_DUP_THRESHOLD = float(os.getenv("FAISS_NEAR_DUP_THRESHOLD", "0"))  # ✅ 코사인 유사도가 이 값 이상이면 거의 같은 문장으로 보고 저장하지 않음 (0이면 끔, 예: 0.97)
+FAISS_NEAR_DUP_SCOPE = os.getenv("FAISS_NEAR_DUP_SCOPE", "ai")  # ✅ "ai": AI 응답만 비교 | "all": 모든 메시지 비교
+FAISS_NEAR_DUP_NEIGHBORS = 8  # ✅ 새 문장끼리 비교할 때 문장마다 확인할 이웃 수
+
+
+def text_hash(text):
+    """문장의 64비트 해시 (int64 배열에 그대로 저장할 수 있는 부호 있는 정수)"""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+def is_near_dup_candidate(msg_data, scope=FAISS_NEAR_DUP_SCOPE):
+    """유사 중복 비교 대상 메시지인지 (기본은 AI 응답만)"""
+    if scope == "all":
+        return True
+    return bool(msg_data.get("is_response")) or msg_data.get("sender") == "AI"
+
+
+def find_near_duplicates(vectors, candidates, search_existing=None, threshold=FAISS_NEAR_DUP_THRESHOLD):
+    """정규화된 새 벡터 중 이미 저장된 문장이나 앞선 새 문장과 거의 같은 것을 찾음
+
+    candidates: 비교 대상 여부 (새 벡터마다 bool)
+    search_existing: (벡터, k) → (거리, 문서 ID) 기존 인덱스 검색 함수 (없으면 새 문장끼리만 비교)
+    반환: {새 벡터 위치: ("doc", 기존 문서 ID) 또는 ("new", 앞선 새 벡터 위치)}
+    새 문장끼리는 위치가 앞선 이웃 중 가장 가까운 것에 묶고, 그 이웃이 이미 묶였으면 같은 대표를 따라간다.
+    """
+    if threshold <= 0 or not len(vectors):
+        return {}
+
+    max_distance = 2 - 2 * threshold  # ✅ 단위 벡터의 L2 제곱 거리 = 2 - 2 × 코사인 유사도
+    positions = np.nonzero(np.asarray(candidates, dtype=bool))[0]
+    if not len(positions):
+        return {}
+
+    duplicates = {}
+    if search_existing is not None:
+        D, I = search_existing(vectors[positions], 1)
+        for position, distance, doc_id in zip(positions, D[:, 0], I[:, 0]):
+            if doc_id >= 0 and distance <= max_distance:
+                duplicates[int(position)] = ("doc", int(doc_id))
+
+    remaining = np.array([position for position in positions if int(position) not in duplicates], dtype=np.int64)
+    if len(remaining) < 2:
+        return duplicates
+
+    batch = faiss.IndexFlatL2(vectors.shape[1])
+    batch.add(vectors[remaining])
+    D, I = batch.search(vectors[remaining], min(FAISS_NEAR_DUP_NEIGHBORS, len(remaining)))
+
+    for row, position in enumerate(remaining):
+        for distance, neighbor in zip(D[row], I[row]):
+            if neighbor < 0 or distance > max_distance or neighbor >= row:
+                continue  # ✅ 자기 자신이나 뒤에 오는 문장은 대표가 될 수 없음
+            canonical = int(remaining[neighbor])
+            duplicates[int(position)] = duplicates.get(canonical, ("new", canonical))
+            break
+
+    return duplicates
@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from core.firebase import db  # ✅ 프로세스별로 처음 사용할 때 생성 (fork 안전)
+
+# ✅ 사용자/캐릭터 문서 캐시 설정 (환경 변수 우선)
+DOC_CACHE_MAX_ENTRIES = int(os.getenv("DOC_CACHE_MAX_ENTRIES", "10000"))  # ✅ 보관할 문서 수 (0이면 끔)
+DOC_CACHE_TTL_SECONDS = float(os.getenv("DOC_CACHE_TTL_SECONDS", "60"))  # ✅ 이 시간이 지난 문서는 다시 읽음 (다른 서버가 바꾼 경우의 상한)
+DOC_CACHE_LISTENER = os.getenv("DOC_CACHE_LISTENER", "0") == "1"  # ✅ 캐시한 문서마다 스냅샷 리스너를 붙여 변경 즉시 반영
+DOC_CACHE_MAX_LISTENERS = int(os.getenv("DOC_CACHE_MAX_LISTENERS", "500"))  # ✅ 리스너 수 상한 (넘으면 TTL로만 갱신)
+
+
+def doc_path(collection, doc_id):
+    """캐시 키 (Firestore 문서 경로)"""
+    return f"{collection}/{doc_id}"
+
+
+class DocumentCache:
+    """문서 경로 → 문서 내용 TTL/LRU 캐시 (users/{id}, characters/{id})
+
+    없는 문서도 None으로 캐시한다. 문서를 쓰는 코드는 쓴 뒤 invalidate()를 호출하고,
+    DOC_CACHE_LISTENER=1이면 스냅샷 리스너가 다른 서버의 변경도 바로 반영한다. 리스너가 없으면
+    다른 서버의 변경은 최대 TTL만큼 늦게 보인다. 읽는 동안 무효화가 있었으면 읽은 내용을
+    캐시하지 않는다 (무효화 이전 내용을 다시 넣지 않도록).
+    읽고-고쳐-쓰는 코드는 strict=True로 캐시를 건너뛰고 Firestore에서 바로 읽는다.
+    """
+
+    def __init__(self, max_entries=DOC_CACHE_MAX_ENTRIES, ttl=DOC_CACHE_TTL_SECONDS, listen=DOC_CACHE_LISTENER):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.listen = listen
+        self.lock = threading.Lock()
+        self.pid = None
+        self.entries = OrderedDict()  # ✅ {경로: {"data": dict 또는 None, "loaded_at": 시각, "watch": 리스너}}
+        self.epoch = 0  # ✅ 무효화할 때마다 증가
+        self.listeners = 0  # ✅ 리스너가 붙은 항목 수 (붙일 때/뺄 때 갱신)
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "strict_reads": 0, "invalidations": 0, "evictions": 0, "listener_updates": 0, "skipped_puts": 0}
+
+    def _check_pid(self):
+        if self.pid != os.getpid():
+            self.entries = OrderedDict()  # ✅ fork 이전 프로세스의 리스너(스레드)는 자식 프로세스에 없음
+            self.listeners = 0
+            self.pid = os.getpid()
+
+    def _lookup(self, path):
+        """캐시된 내용 → (찾았는지, 내용) (lock 안에서 호출)"""
+        entry = self.entries.get(path)
+        if entry is not None and (entry["watch"] is not None or time.monotonic() - entry["loaded_at"] < self.ttl):
+            self.entries.move_to_end(path)
+            self.stats["hits"] += 1
+            return True, entry["data"]
+
+        if entry is not None:
+            self.stats["stale"] += 1  # ✅ TTL이 지나 다시 읽음
+        self.stats["misses"] += 1
+        return False, None
+
+    def _drop(self, path, closing):
+        """항목 제거 (lock 안에서 호출, 리스너는 closing에 모아 lock 밖에서 해제)"""
+        entry = self.entries.pop(path, None)
+        if entry is not None and entry["watch"] is not None:
+            closing.append(entry["watch"])
+            self.listeners -= 1
+
+    def _close(self, closing):
+        for watch in closing:
+            try:
+                watch.unsubscribe()
+            except Exception:
+                pass
+
+    def _put(self, path, data, epoch):
+        """읽은 내용 저장 (epoch: 읽기 전에 본 무효화 번호, 그사이 무효화가 있었으면 저장하지 않음)"""
+        closing = []
+        with self.lock:
+            if self.epoch != epoch:
+                self.stats["skipped_puts"] += 1
+                return
+            self._drop(path, closing)
+            self.entries[path] = {"data": data, "loaded_at": time.monotonic(), "watch": None}
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)), closing)
+                self.stats["evictions"] += 1
+            watch = self.listen and self.listeners < DOC_CACHE_MAX_LISTENERS
+
+        self._close(closing)
+        if watch:
+            self._watch(path)
+
+    def _watch(self, path):
+        collection, doc_id = path.split("/", 1)
+
+        def callback(snapshots, changes, read_time):
+            with self.lock:
+                entry = self.entries.get(path)
+                if entry is not None:
+                    entry["data"] = snapshots[0].to_dict() if snapshots and snapshots[0].exists else None
+                    entry["loaded_at"] = time.monotonic()
+                    self.stats["listener_updates"] += 1
+
+        try:
+            watch = db.collection(collection).document(doc_id).on_snapshot(callback)
+        except Exception as e:
+            print(f"⚠️ {path} 스냅샷 리스너를 시작하지 못했습니다 (TTL로 갱신): {str(e)}")
+            return
+
+        with self.lock:
+            entry = self.entries.get(path)
+            attached = entry is not None and entry["watch"] is None
+            if attached:
+                entry["watch"] = watch
+                self.listeners += 1
+        if not attached:
+            self._close([watch])  # ✅ 리스너를 붙이는 동안 제거된 항목 (또는 다른 스레드가 이미 붙인 항목)
+
+    def get(self, collection, doc_id, strict=False):
+        """문서 내용 dict (없는 문서면 None, strict=True면 캐시를 건너뛰고 Firestore에서 읽음)"""
+        return self.get_all([(collection, doc_id)], strict=strict)[doc_path(collection, doc_id)]
+
+    def get_all(self, keys, uncached=(), strict=False):
+        """여러 문서를 한 번에 → {경로: dict 또는 None}
+
+        keys: 캐시할 (컬렉션, 문서 ID) 목록, uncached: 캐시하지 않고 항상 읽을 (컬렉션, 문서 ID) 목록.
+        캐시에 없는 문서와 uncached 문서는 get_all 한 번(Firestore 왕복 1번)으로 읽는다.
+        """
+        results, missing = {}, []
+        with self.lock:
+            self._check_pid()
+            epoch = self.epoch
+            for collection, doc_id in keys:
+                path = doc_path(collection, doc_id)
+                if strict or self.max_entries <= 0:
+                    self.stats["strict_reads"] += strict
+                    missing.append((collection, doc_id))
+                    continue
+                found, data = self._lookup(path)
+                if found:
+                    results[path] = dict(data) if data is not None else None
+                else:
+                    missing.append((collection, doc_id))
+
+        refs = [db.collection(collection).document(doc_id) for collection, doc_id in list(missing) + list(uncached)]
+        if refs:
+            # ✅ get_all은 요청한 순서대로 돌려준다는 보장이 없으므로 경로로 찾음
+            docs = {doc.reference.path: doc for doc in db.get_all(refs)}
+            for ref in refs:
+                doc = docs.get(ref.path)
+                results[ref.path] = doc.to_dict() if doc is not None and doc.exists else None
+
+        if self.max_entries > 0:
+            for collection, doc_id in missing:
+                path = doc_path(collection, doc_id)
+                data = results[path]
+                self._put(path, dict(data) if data is not None else None, epoch)
+        return results
+
+    def invalidate(self, collection, doc_id):
+        """문서를 쓴 뒤 호출: 캐시에서 버려서 다음 조회 때 다시 읽게 함"""
+        closing = []
+        with self.lock:
+            self._check_pid()
+            self.epoch += 1
+            self.stats["invalidations"] += 1
+            self._drop(doc_path(collection, doc_id), closing)
+        self._close(closing)
+
+    def get_stats(self):
+        """적중/실패/TTL 만료(stale)/무효화/제거 횟수, 적중률과 현재 크기"""
+        with self.lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "listeners": self.listeners,
+                "max_entries": self.max_entries
+            }
+
+
+doc_cache = DocumentCache()
+
+
+def get_cached_doc(collection, doc_id, strict=False):
+    """users/characters 문서 내용 (없으면 None, strict=True면 항상 Firestore에서 읽음)"""
+    return doc_cache.get(collection, doc_id, strict=strict)
+
+
+def invalidate_doc(collection, doc_id):
+    """users/characters 문서를 쓴 뒤 캐시에서 제거"""
+    doc_cache.invalidate(collection, doc_id)
+
+
+def get_doc_cache_stats():
+    """사용자/캐릭터 문서 캐시 통계"""
+    return doc_cache.get_stats()
@@ -0,0 +1,104 @@
+import os
+
+import numpy as np
+
+RECORD_SEPARATOR = b"\0"  # ✅ 레코드 = 메시지 ID + \0 + 텍스트 (UTF-8)
+
+
+class DocSidecar:
+    """FAISS 벡터 ID → (메시지 ID, 텍스트) 사이드카 저장소
+
+    모든 레코드를 하나의 UTF-8 아레나 파일(.docs)에 이어 붙이고, 각 레코드의 끝 위치를
+    int64 오프셋 배열 파일(.offsets)에 기록한다. 두 파일 모두 읽기 전용 memmap으로 열기 때문에
+    대화 기록이 길어져도 프로세스 메모리에 텍스트를 복사해 두지 않는다.
+    커밋된 개수(count)와 아레나 길이(arena_bytes)는 인덱스 메타데이터가 관리한다.
+    """
+
+    def __init__(self, arena_path, offsets_path, count=0, arena_bytes=0):
+        self.arena_path = arena_path
+        self.offsets_path = offsets_path
+        self.count = count
+        self.arena_bytes = arena_bytes
+        self._map()
+
+    @classmethod
+    def write(cls, arena_path, offsets_path, docs):
+        """(메시지 ID, 텍스트) 목록으로 사이드카를 새로 작성 (임시 파일에 쓴 뒤 교체)"""
+        records = [msg_id.encode("utf-8") + RECORD_SEPARATOR + text.encode("utf-8") for msg_id, text in docs]
+        ends = np.cumsum([len(record) for record in records], dtype=np.int64)
+
+        for path, data in ((arena_path, b"".join(records)), (offsets_path, ends.astype("<i8").tobytes())):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        return cls(arena_path, offsets_path, len(records), int(ends[-1]) if len(records) else 0)
+
+    def _map(self):
+        """커밋된 범위만 읽기 전용으로 매핑"""
+        if self.count:
+            self.offsets = np.memmap(self.offsets_path, dtype="<i8", mode="r", shape=(self.count,))
+            self.arena = np.memmap(self.arena_path, dtype=np.uint8, mode="r", shape=(self.arena_bytes,))
+        else:
+            self.offsets = np.empty(0, dtype="<i8")
+            self.arena = np.empty(0, dtype=np.uint8)
+
+    def append(self, docs):
+        """(메시지 ID, 텍스트) 목록을 끝에 추가 (커밋되지 않은 꼬리는 먼저 잘라냄)"""
+        records = [msg_id.encode("utf-8") + RECORD_SEPARATOR + text.encode("utf-8") for msg_id, text in docs]
+        if not records:
+            return
+
+        ends = self.arena_bytes + np.cumsum([len(record) for record in records], dtype=np.int64)
+
+        with open(self.arena_path, "ab") as f:
+            f.truncate(self.arena_bytes)
+            f.write(b"".join(records))
+        with open(self.offsets_path, "ab") as f:
+            f.truncate(self.count * 8)
+            f.write(ends.astype("<i8").tobytes())
+
+        self.count += len(records)
+        self.arena_bytes = int(ends[-1])
+        self._map()
+
+    def extended(self, docs):
+        """docs를 끝에 추가한 새 사이드카 (이 객체는 그대로, 다른 스레드가 읽는 중인 캐시 항목을 바꾸지 않음)"""
+        sidecar = DocSidecar(self.arena_path, self.offsets_path, self.count, self.arena_bytes)
+        sidecar.append(docs)
+        return sidecar
+
+    def get_record(self, doc_id):
+        """문서 ID의 (메시지 ID, 텍스트) 반환"""
+        start = int(self.offsets[doc_id - 1]) if doc_id > 0 else 0
+        msg_id, _, text = bytes(self.arena[start:int(self.offsets[doc_id])]).partition(RECORD_SEPARATOR)
+        return msg_id.decode("utf-8"), text.decode("utf-8")
+
+    def get_message_id(self, doc_id):
+        """문서 ID의 Firestore 메시지 ID 반환"""
+        return self.get_record(doc_id)[0]
+
+    def __getitem__(self, doc_id):
+        return self.get_record(doc_id)[1]
+
+    def __contains__(self, doc_id):
+        return 0 <= doc_id < self.count
+
+    def __len__(self):
+        return self.count
+
+    def values(self):
+        """벡터 ID 순서대로 텍스트를 순회"""
+        for doc_id in range(self.count):
+            yield self[doc_id]
+
+    def items(self):
+        """(문서 ID, 텍스트)를 벡터 ID 순서대로 순회"""
+        for doc_id in range(self.count):
+            yield doc_id, self[doc_id]
+
+    @property
+    def nbytes(self):
+        """매핑된 사이드카 크기 (오프셋 + 아레나)"""
+        return self.count * 8 + self.arena_bytes
@@ -0,0 +1,110 @@
+import os
+import re
+
+import numpy as np
+
+# ✅ 임베딩 백엔드 설정 (환경 변수 우선)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # ✅ "torch" | "onnx" | "multilingual"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")  # ✅ torch/onnx 백엔드 모델
+EMBEDDING_MULTILINGUAL_MODEL = os.getenv("EMBEDDING_MULTILINGUAL_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # ✅ 추론 스레드 수 (0이면 라이브러리 기본값)
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "db/onnx_models")  # ✅ 양자화한 ONNX 모델 저장 위치
+EMBEDDING_ONNX_QUANTIZATION = os.getenv("EMBEDDING_ONNX_QUANTIZATION", "avx2")  # ✅ "avx2" | "avx512" | "avx512_vnni" | "arm64" | "none"
+
+# ✅ 임베딩 백엔드를 고를 수 있기 전의 모델 (모델 정보 없이 저장된 인덱스는 이 모델로 만든 것)
+LEGACY_EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+LEGACY_EMBEDDING_DIMENSION = 768
+
+
+class Embedder:
+    """문장 임베딩 백엔드 인터페이스
+
+    name은 임베딩 캐시 키에 들어가므로 백엔드나 양자화 방식이 달라 벡터가 달라지면
+    이름도 달라야 한다. dimension은 FAISS 인덱스 차원으로 쓰인다.
+    """
+
+    name = None
+    dimension = None
+
+    def encode(self, texts):
+        """문장 목록 → float32 행렬 (len(texts) × dimension)"""
+        raise NotImplementedError
+
+    def freeze(self):
+        """fork 전에 가중치를 추론 전용으로 고정 (preload 모드, 기본은 할 일 없음)"""
+
+
+class TorchEmbedder(Embedder):
+    """기존 방식: SentenceTransformer + PyTorch eager 추론"""
+
+    def __init__(self, model_name=EMBEDDING_MODEL, threads=EMBEDDING_THREADS):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads > 0:
+            torch.set_num_threads(threads)
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.name = model_name
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        return np.asarray(self.model.encode(texts), dtype=np.float32)
+
+    def freeze(self):
+        # ✅ 학습용 상태(grad)를 끄면 추론 중 가중치 텐서에 쓰기가 생기지 않아 워커 간 공유 페이지가 유지됨
+        self.model.eval()
+        for parameter in self.model.parameters():
+            parameter.requires_grad_(False)
+
+
+class OnnxEmbedder(Embedder):
+    """ONNX Runtime 추론 (동적 int8 양자화 모델)
+
+    처음 실행할 때 모델을 ONNX로 내보내고 양자화해서 EMBEDDING_ONNX_DIR에 저장하며,
+    이후에는 저장된 모델을 바로 읽는다. optimum[onnxruntime] 패키지가 필요하다.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, quantization=EMBEDDING_ONNX_QUANTIZATION, threads=EMBEDDING_THREADS):
+        try:
+            import onnxruntime
+            from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+        except ImportError as e:
+            raise RuntimeError("ONNX 임베딩 백엔드를 쓰려면 `pip install optimum[onnxruntime]`이 필요합니다.") from e
+
+        session_options = onnxruntime.SessionOptions()
+        if threads > 0:
+            session_options.intra_op_num_threads = threads
+            session_options.inter_op_num_threads = 1
+        model_kwargs = {"provider": "CPUExecutionProvider", "session_options": session_options}
+
+        export_dir = os.path.join(EMBEDDING_ONNX_DIR, re.sub(r"[^0-9A-Za-z_.-]", "_", model_name))
+        if quantization == "none":
+            file_name = "onnx/model.onnx"
+        else:
+            file_name = f"onnx/model_qint8_{quantization}.onnx"
+
+        if not os.path.exists(os.path.join(export_dir, file_name)):
+            # ✅ 최초 1회: ONNX 내보내기 → (선택) 동적 int8 양자화
+            model = SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs={"provider": "CPUExecutionProvider"})
+            model.save(export_dir)
+            if quantization != "none":
+                export_dynamic_quantized_onnx_model(model, quantization, export_dir)
+
+        self.model = SentenceTransformer(export_dir, device="cpu", backend="onnx", model_kwargs={**model_kwargs, "file_name": file_name})
+        self.name = f"{model_name}#onnx-{quantization}"
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        return np.asarray(self.model.encode(texts), dtype=np.float32)
+
+
+def get_embedder(backend=EMBEDDING_BACKEND):
+    """설정에 맞는 임베딩 백엔드 생성"""
+    if backend == "torch":
+        return TorchEmbedder()
+    if backend == "onnx":
+        return OnnxEmbedder()
+    if backend == "multilingual":
+        return TorchEmbedder(EMBEDDING_MULTILINGUAL_MODEL)  # ✅ 더 작은 다국어 모델 (384차원)
+    raise ValueError(f"알 수 없는 EMBEDDING_BACKEND: {backend}")
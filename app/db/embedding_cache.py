@@ -0,0 +1,248 @@
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl  # ✅ 여러 워커가 같은 캐시 파일에 추가할 때 사용 (Windows에는 없음)
+except ImportError:
+    fcntl = None
+
+# ✅ 임베딩 캐시 설정 (환경 변수 우선)
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "db/embedding_cache")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))  # ✅ 메모리 LRU 최대 항목 수
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "200000"))  # ✅ 디스크 캐시 최대 행 수 (넘으면 최근에 추가된 행만 남기고 다시 작성, 0이면 제한 없음)
+
+KEY_SIZE = 20  # ✅ sha1 digest 길이
+RECORD_SIZE = KEY_SIZE + 8  # ✅ 오프셋 인덱스 레코드: 키(20) + 행 번호(int64)
+
+
+def normalize_text(text):
+    """캐시 키용 텍스트 정규화 (유니코드 NFC + 공백 정리)"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+class EmbeddingCache:
+    """SentenceTransformer 임베딩 캐시 (메모리 LRU + 디스크 memmap 2단계)
+
+    키는 sha1(모델 이름 + 정규화된 텍스트)이다. 디스크 계층은 float32 행렬 파일(.f32)과
+    키 → 행 번호 오프셋 인덱스(.idx)로 구성되며, 재시작 후에도 그대로 재사용된다.
+    같은 호스트의 워커들은 디스크 계층을 함께 쓴다. 캐시에 없는 키가 나오거나 추가하기 전에
+    다른 워커가 오프셋 인덱스에 덧붙인 레코드를 이어서 읽으므로, 같은 키를 두 번 추가하지 않는다.
+    행이 max_disk_rows를 넘으면 최근에 추가된 행만 남기고 두 파일을 다시 작성한다.
+    추가/다시 작성은 잠금 파일(.lock)의 배타 잠금, 다른 워커의 레코드 읽기는 공유 잠금을 잡고 한다.
+    """
+
+    def __init__(self, model_name, dimension, cache_dir=EMBEDDING_CACHE_DIR, max_memory_items=EMBEDDING_CACHE_SIZE, max_disk_rows=EMBEDDING_CACHE_MAX_ROWS):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.max_memory_items = max_memory_items
+        self.max_disk_rows = max_disk_rows
+        self.row_bytes = dimension * 4
+
+        slug = re.sub(r"[^0-9A-Za-z_.-]", "_", model_name)
+        self.matrix_path = os.path.join(cache_dir, f"{slug}.f32")
+        self.index_path = os.path.join(cache_dir, f"{slug}.idx")
+        self.lock_path = os.path.join(cache_dir, f"{slug}.lock")
+
+        self.memory = OrderedDict()  # ✅ {키: 벡터} (LRU 순서)
+        self.rows = {}  # ✅ {키: 디스크 행 번호}
+        self.matrix = None  # ✅ 디스크 행렬 memmap (행이 늘어나면 다시 매핑)
+        self.index_bytes = 0  # ✅ 오프셋 인덱스에서 읽은 바이트 수 (다른 워커가 덧붙이면 그 뒤만 읽음)
+        self.index_inode = None  # ✅ 읽은 오프셋 인덱스 파일 (다른 워커가 다시 작성하면 처음부터 읽음)
+        self.compactions = 0  # ✅ 디스크 계층을 다시 작성한 횟수
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_offsets()
+
+    def key(self, text):
+        """모델 이름 + 정규화된 텍스트의 해시 키"""
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        """워커끼리 디스크 계층 잠금 (추가/다시 작성은 배타, 읽기는 공유)"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a+b") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_offsets(self):
+        """오프셋 인덱스를 읽어 키 → 행 번호 맵 복원 (행렬에 없는 행은 무시)"""
+        with self._file_lock(exclusive=False):
+            self._sync_offsets()
+
+    def _offsets_changed(self):
+        """마지막으로 읽은 뒤 다른 워커가 오프셋 인덱스에 덧붙이거나 다시 작성했는지 (stat 한 번)"""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return False
+        return stat.st_ino != self.index_inode or stat.st_size != self.index_bytes
+
+    def _sync_offsets(self):
+        """오프셋 인덱스에서 아직 읽지 않은 레코드만 읽어 반영 (다시 작성됐으면 처음부터, 잠금 파일을 잡고 호출)"""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return
+        if stat.st_ino != self.index_inode or stat.st_size < self.index_bytes:
+            self.rows, self.matrix, self.index_bytes, self.index_inode = {}, None, 0, stat.st_ino
+
+        with open(self.index_path, "rb") as f:
+            f.seek(self.index_bytes)
+            data = f.read(stat.st_size - self.index_bytes)
+        data = data[:len(data) - len(data) % RECORD_SIZE]
+        if not data:
+            return
+
+        matrix_rows = os.path.getsize(self.matrix_path) // self.row_bytes if os.path.exists(self.matrix_path) else 0
+        records = np.frombuffer(data, dtype=np.dtype([("key", f"S{KEY_SIZE}"), ("row", "<i8")]))
+        for record in records:
+            if record["row"] < matrix_rows:
+                self.rows[bytes(record["key"]).ljust(KEY_SIZE, b"\0")] = int(record["row"])
+
+        self.index_bytes += len(data)
+        self._map_matrix(matrix_rows)
+
+    def _map_matrix(self, rows):
+        """디스크 행렬을 읽기 전용으로 매핑"""
+        if rows > 0:
+            self.matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r", shape=(rows, self.dimension))
+
+    def _remember(self, key, vector):
+        """메모리 LRU에 추가하고 한도를 넘으면 가장 오래된 항목 제거
+
+        배치 결과 행렬의 행(view)을 받으므로 복사해서 보관한다 (배치 전체가 LRU에 붙잡히지 않도록).
+        """
+        self.memory[key] = np.array(vector, dtype=np.float32, copy=True)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_items:
+            self.memory.popitem(last=False)
+
+    def _append_to_disk(self, keys, vectors):
+        """새 임베딩을 행렬 파일 끝에 추가한 뒤 오프셋 인덱스를 기록 (인덱스가 커밋 지점)
+
+        다른 워커가 먼저 추가한 키는 건너뛰고, 행 수가 max_disk_rows를 넘으면 먼저 다시 작성한다.
+        """
+        with self._file_lock(exclusive=True):
+            self._sync_offsets()
+            fresh = [i for i, key in enumerate(keys) if key not in self.rows]
+            if not fresh:
+                return
+            keys, vectors = [keys[i] for i in fresh], vectors[fresh]
+
+            if self.max_disk_rows and len(self.rows) + len(keys) > self.max_disk_rows:
+                keys, vectors = keys[-self.max_disk_rows:], vectors[-self.max_disk_rows:]
+                self._compact(min(self.max_disk_rows // 2, self.max_disk_rows - len(keys)))
+
+            with open(self.matrix_path, "ab") as matrix_file:
+                start = matrix_file.tell() // self.row_bytes
+                matrix_file.seek(start * self.row_bytes)
+                matrix_file.truncate()
+                matrix_file.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+
+            records = b"".join(key + int(start + i).to_bytes(8, "little") for i, key in enumerate(keys))
+            with open(self.index_path, "ab") as index_file:
+                index_file.truncate(self.index_bytes)  # ✅ 중간에 끊긴 레코드 조각은 잘라냄
+                index_file.write(records)
+            self.index_bytes += len(records)
+            self.index_inode = os.stat(self.index_path).st_ino
+
+        for i, key in enumerate(keys):
+            self.rows[key] = start + i
+        self._map_matrix(start + len(keys))
+
+    def _compact(self, keep):
+        """최근에 추가된 keep개 행만 남기고 행렬/오프셋 인덱스를 새 파일로 다시 작성 (배타 잠금을 잡고 호출)
+
+        이미 매핑해서 읽고 있는 워커는 이전 파일을 그대로 읽다가, 다음 동기화 때 inode가 바뀐 것을 보고 처음부터 읽는다.
+        """
+        entries = sorted(self.rows.items(), key=lambda item: item[1])[-keep:] if keep > 0 else []
+        vectors = np.asarray(self.matrix[[row for _, row in entries]], dtype=np.float32) if entries else np.empty((0, self.dimension), dtype=np.float32)
+        records = b"".join(key + int(row).to_bytes(8, "little") for row, (key, _) in enumerate(entries))
+
+        for path, data in ((self.matrix_path, vectors.tobytes()), (self.index_path, records)):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        self.rows = {key: row for row, (key, _) in enumerate(entries)}
+        self.index_bytes, self.index_inode = len(records), os.stat(self.index_path).st_ino
+        self.matrix = None
+        self._map_matrix(len(entries))
+        self.compactions += 1
+
+    def get_many(self, texts, encode_fn):
+        """텍스트 목록의 임베딩 반환 (캐시에 없는 것만 encode_fn으로 한 번에 계산)"""
+        texts = [normalize_text(text) for text in texts]
+        keys = [self.key(text) for text in texts]
+        result = np.empty((len(texts), self.dimension), dtype=np.float32)
+        missing = {}  # ✅ {키: 결과 행 위치 목록}
+
+        with self.lock:
+            for i, key in enumerate(keys):
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    result[i] = self.memory[key]
+                    self.stats["memory_hits"] += 1
+                elif key in self.rows:
+                    result[i] = self.matrix[self.rows[key]]
+                    self._remember(key, result[i])
+                    self.stats["disk_hits"] += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            if missing and self._offsets_changed():
+                # ✅ 다른 워커가 디스크에 추가한 임베딩이 있으면 읽어서 다시 확인
+                with self._file_lock(exclusive=False):
+                    self._sync_offsets()
+                for key in [key for key in missing if key in self.rows]:
+                    positions = missing.pop(key)
+                    result[positions] = self.matrix[self.rows[key]]
+                    self._remember(key, result[positions[0]])
+                    self.stats["disk_hits"] += len(positions)
+
+        if not missing:
+            return result
+
+        # ✅ 캐시에 없는 텍스트만 한 번의 배치로 인코딩
+        missing_keys = list(missing)
+        vectors = np.asarray(encode_fn([texts[missing[key][0]] for key in missing_keys]), dtype=np.float32)
+
+        with self.lock:
+            self.stats["misses"] += len(missing_keys)
+            new_rows = [i for i, key in enumerate(missing_keys) if key not in self.rows]
+            if new_rows:
+                self._append_to_disk([missing_keys[i] for i in new_rows], vectors[new_rows])
+            for key, vector in zip(missing_keys, vectors):
+                self._remember(key, vector)
+                result[missing[key]] = vector
+
+        return result
+
+    def get_stats(self):
+        """캐시 적중/실패 카운터와 크기"""
+        with self.lock:
+            lookups = sum(self.stats.values())
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            return {
+                **self.stats,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_items": len(self.memory),
+                "disk_items": len(self.rows),
+                "disk_compactions": self.compactions
+            }
@@ -1,30 +1,241 @@
 import faiss
 import numpy as np
 from firebase_admin import firestore
-from sentence_transformers import SentenceTransformer
+from core.firebase import db  # ✅ 프로세스별로 처음 사용할 때 생성 (fork 안전)
+from db.chat_profiles import extract_profile_slots, profile_store
+from db.dedup import FAISS_NEAR_DUP_THRESHOLD, find_near_duplicates, is_near_dup_candidate, text_hash
+from db.embedders import LEGACY_EMBEDDING_DIMENSION, LEGACY_EMBEDDING_MODEL, get_embedder
+from db.embedding_cache import EmbeddingCache
+from db.file_locks import FileLocks
+from db.index_cache import FaissIndexCache
+from db.doc_sidecar import DocSidecar
+from db.faiss_shards import ShardedVectorStore
+from db.index_queue import IndexQueue
+from db.mmap_index import FAISS_MMAP, LayeredIndex, read_index_mmap, write_index_atomic
+from db.query_cache import QueryResultCache
+from db.summarizers import get_summarizer
+from db.vector_executor import vector_executor
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
 import os
-import re
+import json
+import queue
 import random
+import threading
+import time
 
-# ✅ Firestore 연결
-db = firestore.client()
 
 user_profiles = {}  # ✅ 사용자 정보 저장 {chat_id: {"직업": "개발자", "취미": "코딩"}}
 character_profiles = {}  # ✅ AI 캐릭터 정보 저장 {charac_id: {"취미": "책 읽기"}}
 
 
-# ✅ 문장 임베딩 모델 로드
-model = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
+# ✅ 문장 임베딩 모델 로드 (EMBEDDING_BACKEND로 PyTorch / ONNX int8 / 다국어 소형 모델 선택)
+embedder = get_embedder()
+EMBEDDING_MODEL_NAME = embedder.name
+LEGACY_EMBEDDING_META = {"embedding_model": LEGACY_EMBEDDING_MODEL, "dimension": LEGACY_EMBEDDING_DIMENSION}  # ✅ 모델 정보가 없는 이전 메타데이터는 기본 모델로 색인한 것
 
 
 # ✅ FAISS 벡터 DB 초기화
-dimension = 768
-doc_store = {}  # ✅ 채팅방별로 문서를 저장 {chat_id: {문서 ID: 텍스트 저장}}
+dimension = embedder.dimension  # ✅ 백엔드 모델의 임베딩 차원 (기본 모델은 768)
+embedding_cache = EmbeddingCache(EMBEDDING_MODEL_NAME, dimension)  # ✅ 같은 문장은 다시 인코딩하지 않음
+doc_store = {}  # ✅ 채팅방별로 문서를 저장 {chat_id: {문서 ID: 텍스트 저장}} (인덱스 캐시에 있는 채팅방만)
+doc_hashes = {}  # ✅ 채팅방별 문서 해시 {chat_id: {"count": 문서 수, "generation": 파일 세대, "hashes": {해시: 문서 ID}}} (인덱스 캐시에 있는 채팅방만)
+message_docs = {}  # ✅ 채팅방별 메시지 ID → 문서 ID {chat_id: {"count": 읽은 문서 수, "dup_count": 읽은 중복 레코드 수, "generation": 파일 세대, "ids": {...}, "dups": {...}}} (인덱스 캐시에 있는 채팅방만)
+
+def forget_chat_docs(chat_id):
+    """인덱스 캐시에서 빠진 채팅방의 문서/해시/메시지 ID도 메모리에서 내림"""
+    doc_store.pop(chat_id, None)
+    doc_hashes.pop(chat_id, None)
+    message_docs.pop(chat_id, None)
+
+index_cache = FaissIndexCache(on_evict=forget_chat_docs)  # ✅ 자주 쓰는 채팅방 인덱스는 메모리에서 바로 검색
 FAISS_INDEX_DIR = "db/faiss"  # ✅ FAISS 저장 디렉토리
+FAISS_READ_RETRIES = 3  # ✅ 읽는 사이 다른 워커가 커밋하면 다시 읽는 횟수
+query_cache = QueryResultCache()  # ✅ 같은 질문을 다시 하면 임베딩/검색 없이 이전 결과 반환 (인덱스 버전이 같을 때만)
+chat_locks = FileLocks(lambda chat_id: os.path.join(FAISS_INDEX_DIR, "locks", f"{chat_id}.lock"))  # ✅ 채팅방별 쓰기 잠금 (같은 호스트의 워커끼리도)
+FAISS_DELTA_MERGE_THRESHOLD = int(os.getenv("FAISS_DELTA_MERGE_THRESHOLD", "256"))  # ✅ 델타 로그가 이 개수를 넘으면 본 인덱스에 병합
+
+# ✅ 벡터 양자화 설정: faiss.index_factory 문자열 (예: "Flat", "SQfp16", "SQ8", "PQ96", "PCA384,SQ8")
+FAISS_INDEX_FACTORY = os.getenv("FAISS_INDEX_FACTORY", "Flat")
+FAISS_INDEX_TRAIN_THRESHOLD = int(os.getenv("FAISS_INDEX_TRAIN_THRESHOLD", "1024"))  # ✅ 채팅방 벡터가 이 개수 이상이면 학습 후 양자화 (그 전에는 Flat)
+
+# ✅ 벡터 저장 방식: "per_chat"(채팅방마다 파일) 또는 "sharded"(여러 채팅방을 샤드 인덱스에 모아 저장)
+FAISS_BACKEND = os.getenv("FAISS_BACKEND", "per_chat")
+shard_store = ShardedVectorStore(dimension=dimension, model_name=EMBEDDING_MODEL_NAME) if FAISS_BACKEND == "sharded" else None
+
+# ✅ FAISS 인덱스 워밍업 설정
+FAISS_EAGER_LOAD = os.getenv("FAISS_EAGER_LOAD", "0") == "1"  # ✅ 1이면 서버 시작 전에 모든 인덱스를 로드 (이전 동작)
+FAISS_PREFETCH_CHATS = int(os.getenv("FAISS_PREFETCH_CHATS", "200"))  # ✅ 서버 시작 후 미리 불러올 최근 채팅방 수 (0이면 끔)
+FAISS_PREFETCH_CACHE_RATIO = 0.9  # ✅ 인덱스 캐시가 이 비율만큼 차면 미리 불러오기 중단
+
+warmup_status = {"state": "idle", "total": 0, "loaded": 0, "skipped": 0, "started_at": None, "finished_at": None}
+
+# ✅ 대화 메모리 압축 설정: 오래된 메시지는 요약으로 묶고 인덱스는 요약 + 최근 메시지로만 유지
+CHAT_MEMORY_COMPACTION = os.getenv("CHAT_MEMORY_COMPACTION", "0") == "1"  # ✅ 요약은 원문을 잃으므로 직접 켰을 때만 (CHAT_MEMORY_SUMMARIZER와 함께 설정)
+CHAT_MEMORY_RECENT_MESSAGES = int(os.getenv("CHAT_MEMORY_RECENT_MESSAGES", "2000"))  # ✅ 요약하지 않고 그대로 두는 최근 메시지 수
+CHAT_MEMORY_MAX_AGE_DAYS = float(os.getenv("CHAT_MEMORY_MAX_AGE_DAYS", "0"))  # ✅ 이보다 오래된 메시지는 개수와 상관없이 요약 (0이면 끔)
+CHAT_MEMORY_SUMMARY_CHUNK = int(os.getenv("CHAT_MEMORY_SUMMARY_CHUNK", "50"))  # ✅ 요약 하나로 묶는 메시지 수
+CHAT_MEMORY_MAX_SUMMARIES = int(os.getenv("CHAT_MEMORY_MAX_SUMMARIES", "200"))  # ✅ 요약이 이보다 많으면 오래된 요약끼리 다시 요약
+CHAT_MEMORY_SUMMARY_FANIN = 10  # ✅ 요약을 다시 요약할 때 한 번에 묶는 요약 수
+CHAT_MEMORY_CHECK_INTERVAL = timedelta(days=1)  # ✅ 기간 기준 압축을 확인하는 최소 간격
+MEMORY_SUMMARY_COLLECTION = "memory_summaries"  # ✅ chats/{chat_id}/memory_summaries
+memory_summarizer = None  # ✅ 처음 압축할 때 생성 (get_summarizer)
+
+# ✅ 임베딩 마이크로 배치 설정
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))  # ✅ 첫 요청 후 다른 요청을 모으는 시간
+EMBEDDING_BATCH_MAX_ITEMS = int(os.getenv("EMBEDDING_BATCH_MAX_ITEMS", "64"))  # ✅ 한 배치에 모을 최대 문장 수
+
+
+class EmbeddingBatcher:
+    """동시에 들어온 인코딩 요청을 짧은 시간 동안 모아 한 번의 embedder.encode로 처리
+
+    각 호출자는 Future를 받아 자신의 결과만 기다린다. 첫 요청이 들어온 뒤
+    window_ms가 지나거나 max_items개가 모이면 배치를 실행한다.
+    """
+
+    def __init__(self, encode_fn, window_ms=EMBEDDING_BATCH_WINDOW_MS, max_items=EMBEDDING_BATCH_MAX_ITEMS):
+        self.encode_fn = encode_fn
+        self.window = window_ms / 1000
+        self.max_items = max_items
+        self.requests = queue.Queue()  # ✅ (문장 목록, Future)
+        self.worker = None
+        self.lock = threading.Lock()
+        self.stats = {"batches": 0, "requests": 0, "texts": 0}
+
+    def submit(self, texts):
+        """인코딩 요청을 큐에 넣고 Future 반환"""
+        future = Future()
+        self.requests.put((list(texts), future))
+        self._ensure_worker()
+        return future
+
+    def encode(self, texts):
+        """배치 처리 결과를 기다려 반환 (embedder.encode 대신 사용)"""
+        return self.submit(texts).result()
+
+    def _ensure_worker(self):
+        """첫 요청 때 배치 작업 스레드 시작 (fork 이후 프로세스마다 새로 생성)"""
+        if self.worker is None or not self.worker.is_alive():
+            with self.lock:
+                if self.worker is None or not self.worker.is_alive():
+                    self.worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self.worker.start()
+
+    def _collect(self):
+        """첫 요청을 기다린 뒤 창(window)이 닫힐 때까지 요청을 더 모음"""
+        batch = [self.requests.get()]
+        count = len(batch[0][0])
+        deadline = time.monotonic() + self.window
+
+        while count < self.max_items:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            count += len(request[0])
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for request_texts, _ in batch for text in request_texts]
+
+            try:
+                vectors = np.asarray(self.encode_fn(texts), dtype=np.float32)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            # ✅ 호출자별로 결과를 잘라서 전달
+            start = 0
+            for request_texts, future in batch:
+                future.set_result(vectors[start:start + len(request_texts)])
+                start += len(request_texts)
+
+            self.stats["batches"] += 1
+            self.stats["requests"] += len(batch)
+            self.stats["texts"] += len(texts)
+
+    def get_stats(self):
+        """배치 처리 통계 (평균 배치 크기 포함)"""
+        stats = dict(self.stats)
+        stats["avg_batch_texts"] = stats["texts"] / stats["batches"] if stats["batches"] else 0.0
+        stats["queue_depth"] = self.requests.qsize()
+        return stats
+
 
-def get_faiss_index_path(chat_id):
+embedding_batcher = EmbeddingBatcher(embedder.encode)  # ✅ 검색/색인 경로의 모든 인코딩이 거쳐감
+
+def get_faiss_data_path(chat_id, suffix, generation=0):
+    """채팅방별 데이터 파일 경로 (재색인할 때마다 세대 번호를 올린 새 파일에 씀, 0세대는 이전 이름 그대로)"""
+    if generation:
+        return os.path.join(FAISS_INDEX_DIR, f"faiss_index_{chat_id}.g{generation}.{suffix}")
+    return os.path.join(FAISS_INDEX_DIR, f"faiss_index_{chat_id}.{suffix}")
+
+def get_faiss_index_path(chat_id, generation=0):
     """채팅방(chat_id)별로 FAISS 벡터 저장 경로 반환"""
-    return os.path.join(FAISS_INDEX_DIR, f"faiss_index_{chat_id}.bin")
+    return get_faiss_data_path(chat_id, "bin", generation)
+
+def get_faiss_meta_path(chat_id):
+    """채팅방별 증분 색인 메타데이터(high-water mark 등) 경로 반환 (세대와 관계없이 하나, 커밋 지점)"""
+    return os.path.join(FAISS_INDEX_DIR, f"faiss_index_{chat_id}.json")
+
+def get_faiss_delta_path(chat_id, generation=0):
+    """채팅방별 증분 벡터(float32) 추가 로그 경로 반환"""
+    return get_faiss_data_path(chat_id, "delta", generation)
+
+def get_faiss_docs_path(chat_id, generation=0):
+    """채팅방별 문서 사이드카(UTF-8 아레나) 경로 반환"""
+    return get_faiss_data_path(chat_id, "docs", generation)
+
+def get_faiss_offsets_path(chat_id, generation=0):
+    """채팅방별 문서 사이드카(레코드 끝 오프셋 배열) 경로 반환"""
+    return get_faiss_data_path(chat_id, "offsets", generation)
+
+def get_faiss_hashes_path(chat_id, generation=0):
+    """채팅방별 문서 해시(int64, 벡터 ID 순서) 경로 반환"""
+    return get_faiss_data_path(chat_id, "hashes", generation)
+
+def get_faiss_dups_path(chat_id, generation=0):
+    """채팅방별 중복 메시지 사이드카(메시지 ID → 대표 메시지 ID) 경로 반환"""
+    return get_faiss_data_path(chat_id, "dups", generation)
+
+def get_faiss_dup_offsets_path(chat_id, generation=0):
+    """채팅방별 중복 메시지 사이드카(레코드 끝 오프셋 배열) 경로 반환"""
+    return get_faiss_data_path(chat_id, "dup_offsets", generation)
+
+def remove_generation_files(chat_id, generation):
+    """한 세대의 데이터 파일을 모두 삭제 (메타데이터는 그대로, 이미 매핑해서 읽고 있는 워커는 영향 없음)"""
+    for suffix in ("bin", "delta", "docs", "offsets", "hashes", "dups", "dup_offsets"):
+        path = get_faiss_data_path(chat_id, suffix, generation)
+        if os.path.exists(path):
+            os.remove(path)
+
+def encode_texts(texts):
+    """문장 목록을 임베딩 (캐시에 있으면 재사용, 없는 것만 마이크로 배치로 인코딩)"""
+    return embedding_cache.get_many(texts, embedding_batcher.encode)
+
+async def encode_texts_async(texts):
+    """encode_texts의 async 버전 (벡터 작업 전용 스레드 풀에서 실행)"""
+    return await vector_executor.run_async(encode_texts, texts)
+
+def get_embedding_cache_stats():
+    """임베딩 캐시 적중/실패 통계 반환"""
+    return embedding_cache.get_stats()
+
+def get_embedding_batcher_stats():
+    """임베딩 마이크로 배치 통계 반환"""
+    return embedding_batcher.get_stats()
+
+def get_vector_executor_stats():
+    """벡터 작업 전용 스레드 풀 통계 반환"""
+    return vector_executor.get_stats()
 
 def ensure_faiss_directory():
     """FAISS 저장 경로가 없으면 자동으로 생성"""
@@ -32,121 +243,828 @@ def ensure_faiss_directory():
         os.makedirs(FAISS_INDEX_DIR)
         # print(f"✅ FAISS 저장 경로 생성됨: {FAISS_INDEX_DIR}")
 
-def save_faiss_index(chat_id, index):
-    """채팅방별 FAISS 벡터 DB를 파일로 저장"""
+def new_faiss_meta():
+    """증분 색인 메타데이터 기본값"""
+    return {
+        "last_timestamp": None,  # ✅ 마지막으로 색인한 메시지의 timestamp (ISO 문자열)
+        "last_doc_ids": [],  # ✅ 같은 timestamp를 가진, 이미 색인한 메시지 ID 목록
+        "ntotal": 0,  # ✅ 커밋된 전체 벡터 개수 (본 인덱스 + 델타)
+        "base_ntotal": 0,  # ✅ .bin 파일에 들어 있는 벡터 개수
+        "docs_bytes": 0,  # ✅ 커밋된 문서 사이드카 아레나 길이 (바이트)
+        "dup_count": 0,  # ✅ 중복이라 저장하지 않은 메시지 수 (중복 사이드카 레코드 수)
+        "dup_bytes": 0,  # ✅ 커밋된 중복 사이드카 아레나 길이 (바이트)
+        "generation": 0,  # ✅ 데이터 파일 세대 (전체 재색인할 때마다 1씩 올린 새 파일에 씀)
+        "version": 0,  # ✅ 커밋할 때마다 1씩 증가
+        "embedding_model": EMBEDDING_MODEL_NAME,  # ✅ 벡터를 만든 임베딩 모델 (바뀌면 전체 재색인)
+        "dimension": dimension  # ✅ 벡터 차원
+    }
+
+def embedding_matches(meta):
+    """메타데이터의 임베딩 모델/차원이 현재 임베딩 백엔드와 같은지 (다르면 저장된 벡터를 쓸 수 없음)"""
+    return meta["embedding_model"] == EMBEDDING_MODEL_NAME and meta["dimension"] == dimension
+
+def read_meta_stamp(chat_id):
+    """메타데이터 파일의 버전 표시 (없으면 None)
+
+    메타데이터는 항상 새 파일로 교체되므로 inode/수정 시각/크기만 비교해도 다른 워커의 커밋을 알 수 있다
+    (파일을 열어 JSON을 읽지 않는 stat 한 번).
+    """
+    try:
+        stat = os.stat(get_faiss_meta_path(chat_id))
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def load_faiss_meta(chat_id):
+    """채팅방별 증분 색인 메타데이터 불러오기 (없으면 None)"""
+    if shard_store is not None:
+        meta = shard_store.get_meta(chat_id)
+        return {**new_faiss_meta(), **LEGACY_EMBEDDING_META, **meta} if meta is not None else None
+
+    meta_path = get_faiss_meta_path(chat_id)
+    if not os.path.exists(meta_path):
+        return None
+
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+
+    return {**new_faiss_meta(), **LEGACY_EMBEDDING_META, **meta}
+
+def save_faiss_meta(chat_id, meta):
+    """메타데이터를 임시 파일에 쓴 뒤 교체 (메타데이터가 증분 색인의 커밋 지점, chat_locks를 잡고 호출)
+
+    이 워커의 캐시 항목이 커밋 전 디스크와 맞았으면(직접 갱신한 항목) 새 버전 표시로 바꾼다.
+    """
+    meta["version"] = meta.get("version", 0) + 1
+    if shard_store is not None:
+        shard_store.set_meta(chat_id, meta)
+        return
+
+    ensure_faiss_directory()
+    meta_path = get_faiss_meta_path(chat_id)
+    previous = read_meta_stamp(chat_id)
+    tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, meta_path)
+    index_cache.restamp(chat_id, previous, read_meta_stamp(chat_id))
+
+def append_delta_vectors(chat_id, meta, vectors):
+    """새 벡터를 델타 로그 끝에 추가 (커밋되지 않은 꼬리는 먼저 잘라냄)"""
+    delta_path = get_faiss_delta_path(chat_id, meta["generation"])
+    committed = (meta["ntotal"] - meta["base_ntotal"]) * dimension * 4
+
+    with open(delta_path, "ab") as f:
+        f.truncate(committed)
+        f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+
+def read_delta_vectors(chat_id, meta, count):
+    """델타 로그에서 커밋된 벡터 중 마지막 count개를 읽음"""
+    delta_path = get_faiss_delta_path(chat_id, meta["generation"])
+    if count <= 0 or not os.path.exists(delta_path):
+        return np.empty((0, dimension), dtype=np.float32)
+
+    committed = meta["ntotal"] - meta["base_ntotal"]
+    vectors = np.fromfile(delta_path, dtype=np.float32, count=committed * dimension)
+    vectors = vectors.reshape(-1, dimension)
+    return vectors[-count:]
+
+def open_chat_docs(chat_id, meta):
+    """문서 사이드카를 메타데이터에 커밋된 범위까지 열기 (Firestore 조회 없음)"""
+    generation = meta["generation"]
+    return DocSidecar(get_faiss_docs_path(chat_id, generation), get_faiss_offsets_path(chat_id, generation), meta["ntotal"], meta["docs_bytes"])
+
+def write_chat_docs(chat_id, meta, docs):
+    """(메시지 ID, 텍스트) 목록으로 메타데이터 세대의 문서 사이드카를 새로 작성"""
+    ensure_faiss_directory()
+    generation = meta["generation"]
+    return DocSidecar.write(get_faiss_docs_path(chat_id, generation), get_faiss_offsets_path(chat_id, generation), docs)
+
+def load_doc_hashes(chat_id, meta, docs):
+    """저장된 문서의 해시 → 문서 ID (캐시 → .hashes 파일 → 문서 사이드카 순, 텍스트를 다시 읽지 않음)"""
+    if shard_store is not None:
+        # ✅ 샤드 백엔드: 메모리에 올린 샤드 해시 로그에서 채팅방 부분만 꺼냄
+        if not docs:
+            return {}
+        doc_ids, values = docs.hashes()
+        return {value: doc_id for doc_id, value in reversed(list(zip(doc_ids.tolist(), values.tolist())))}
+
+    entry = doc_hashes.get(chat_id)
+    if entry is not None and entry["count"] == meta["ntotal"] and entry["generation"] == meta["generation"]:
+        return entry["hashes"]
+
+    hashes_path = get_faiss_hashes_path(chat_id, meta["generation"])
+    if os.path.exists(hashes_path) and os.path.getsize(hashes_path) >= meta["ntotal"] * 8:
+        values = np.fromfile(hashes_path, dtype="<i8", count=meta["ntotal"]).tolist()
+    else:
+        # ✅ 해시 파일이 없는 이전 형식: 문서에서 한 번 계산해서 저장
+        values = [text_hash(text) for text in docs.values()]
+        ensure_faiss_directory()
+        with open(hashes_path, "wb") as f:
+            f.write(np.asarray(values, dtype="<i8").tobytes())
+
+    hashes = {value: doc_id for doc_id, value in reversed(list(enumerate(values)))}  # ✅ 같은 해시는 먼저 저장된 문서가 대표
+    doc_hashes[chat_id] = {"count": meta["ntotal"], "generation": meta["generation"], "hashes": hashes}
+    return hashes
+
+def append_doc_hashes(chat_id, meta, hashes, new_hashes):
+    """새 문서 해시를 .hashes 끝에 추가 (커밋되지 않은 꼬리는 먼저 잘라냄, meta["ntotal"] 갱신 전에 호출)"""
+    if shard_store is not None:
+        return  # ✅ 샤드 백엔드는 shard_store.add가 샤드 해시 로그에 함께 씀
+
+    ensure_faiss_directory()
+    with open(get_faiss_hashes_path(chat_id, meta["generation"]), "ab") as f:
+        f.truncate(meta["ntotal"] * 8)
+        f.write(np.asarray(new_hashes, dtype="<i8").tobytes())
+
+    for i, value in enumerate(new_hashes):
+        hashes.setdefault(value, meta["ntotal"] + i)
+    doc_hashes[chat_id] = {"count": meta["ntotal"] + len(new_hashes), "generation": meta["generation"], "hashes": hashes}
+
+def open_suppressed(chat_id, meta):
+    """중복 메시지 사이드카 열기 (레코드 = 저장하지 않은 메시지 ID + 대표 메시지 ID)"""
+    generation = meta["generation"]
+    return DocSidecar(get_faiss_dups_path(chat_id, generation), get_faiss_dup_offsets_path(chat_id, generation), meta["dup_count"], meta["dup_bytes"])
+
+def record_suppressed(chat_id, meta, suppressed):
+    """중복이라 저장하지 않은 (메시지 ID, 대표 메시지 ID)를 기록 (샤드 백엔드는 메타데이터에 저장)"""
+    if not suppressed:
+        return
+
+    if shard_store is not None:
+        meta.setdefault("suppressed", {}).update(suppressed)
+        meta["dup_count"] = len(meta["suppressed"])
+        return
+
+    ensure_faiss_directory()
+    dups = open_suppressed(chat_id, meta)
+    dups.append(suppressed)
+    meta["dup_count"], meta["dup_bytes"] = len(dups), dups.arena_bytes
+
+def resolve_message_doc(chat_id, message_id):
+    """메시지 ID → 저장된 문서(벡터) ID (중복이라 저장하지 않은 메시지는 대표 메시지의 문서, 없으면 None)"""
+    meta = load_faiss_meta(chat_id)
+    if meta is None:
+        return None
+
+    if shard_store is not None:
+        message_id = meta.get("suppressed", {}).get(message_id, message_id)
+        docs = shard_store.chat_docs(chat_id)
+        return docs.find_message(message_id) if docs else None
+
+    _, docs = get_chat_index(chat_id)
+    entry = load_message_docs(chat_id, docs, open_suppressed(chat_id, meta), meta["generation"])
+    message_id = entry["dups"].get(message_id, message_id)
+    return entry["ids"].get(message_id)
+
+def load_message_docs(chat_id, docs, dups, generation):
+    """채팅방의 메시지 ID → 문서 ID, 중복 메시지 ID → 대표 메시지 ID (문서 사이드카 옆에 두는 맵)
+
+    캐시에 있으면 지난번 이후 늘어난 문서/중복 레코드만 이어서 읽으므로 메시지마다 문서 전체를 훑지 않는다.
+    """
+    entry = message_docs.get(chat_id)
+    if entry is None or entry["generation"] != generation or entry["count"] > len(docs):
+        entry = {"count": 0, "dup_count": 0, "generation": generation, "ids": {}, "dups": {}}
+
+    for doc_id in range(entry["count"], len(docs)):
+        entry["ids"].setdefault(docs.get_message_id(doc_id), doc_id)
+    for i in range(entry["dup_count"], len(dups)):
+        suppressed_id, canonical_id = dups.get_record(i)
+        entry["dups"][suppressed_id] = canonical_id
+    entry["count"], entry["dup_count"] = len(docs), len(dups)
+
+    message_docs[chat_id] = entry
+    return entry
+
+def quantize_faiss_index(index, factory=None):
+    """Flat 인덱스가 임계값을 넘으면 FAISS_INDEX_FACTORY 형식으로 학습해 변환 (이미 변환된 인덱스는 그대로)
+
+    한 번 학습된 인덱스는 이후 병합 때 새 벡터만 추가하므로 다시 학습하지 않는다.
+    """
+    factory = factory or FAISS_INDEX_FACTORY
+    if factory == "Flat" or index.ntotal < FAISS_INDEX_TRAIN_THRESHOLD or not isinstance(index, faiss.IndexFlat):
+        return index
+
+    vectors = index.reconstruct_n(0, index.ntotal)
+    quantized = faiss.index_factory(index.d, factory)
+    quantized.train(vectors)
+    quantized.add(vectors)
+    return quantized
+
+def open_base_index(chat_id, generation=0):
+    """본 인덱스(.bin) 열기 (FAISS_MMAP이면 읽기 전용 memmap + 메모리 델타 인덱스)"""
+    index_path = get_faiss_index_path(chat_id, generation)
+    if not FAISS_MMAP:
+        return faiss.read_index(index_path) if os.path.exists(index_path) else faiss.IndexFlatL2(dimension)
+
+    base = read_index_mmap(index_path) if os.path.exists(index_path) else faiss.IndexFlatL2(dimension)
+    return LayeredIndex(base, index_path)
+
+def cache_chat_index(chat_id, index, docs, stamp=None):
+    """인덱스와 문서를 캐시에 넣고 doc_store를 캐시 내용과 맞춤 (stamp: 읽기 시작할 때의 메타데이터 버전 표시)"""
+    index_cache.put(chat_id, index, docs, stamp if stamp is not None else read_meta_stamp(chat_id))
+    if chat_id in index_cache.entries:
+        doc_store[chat_id] = docs
+
+def save_faiss_index(chat_id, index, docs=None, generation=0):
+    """채팅방별 FAISS 벡터 DB를 파일로 저장 (캐시도 함께 갱신)
+
+    메타데이터를 커밋하기 전에 호출하며, 캐시 항목은 커밋할 때 새 버전 표시를 받는다.
+    """
+    if shard_store is not None:
+        # ✅ 샤드 백엔드: 채팅방 벡터를 통째로 교체 (문서가 없으면 메시지 ID 없이 저장)
+        shard_store.delete(chat_id)
+        vectors = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.empty((0, dimension), dtype=np.float32)
+        records = [docs.get_record(i) if hasattr(docs, "get_record") else ("", docs[i]) for i in range(index.ntotal)] if docs else []
+        shard_store.add(chat_id, vectors[:len(records)], records)
+        return
+
     ensure_faiss_directory()  # ✅ 경로 확인 후 생성
-    faiss.write_index(index, get_faiss_index_path(chat_id))
+    write_index_atomic(index, get_faiss_index_path(chat_id, generation))  # ✅ 다른 워커가 매핑 중인 파일을 덮어쓰지 않음
     # print(f"✅ FAISS 인덱스 저장 완료! ({chat_id})")
 
-def load_faiss_index(chat_id):
-    """채팅방별 FAISS 벡터 DB를 파일에서 불러오기"""
+    if FAISS_MMAP:
+        index = open_base_index(chat_id, generation)  # ✅ 방금 저장한 파일을 매핑해서 캐시 (메모리 복사본은 버림)
+
+    # ✅ write-through: 문서를 모르면 캐시 항목을 무효화
+    if docs is None:
+        index_cache.pop(chat_id)
+    else:
+        cache_chat_index(chat_id, index, docs)
+
+def merge_faiss_delta(chat_id, meta):
+    """델타 로그를 본 인덱스(.bin)에 병합하고 델타 로그를 비움
+
+    새 본 인덱스는 교체로 저장하고 메타데이터를 커밋한 뒤에 델타 로그를 지운다. 그 사이에 읽은 워커는
+    읽기 전후의 버전 표시가 달라서 다시 읽는다.
+    """
+    with chat_locks.hold(chat_id):
+        index, docs = get_chat_index(chat_id)
+        if isinstance(index, LayeredIndex):
+            index = index.to_index()  # ✅ 매핑된 본 인덱스에는 쓸 수 없으므로 복사본에 델타를 합침
+        index = quantize_faiss_index(index)  # ✅ 크기가 임계값을 넘은 채팅방은 이때 양자화
+        save_faiss_index(chat_id, index, docs, meta["generation"])
+
+        meta["base_ntotal"] = index.ntotal
+        save_faiss_meta(chat_id, meta)
+
+        delta_path = get_faiss_delta_path(chat_id, meta["generation"])
+        if os.path.exists(delta_path):
+            os.remove(delta_path)
+
+def read_faiss_index(chat_id):
+    """디스크에서 채팅방 인덱스와 문서를 읽음 (저장된 인덱스가 없으면 None)"""
     index_path = get_faiss_index_path(chat_id)
+    meta = load_faiss_meta(chat_id)
+
+    if meta is not None:
+        if not embedding_matches(meta):
+            return None  # ✅ 다른 임베딩 모델로 만든 인덱스 (다음 색인 때 전체 재색인)
+
+        # ✅ 본 인덱스 + 델타 로그 + 문서 로그로 복원 (Firestore 조회 없음)
+        index = open_base_index(chat_id, meta["generation"])
+        delta = read_delta_vectors(chat_id, meta, meta["ntotal"] - index.ntotal)
+        if len(delta):
+            index.add(delta)
+
+        return index, open_chat_docs(chat_id, meta)
 
     if os.path.exists(index_path):
-        index = faiss.read_index(index_path)
+        index = open_base_index(chat_id)
+        if index.d != dimension:
+            return None  # ✅ 다른 임베딩 모델로 만든 이전 형식 인덱스
         # print(f"✅ FAISS 인덱스 로드 완료! ({chat_id}) 저장된 개수: {index.ntotal}")
 
-        # ✅ doc_store 동기화
-        if chat_id not in doc_store:
-            doc_store[chat_id] = {}
-        
+        # ✅ doc_store 동기화 (메타데이터가 없는 이전 형식의 인덱스)
+        docs = {}
         messages_ref = db.collection(f"chats/{chat_id}/messages").stream()
         for msg in messages_ref:
             msg_data = msg.to_dict()
             text = msg_data["content"]
-            doc_id = len(doc_store[chat_id])
-            doc_store[chat_id][doc_id] = text  # Firestore 데이터와 동기화
-        
-        return index
-    else:
-        return faiss.IndexFlatL2(dimension)
-    
+            doc_id = len(docs)
+            docs[doc_id] = text  # Firestore 데이터와 동기화
+
+        return index, docs
+
+    return None
+
+def get_index_version(chat_id):
+    """채팅방 인덱스 버전 (색인/병합/압축/삭제하거나 다른 워커가 커밋하면 바뀜, 검색 결과 캐시 키)"""
+    if shard_store is not None:
+        return shard_store.chat_version(chat_id)
+    return read_meta_stamp(chat_id)
+
+def get_cached_index(chat_id):
+    """캐시 항목 반환 (다른 워커가 커밋해서 버전 표시가 달라졌으면 버리고 None)"""
+    entry = index_cache.get(chat_id)
+    if entry is not None and entry["stamp"] != read_meta_stamp(chat_id):
+        index_cache.invalidate(chat_id)
+        return None
+    return entry
+
+def get_chat_index(chat_id):
+    """채팅방 인덱스와 문서 반환 (캐시에 있으면 디스크/Firestore 조회 없이 반환)
+
+    디스크에서 읽을 때는 잠그지 않고, 읽기 전후의 메타데이터 버전 표시가 같을 때까지 다시 읽는다
+    (다른 워커가 그 사이에 커밋하거나 이전 세대 파일을 지운 경우).
+    """
+    entry = get_cached_index(chat_id)
+    if entry is not None:
+        return entry["index"], entry["docs"]
+
+    for attempt in range(FAISS_READ_RETRIES):
+        stamp = read_meta_stamp(chat_id)
+        try:
+            loaded = read_faiss_index(chat_id)
+        except (OSError, RuntimeError, ValueError):
+            if attempt + 1 == FAISS_READ_RETRIES or read_meta_stamp(chat_id) == stamp:
+                raise
+            continue
+        if read_meta_stamp(chat_id) == stamp:
+            break
+
+    if loaded is None:
+        return faiss.IndexFlatL2(dimension), {}
+
+    index, docs = loaded
+    with index_cache.lock:
+        # ✅ 읽는 사이 다른 스레드(미리 불러오기 등)가 먼저 캐시에 넣었으면 그것을 사용
+        entry = index_cache.entries.get(chat_id)
+        if entry is not None and entry["stamp"] == stamp:
+            return entry["index"], entry["docs"]
+        cache_chat_index(chat_id, index, docs, stamp)
+    return index, docs
+
+def search_chat_index(chat_id, query_vectors, k):
+    """채팅방 안에서 검색 → (거리, 벡터 ID, 문서) (저장 방식에 관계없이 같은 형태)"""
+    if shard_store is not None:
+        return shard_store.search(chat_id, query_vectors, k)
+
+    index, docs = get_chat_index(chat_id)
+    if index.ntotal == 0:
+        return np.empty((len(query_vectors), 0), dtype=np.float32), np.empty((len(query_vectors), 0), dtype=np.int64), docs
+    scores, indices = index.search(query_vectors, min(k, index.ntotal))
+    return scores, indices, docs
+
+def load_faiss_index(chat_id):
+    """채팅방별 FAISS 벡터 DB를 불러오기 (캐시 → 파일 순)"""
+    if shard_store is not None:
+        return shard_store.chat_index(chat_id)
+
+    index, _ = get_chat_index(chat_id)
+    return index
+
+def get_index_cache_stats():
+    """FAISS 인덱스 캐시 적중/실패/제거 통계 반환"""
+    return index_cache.get_stats()
+
+def get_query_cache_stats():
+    """검색 결과 캐시 적중/실패/버전 불일치 통계 반환"""
+    return query_cache.get_stats()
+
 def load_existing_faiss_indices():
-    """서버 시작 시 저장된 모든 FAISS 인덱스를 불러옴"""
+    """서버 시작 시 저장된 모든 FAISS 인덱스를 불러옴 (FAISS_EAGER_LOAD=1일 때만 사용)"""
     if not os.path.exists(FAISS_INDEX_DIR):
         print(f"⚠️ FAISS 인덱스 디렉토리가 존재하지 않음: {FAISS_INDEX_DIR}")
         return
 
     for file in os.listdir(FAISS_INDEX_DIR):
-        if file.endswith(".bin"):
-            chat_id = file.replace("faiss_index_", "").replace(".bin", "")
+        # ✅ 메타데이터가 있는 채팅방 + 메타데이터 없는 이전 형식 인덱스 (세대 번호가 붙은 파일은 메타데이터로 찾음)
+        chat_id = file.replace("faiss_index_", "").rsplit(".", 1)[0]
+        if file.endswith(".json") or (file.endswith(".bin") and not os.path.exists(get_faiss_meta_path(chat_id))):
             load_faiss_index(chat_id)
             print(f"✅ 기존 FAISS 인덱스 로드 완료: {chat_id}")
 
+def prefetch_recent_faiss_indices(limit=FAISS_PREFETCH_CHATS):
+    """최근 활동(last_active_at) 순으로 채팅방 인덱스를 미리 캐시에 올림
+
+    저장된 인덱스가 없는 채팅방은 건너뛰고, 인덱스 캐시가 거의 차면 멈춘다.
+    진행 상황은 warmup_status에 기록된다.
+    """
+    warmup_status.update({"state": "running", "total": 0, "loaded": 0, "skipped": 0, "started_at": time.time(), "finished_at": None})
+
+    try:
+        chats_ref = db.collection("chats") \
+            .order_by("last_active_at", direction=firestore.Query.DESCENDING) \
+            .limit(limit) \
+            .stream()
+        chat_ids = [chat.id for chat in chats_ref]
+        warmup_status["total"] = len(chat_ids)
+
+        for chat_id in chat_ids:
+            if shard_store is not None:
+                shard_store.chat_docs(chat_id)  # ✅ 채팅방이 속한 샤드를 메모리에 올림
+                warmup_status["loaded"] += 1
+                continue
+            if index_cache.bytes >= index_cache.max_bytes * FAISS_PREFETCH_CACHE_RATIO:
+                break
+            if chat_id in index_cache.entries or not (os.path.exists(get_faiss_meta_path(chat_id)) or os.path.exists(get_faiss_index_path(chat_id))):
+                warmup_status["skipped"] += 1
+                continue
+
+            get_chat_index(chat_id)
+            warmup_status["loaded"] += 1
+
+        warmup_status["state"] = "done"
+    except Exception as e:
+        print(f"🚨 FAISS 인덱스 미리 불러오기 실패: {str(e)}")
+        warmup_status["state"] = "failed"
+    finally:
+        warmup_status["finished_at"] = time.time()
+
+def start_faiss_prefetch(limit=FAISS_PREFETCH_CHATS):
+    """서버가 요청을 받기 시작한 뒤 백그라운드 스레드에서 인덱스 미리 불러오기"""
+    if limit <= 0 or warmup_status["state"] == "running":
+        return
+
+    warmup_status["state"] = "running"
+    threading.Thread(target=prefetch_recent_faiss_indices, args=(limit,), name="faiss-prefetch", daemon=True).start()
+
+def get_warmup_status():
+    """FAISS 인덱스 워밍업 진행 상황 반환"""
+    status = dict(warmup_status)
+    status["mode"] = "eager" if FAISS_EAGER_LOAD else "lazy"
+    status["cached_chats"] = len(index_cache.entries)
+    return status
+
 def delete_faiss_index(chat_id):
     """채팅방 삭제 시 FAISS 벡터 파일도 삭제"""
-    index_path = get_faiss_index_path(chat_id)
-    
-    if os.path.exists(index_path):
-        os.remove(index_path)
-        print(f"🗑️ FAISS 인덱스 삭제 완료: {index_path}")
-    else:
-        print(f"⚠️ FAISS 인덱스 없음, 삭제 불필요: {index_path}")
+    with chat_locks.hold(chat_id):
+        if shard_store is not None:
+            shard_store.delete(chat_id)
+            user_profiles.pop(chat_id, None)
+            profile_store.delete(chat_id)
+            delete_memory_summaries(chat_id)
+            query_cache.forget(chat_id)
+            print(f"🗑️ FAISS 샤드에서 채팅방 벡터 삭제 완료: {chat_id}")
+            return
 
+        meta = load_faiss_meta(chat_id)
+        generation = meta["generation"] if meta else 0
+        index_path = get_faiss_index_path(chat_id, generation)
+        index_exists = os.path.exists(index_path)
 
-def store_chat_in_faiss(chat_id, charac_id):
-    """Firestore에서 채팅 기록을 가져와 FAISS에 저장 (사용자 및 AI 정보 포함)"""
+        # ✅ 메타데이터(커밋 지점)를 먼저 지워서 다른 워커가 더 이상 읽지 않게 한 뒤 세대별 파일 삭제
+        # (실패한 재색인이 남겼을 수 있는 다음 세대와 이전 형식 0세대 파일까지)
+        if os.path.exists(get_faiss_meta_path(chat_id)):
+            os.remove(get_faiss_meta_path(chat_id))
+        for stale_generation in {0, generation, generation + 1}:
+            remove_generation_files(chat_id, stale_generation)
+        index_cache.pop(chat_id)
+        doc_hashes.pop(chat_id, None)
+        message_docs.pop(chat_id, None)
+        user_profiles.pop(chat_id, None)
+        profile_store.delete(chat_id)
+        delete_memory_summaries(chat_id)
+        query_cache.forget(chat_id)
+
+        if index_exists:
+            print(f"🗑️ FAISS 인덱스 삭제 완료: {index_path}")
+        else:
+            print(f"⚠️ FAISS 인덱스 없음, 삭제 불필요: {index_path}")
+
+
+def store_chat_in_faiss(chat_id, charac_id, rebuild=False):
+    """Firestore에서 아직 색인하지 않은 채팅 기록만 가져와 FAISS에 추가 (사용자 및 AI 정보 포함)
+
+    마지막으로 색인한 메시지(high-water mark) 이후의 메시지만 임베딩해서 델타 로그에 덧붙이므로,
+    대화가 길어져도 한 턴의 비용은 새 메시지 개수에만 비례한다.
+    메타데이터가 없거나, 다른 임베딩 모델로 만들었거나, rebuild=True이면 처음부터 전체를 다시 색인한다.
+    압축된 채팅방은 요약(memory_summaries)과 마지막 요약 이후의 메시지로 다시 색인한다.
+    커밋한 메타데이터를 반환한다.
+    """
     global user_profiles, character_profiles  # ✅ 글로벌 변수 보장
 
-    index = faiss.IndexFlatL2(dimension)  # ✅ 새로운 FAISS 인덱스 생성
-    doc_store.setdefault(chat_id, {})  # ✅ 문장 저장소 초기화
-    user_profiles.setdefault(chat_id, {})  # ✅ 사용자 정보 기본값 설정
-    character_profiles.setdefault(charac_id, {})  # ✅ 캐릭터 정보 기본값 설정
+    with chat_locks.hold(chat_id):  # ✅ 같은 채팅방은 한 번에 한 스레드/워커만 색인
+        previous = load_faiss_meta(chat_id)
+        # ✅ 임베딩 모델이 바뀌었으면 기존 벡터와 섞지 않고 전체 재색인
+        meta = None if rebuild or (previous is not None and not embedding_matches(previous)) else previous
+        full_rebuild = meta is None
+        compaction = previous.get("compaction") if full_rebuild and previous else None  # ✅ 재색인해도 압축 기록은 유지
 
-    messages_ref = db.collection(f"chats/{chat_id}/messages").order_by("timestamp").stream()
+        if shard_store is not None:
+            # ✅ 샤드 백엔드: 재색인이면 채팅방 벡터를 지우고, 아니면 저장된 문서로 중복 확인
+            if full_rebuild:
+                shard_store.delete(chat_id)
+                meta = new_faiss_meta()
+            docs = shard_store.chat_docs(chat_id)
+            hashes = load_doc_hashes(chat_id, meta, docs)
+        elif full_rebuild:
+            # ✅ 재색인은 다음 세대 파일에 쓰고 메타데이터 커밋으로 한 번에 바꿈 (커밋 전까지 다른 워커는 이전 세대를 읽음)
+            meta = new_faiss_meta()
+            if previous is not None:
+                meta["generation"], meta["version"] = previous["generation"] + 1, previous["version"]
+            cached = None
+            docs = {}
+            doc_hashes.pop(chat_id, None)
+            hashes = {}
+        else:
+            # ✅ 캐시된 인덱스가 있으면 그대로 이어서 추가 (write-through, 다른 워커가 바꾼 캐시는 버림)
+            cached = get_cached_index(chat_id)
+            if cached is not None and len(cached["docs"]) != meta["ntotal"]:
+                index_cache.pop(chat_id)  # ✅ 디스크와 어긋난 캐시 항목은 버림
+                cached = None
+            docs = cached["docs"] if cached is not None else open_chat_docs(chat_id, meta)
+            hashes = load_doc_hashes(chat_id, meta, docs)  # ✅ 저장된 문장과 같은지는 해시로만 확인
 
-    vectors = []  # ✅ 벡터 저장 리스트
-    texts = []  # ✅ 원본 텍스트 저장 리스트
+        # ✅ 이전 형식 메타데이터에 들어 있던 사용자/캐릭터 정보는 채팅방 프로필 문서로 옮김
+        if "user_profile" in meta:
+            profile_store.update(chat_id, meta.pop("user_profile"), meta.pop("character_profile", {}))
+        user_slots, charac_slots = {}, {}  # ✅ 이번에 새 메시지에서 추출한 정보
 
-    for msg in messages_ref:
-        msg_data = msg.to_dict()
-        text = msg_data["content"]
-
-        # ✅ 사용자 정보 저장 (패턴 기반 추출)
-        user_patterns = {
-            "정체성": r"나는 (.+?)(야|이야|해)",
-            "취미": r"내 취미는 (.+?)(야|이야)",
-            "직업": r"내 직업은 (.+?)(야|이야)",
-            "사는 곳": r"내가 사는 곳은 (.+?)(야|이야)",
-            "나이": r"나는 (\d+)살(이야|야)",
-            "MBTI": r"내 MBTI는 (.+?)(야|이야)"
-        }
-
-        for key, pattern in user_patterns.items():
-            match = re.search(pattern, text)  # ✅ `re.search()`로 문장 내 전체 검색
-            if match:
-                value = match.group(1).strip()
-                user_profiles[chat_id][key] = value
-                # print(f"✅ 사용자 정보 저장: {key} = {value}")
-
-        # ✅ AI 캐릭터 정보 저장
-        charac_patterns = {
-            "성향": r"(넌|너는) (.+?)(야|이야|하는 걸 좋아해)"
-        }
-        for key, pattern in charac_patterns.items():
-            match = re.search(pattern, text)
-            if match:
-                value = match.group(2).strip()
-                character_profiles[charac_id][key] = value
-                # print(f"✅ 캐릭터 정보 저장: {key} = {value}")
-
-        # ✅ FAISS에 저장할 문장 벡터화
-        if text not in texts:  # ✅ 중복 방지
-            texts.append(text)
-            vector = model.encode([text])[0]  # ✅ 문장 벡터 생성
-            vectors.append(vector)
-
-    # ✅ FAISS 인덱스에 벡터 추가
-    if vectors:
-        vectors = np.array(vectors, dtype=np.float32)
-        faiss.normalize_L2(vectors)  # ✅ 벡터 정규화
-        index.add(vectors)
-        for i, text in enumerate(texts):
-            doc_store[chat_id][i] = text
-
-    # ✅ FAISS 인덱스 저장
-    save_faiss_index(chat_id, index)
-    # print(f"✅ FAISS 저장 완료! (chat_id={chat_id}) 저장된 문장 개수: {index.ntotal}")
+        new_docs = []  # ✅ 새로 색인할 (메시지 ID, 텍스트) 리스트
+        new_hashes = []  # ✅ new_docs 문장의 해시
+        near_dup_candidates = []  # ✅ new_docs 문장이 유사 중복 비교 대상인지
+        batch_hashes = {}  # ✅ 이번에 모은 문장의 해시 → new_docs 위치
+        suppressed = []  # ✅ 중복이라 저장하지 않은 (메시지 ID, 대표 메시지 ID)
+
+        if full_rebuild:
+            # ✅ 압축된 채팅방: 요약을 먼저 넣고, 마지막 요약이 덮는 메시지 다음부터 색인
+            if compaction:
+                meta["compaction"] = compaction
+            summaries = load_memory_summaries(chat_id)
+            for summary in summaries:
+                digest = text_hash(summary["content"])
+                batch_hashes.setdefault(digest, len(new_docs))
+                new_docs.append((f"summary:{summary['id']}", summary["content"]))
+                new_hashes.append(digest)
+                near_dup_candidates.append(False)
+            if summaries:
+                meta["last_timestamp"] = summaries[-1]["end_at"].isoformat()
+                meta["last_doc_ids"] = list(summaries[-1]["end_ids"])
+
+        messages_ref = db.collection(f"chats/{chat_id}/messages").order_by("timestamp")
+        if meta["last_timestamp"]:
+            # ✅ high-water mark 이후 메시지만 조회 (같은 timestamp는 이미 색인한 ID로 걸러냄)
+            messages_ref = messages_ref.start_at({"timestamp": datetime.fromisoformat(meta["last_timestamp"])})
+        indexed_ids = set(meta["last_doc_ids"])
+
+        for msg in messages_ref.stream():
+            if msg.id in indexed_ids:
+                continue
+
+            msg_data = msg.to_dict()
+            text = msg_data["content"]
+
+            # ✅ 새 메시지에서만 사용자/캐릭터 정보 추출 (미리 컴파일한 패턴)
+            found_user, found_charac = extract_profile_slots(text)
+            user_slots.update(found_user)
+            charac_slots.update(found_charac)
+
+            # ✅ FAISS에 저장할 문장 수집 (완전히 같은 문장은 해시로 걸러내고 대표 메시지만 기록)
+            digest = text_hash(text)
+            if digest in hashes:
+                suppressed.append((msg.id, docs.get_message_id(hashes[digest])))
+            elif digest in batch_hashes:
+                suppressed.append((msg.id, new_docs[batch_hashes[digest]][0]))
+            else:
+                batch_hashes[digest] = len(new_docs)
+                new_docs.append((msg.id, text))
+                new_hashes.append(digest)
+                near_dup_candidates.append(is_near_dup_candidate(msg_data))
+
+            # ✅ high-water mark 갱신
+            timestamp = msg_data.get("timestamp")
+            if timestamp is not None:
+                timestamp = timestamp.isoformat()
+                if timestamp != meta["last_timestamp"]:
+                    meta["last_timestamp"] = timestamp
+                    meta["last_doc_ids"] = []
+                meta["last_doc_ids"].append(msg.id)
+                indexed_ids.add(msg.id)
+
+        # ✅ 새 문장만 한 번에 벡터화
+        if new_docs:
+            vectors = encode_texts([text for _, text in new_docs])
+            faiss.normalize_L2(vectors)  # ✅ 벡터 정규화
+        else:
+            vectors = np.empty((0, dimension), dtype=np.float32)
+
+        # ✅ 거의 같은 문장(반복되는 AI 응답 등)은 저장하지 않음 (FAISS_NEAR_DUP_THRESHOLD > 0일 때)
+        if FAISS_NEAR_DUP_THRESHOLD > 0 and new_docs:
+            search_existing = (lambda query_vectors, k: search_chat_index(chat_id, query_vectors, k)[:2]) if meta["ntotal"] else None
+            near_duplicates = find_near_duplicates(vectors, near_dup_candidates, search_existing)
+            if shard_store is None and not full_rebuild and cached is None:
+                # ✅ 기존 인덱스를 검색하며 캐시에 올렸으면 그 항목에 이어서 추가
+                cached = get_cached_index(chat_id)
+                if cached is not None:
+                    docs = cached["docs"]
+            if near_duplicates:
+                for position, (kind, target) in sorted(near_duplicates.items()):
+                    canonical_id = docs.get_message_id(target) if kind == "doc" else new_docs[target][0]
+                    suppressed.append((new_docs[position][0], canonical_id))
+                keep = [position for position in range(len(new_docs)) if position not in near_duplicates]
+                new_docs = [new_docs[position] for position in keep]
+                new_hashes = [new_hashes[position] for position in keep]
+                vectors = vectors[keep]
+
+        if shard_store is not None:
+            # ✅ 샤드 델타에 추가 (병합은 샤드 단위로 처리, 문장 해시도 샤드 해시 로그에 함께 저장)
+            shard_store.add(chat_id, vectors, new_docs, new_hashes)
+            meta["ntotal"] += len(new_docs)
+        elif full_rebuild:
+            # ✅ 전체 재색인: 새 세대에 인덱스와 사이드카 작성 (실패한 재색인이 남긴 같은 세대 파일은 먼저 지움)
+            ensure_faiss_directory()
+            remove_generation_files(chat_id, meta["generation"])
+            index = faiss.IndexFlatL2(dimension)  # ✅ 새로운 FAISS 인덱스 생성
+            index.add(vectors)
+            index = quantize_faiss_index(index)
+            append_doc_hashes(chat_id, meta, hashes, new_hashes)
+            docs = write_chat_docs(chat_id, meta, new_docs)
+            save_faiss_index(chat_id, index, docs, meta["generation"])
+            meta["base_ntotal"] = index.ntotal
+            meta["ntotal"], meta["docs_bytes"] = len(docs), docs.arena_bytes
+        elif new_docs:
+            # ✅ 증분 색인: 새 벡터는 델타 로그에, 문서는 사이드카 끝에 추가
+            ensure_faiss_directory()
+            append_delta_vectors(chat_id, meta, vectors)
+            append_doc_hashes(chat_id, meta, hashes, new_hashes)
+            docs = docs.extended(new_docs)
+            meta["ntotal"], meta["docs_bytes"] = len(docs), docs.arena_bytes
+            if cached is not None:
+                # ✅ copy-on-write: 다른 스레드가 검색 중인 캐시 인덱스/문서는 바꾸지 않고 새 항목으로 교체
+                index = cached["index"] if isinstance(cached["index"], LayeredIndex) else LayeredIndex(cached["index"])
+                cache_chat_index(chat_id, index.with_vectors(vectors), docs, cached["stamp"])
+
+        record_suppressed(chat_id, meta, suppressed)
+        save_faiss_meta(chat_id, meta)  # ✅ 커밋
+        if shard_store is None and full_rebuild and previous is not None:
+            remove_generation_files(chat_id, previous["generation"])  # ✅ 이전 세대는 커밋 뒤에 삭제 (읽던 워커는 다시 읽음)
+
+        # ✅ 바뀐 정보만 프로필 문서에 저장 (전역 dict는 캐시된 프로필을 그대로 가리킴)
+        profile_store.update(chat_id, user_slots, charac_slots)
+        profile = profile_store.get(chat_id)
+        user_profiles[chat_id] = profile["user"]
+        character_profiles.setdefault(charac_id, {}).update(profile["character"])
+        # print(f"✅ FAISS 저장 완료! (chat_id={chat_id}) 저장된 문장 개수: {meta['ntotal']}")
+
+        # ✅ 델타 로그가 커지면 본 인덱스에 병합
+        if shard_store is None and meta["ntotal"] - meta["base_ntotal"] >= FAISS_DELTA_MERGE_THRESHOLD:
+            merge_faiss_delta(chat_id, meta)
+
+        return meta
+
+async def store_chat_in_faiss_async(chat_id, charac_id, rebuild=False):
+    """store_chat_in_faiss의 async 버전 (임베딩/인덱스 추가/저장을 이벤트 루프 밖에서 실행)"""
+    return await vector_executor.run_async(store_chat_in_faiss, chat_id, charac_id, rebuild)
+
+def load_memory_summaries(chat_id):
+    """채팅방 메모리 요약 목록 (덮는 메시지가 오래된 순)"""
+    summaries_ref = db.collection(f"chats/{chat_id}/{MEMORY_SUMMARY_COLLECTION}").order_by("start_at")
+    return [{"id": summary.id, **summary.to_dict()} for summary in summaries_ref.stream()]
+
+def delete_memory_summaries(chat_id):
+    """채팅방 삭제 시 메모리 요약도 삭제"""
+    for summary in db.collection(f"chats/{chat_id}/{MEMORY_SUMMARY_COLLECTION}").stream():
+        summary.reference.delete()
+
+def get_memory_summarizer():
+    """요약 백엔드 (처음 쓸 때 생성)"""
+    global memory_summarizer
+    if memory_summarizer is None:
+        memory_summarizer = get_summarizer()
+    return memory_summarizer
+
+def add_memory_summary(chat_id, content, covered, level=0):
+    """요약 문서 저장 (covered: 요약이 덮는 항목, 각각 start_at/end_at/end_ids/message_count 포함)"""
+    summary = {
+        "content": content,
+        "start_at": covered[0]["start_at"],
+        "end_at": covered[-1]["end_at"],
+        "end_ids": covered[-1]["end_ids"],  # ✅ end_at과 timestamp가 같은, 요약에 들어간 메시지 ID
+        "message_count": sum(item["message_count"] for item in covered),
+        "level": level,  # ✅ 0: 메시지 요약, 1 이상: 요약의 요약
+        "created_at": firestore.SERVER_TIMESTAMP
+    }
+    _, summary_ref = db.collection(f"chats/{chat_id}/{MEMORY_SUMMARY_COLLECTION}").add(summary)
+    return {"id": summary_ref.id, **summary}
+
+def roll_up_memory_summaries(chat_id, summaries):
+    """요약이 CHAT_MEMORY_MAX_SUMMARIES개를 넘으면 가장 오래된 요약끼리 묶어 다시 요약"""
+    summarizer = get_memory_summarizer()
+    while len(summaries) > CHAT_MEMORY_MAX_SUMMARIES:
+        group = summaries[:max(2, min(CHAT_MEMORY_SUMMARY_FANIN, len(summaries) - CHAT_MEMORY_MAX_SUMMARIES + 1))]
+        merged = add_memory_summary(
+            chat_id, summarizer.summarize([summary["content"] for summary in group]), group,
+            level=max(summary.get("level", 0) for summary in group) + 1
+        )
+        for summary in group:
+            db.collection(f"chats/{chat_id}/{MEMORY_SUMMARY_COLLECTION}").document(summary["id"]).delete()
+        summaries = [merged] + summaries[len(group):]
+    return summaries
+
+def memory_compaction_due(meta):
+    """메모리 압축이 필요한지 메타데이터만 보고 판단 (Firestore 조회 없음)"""
+    if not CHAT_MEMORY_COMPACTION or meta is None:
+        return False
+
+    stats = meta.get("compaction", {})
+    messages = meta["ntotal"] - stats.get("summaries", 0)  # ✅ 인덱스에 들어 있는 (요약이 아닌) 메시지 수
+    if messages >= CHAT_MEMORY_RECENT_MESSAGES + CHAT_MEMORY_SUMMARY_CHUNK:
+        return True
+
+    if CHAT_MEMORY_MAX_AGE_DAYS > 0 and messages >= CHAT_MEMORY_SUMMARY_CHUNK:
+        checked_at = stats.get("checked_at")
+        return checked_at is None or datetime.now(timezone.utc) - datetime.fromisoformat(checked_at) >= CHAT_MEMORY_CHECK_INTERVAL
+    return False
+
+def compact_chat_memory(chat_id, charac_id):
+    """오래된 메시지를 요약으로 묶고, 인덱스를 요약 + 최근 메시지로 다시 만듦
+
+    이미 색인한 메시지(high-water mark까지) 중 최근 CHAT_MEMORY_RECENT_MESSAGES개를 넘거나
+    CHAT_MEMORY_MAX_AGE_DAYS보다 오래된 메시지를 CHAT_MEMORY_SUMMARY_CHUNK개씩 요약한다.
+    새로 임베딩하는 것은 요약뿐이고 최근 메시지 벡터는 임베딩 캐시에서 가져온다.
+    Firestore의 대화 기록은 지우지 않는다. 압축 통계를 메타데이터 "compaction"에 기록해 반환한다.
+    """
+    with chat_locks.hold(chat_id):
+        started = time.perf_counter()
+        meta = load_faiss_meta(chat_id)
+        if meta is None or not meta["last_timestamp"]:
+            return None
+
+        summaries = load_memory_summaries(chat_id)
+        messages_ref = db.collection(f"chats/{chat_id}/messages").order_by("timestamp")
+        covered_ids = set()
+        if summaries:
+            messages_ref = messages_ref.start_at({"timestamp": summaries[-1]["end_at"]})
+            covered_ids = set(summaries[-1]["end_ids"])
+
+        high_water_mark = datetime.fromisoformat(meta["last_timestamp"])
+        messages = []  # ✅ 아직 요약하지 않은, 색인된 메시지 (오래된 순)
+        for msg in messages_ref.stream():
+            msg_data = msg.to_dict()
+            timestamp = msg_data.get("timestamp")
+            if msg.id in covered_ids or timestamp is None:
+                continue
+            if timestamp > high_water_mark:
+                break
+            messages.append((msg.id, msg_data))
+
+        old_count = max(len(messages) - CHAT_MEMORY_RECENT_MESSAGES, 0)
+        if CHAT_MEMORY_MAX_AGE_DAYS > 0:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=CHAT_MEMORY_MAX_AGE_DAYS)
+            old_count = max(old_count, sum(1 for _, msg_data in messages if msg_data["timestamp"] < cutoff))
+        old_count -= old_count % CHAT_MEMORY_SUMMARY_CHUNK  # ✅ 요약 하나가 항상 같은 개수를 덮도록 (남는 메시지는 다음 압축 때)
+
+        stats = meta.setdefault("compaction", {"runs": 0, "compacted_messages": 0, "summaries": len(summaries)})
+        stats["checked_at"] = datetime.now(timezone.utc).isoformat()
+        if old_count == 0:
+            save_faiss_meta(chat_id, meta)
+            return None
+
+        # ✅ 오래된 메시지를 묶음마다 요약해서 Firestore에 저장
+        summarizer = get_memory_summarizer()
+        for start in range(0, old_count, CHAT_MEMORY_SUMMARY_CHUNK):
+            chunk = messages[start:start + CHAT_MEMORY_SUMMARY_CHUNK]
+            end_at = chunk[-1][1]["timestamp"]
+            covered = [{
+                "start_at": chunk[0][1]["timestamp"],
+                "end_at": end_at,
+                "end_ids": [msg_id for msg_id, msg_data in chunk if msg_data["timestamp"] == end_at],
+                "message_count": len(chunk)
+            }]
+            summaries.append(add_memory_summary(chat_id, summarizer.summarize([msg_data["content"] for _, msg_data in chunk]), covered))
+        summaries = roll_up_memory_summaries(chat_id, summaries)
+
+        # ✅ 요약 + 마지막 요약 이후 메시지로 인덱스를 다시 작성
+        ntotal_before = meta["ntotal"]
+        checked_at = stats["checked_at"]
+        meta = store_chat_in_faiss(chat_id, charac_id, rebuild=True)
+        stats = meta.setdefault("compaction", stats)  # ✅ 다시 만든 메타에는 디스크의 이전 통계가 들어 있음
+        stats.update({
+            "checked_at": checked_at,
+            "runs": stats.get("runs", 0) + 1,
+            "compacted_messages": stats.get("compacted_messages", 0) + old_count,
+            "summaries": len(summaries),
+            "last_run_at": datetime.now(timezone.utc).isoformat(),
+            "last_seconds": time.perf_counter() - started,
+            "ntotal_before": ntotal_before,
+            "ntotal_after": meta["ntotal"]
+        })
+        save_faiss_meta(chat_id, meta)
+        return stats
+
+def index_chat_memory(chat_id, charac_id):
+    """증분 색인 후 필요하면 메모리 압축 (색인 큐 작업 단위, 같은 채팅방은 동시에 실행되지 않음)"""
+    meta = store_chat_in_faiss(chat_id, charac_id)
+    if memory_compaction_due(meta):
+        compact_chat_memory(chat_id, charac_id)
+
+# ✅ 응답 뒤에 채팅방별로 모아서 색인하는 write-behind 큐 (색인 작업도 벡터 전용 풀에서 실행)
+index_queue = IndexQueue(lambda chat_id, charac_id: vector_executor.run(index_chat_memory, chat_id, charac_id))
+
+def enqueue_chat_indexing(chat_id, charac_id):
+    """채팅방 증분 색인을 큐에 예약 (큐가 가득 차면 호출한 스레드에서 바로 색인해 요청 속도를 늦춤)"""
+    if not index_queue.submit(chat_id, charac_id):
+        vector_executor.run(index_chat_memory, chat_id, charac_id)
+
+def get_index_queue_stats():
+    """색인 큐 길이, 합쳐진 요청 비율, 색인 지연 시간"""
+    return index_queue.get_stats()
+
+def get_index_lock_stats():
+    """채팅방 쓰기 잠금 횟수와 다른 스레드/워커를 기다린 횟수"""
+    return chat_locks.get_stats()
 
 def get_recent_messages(chat_id, limit=10):
     """Firestore에서 최근 n개의 메시지를 가져오는 함수"""
@@ -164,13 +1082,13 @@ def search_user_hobby(chat_id):
     """사용자의 취미를 최근 대화에서 직접 검색"""
     messages = get_recent_messages(chat_id, limit=10)  # 최근 10개 대화 가져오기
     hobby_keywords = ["취미", "좋아하는", "내가 좋아하는", "나는", "내 취미는"]
-    
+
     for msg in messages:
         content = msg["content"]
         for keyword in hobby_keywords:
             if keyword in content:
                 return content.replace("내 취미는", "🐶 멍멍! 너의 취미는") + "야! 🚲"
-    
+
     return None  # 취미 정보가 없으면 None 반환
 
 def search_similar_messages(chat_id, charac_id, query, top_k=5):
@@ -178,34 +1096,36 @@ def search_similar_messages(chat_id, charac_id, query, top_k=5):
 
     # ✅ 사용자의 취미 질문에 대한 즉시 응답
     if "내가 뭘 좋아했지" in query or "내 취미가 뭐였지" in query or "내가 좋아하는 것" in query:
-        # 🔹 Firestore 또는 FAISS에서 취미 정보를 우선 검색
+        # 🔹 저장된 프로필에서 취미를 바로 확인 (캐시 → 프로필 문서 1회 조회)
+        hobby = profile_store.get(chat_id)["user"].get("취미")
+        if hobby:
+            return [f"🐶 멍멍! {hobby}가 너의 취미였지! 기억하고 있어! 🚲"]
+
+        # 🔹 아직 기억한 취미가 없으면 최근 대화에서 검색
         hobby_response = search_user_hobby(chat_id)
         if hobby_response:
             return [hobby_response]
-        
-        if chat_id in user_profiles and "취미" in user_profiles[chat_id]:
-            hobby = user_profiles[chat_id]["취미"]
-            return [f"🐶 멍멍! {hobby}가 너의 취미였지! 기억하고 있어! 🚲"]
 
         return ["음... 아직 너의 취미를 잘 모르겠어! 알려주면 내가 꼭 기억할게! 😊"]
 
-    # ✅ 기존 FAISS 검색 수행 (변경 없음)
-    index = load_faiss_index(chat_id)
-    if index.ntotal == 0:
-        return ["음... 이번 질문은 처음 듣는 것 같아요! 조금 더 설명해 주시면 좋을 것 같아요! 😊"]
+    # ✅ 같은 질문을 이미 했고 그 뒤로 인덱스가 바뀌지 않았으면 임베딩/검색 없이 반환
+    version = get_index_version(chat_id)
+    cached_results = query_cache.get(chat_id, query, top_k, version)
+    if cached_results is not None:
+        return list(cached_results)
 
-    query_vector = model.encode([query])[0]
-    query_vector = np.array([query_vector], dtype=np.float32)
+    # ✅ 기존 FAISS 검색 수행 (캐시된 인덱스 우선)
+    query_vector = encode_texts([query])
     faiss.normalize_L2(query_vector)
 
-    scores, indices = index.search(query_vector, min(top_k, index.ntotal))
+    scores, indices, docs = search_chat_index(chat_id, query_vector, top_k)
 
     seen_texts = set()
     results = []
 
     for score, idx in zip(scores[0], indices[0]):
-        if idx in doc_store.get(chat_id, {}):
-            text = doc_store[chat_id][idx]
+        if idx in docs:
+            text = docs[idx]
             if text not in seen_texts:
                 results.append((text, 1 - score))
                 seen_texts.add(text)
@@ -214,6 +1134,61 @@ def search_similar_messages(chat_id, charac_id, query, top_k=5):
 
     if prioritized_results:
         similar_texts = [text for text, _ in prioritized_results[:top_k]]
-        return [f"음... 비슷한 대화를 찾아보니 '{similar_texts[0]}'라고 말씀하신 적이 있어요! 😊"]
+        response = [f"음... 비슷한 대화를 찾아보니 '{similar_texts[0]}'라고 말씀하신 적이 있어요! 😊"]
+    else:
+        response = ["음... 이번 질문은 처음 듣는 것 같아요! 조금 더 설명해 주시면 좋을 것 같아요! 😊"]
+
+    query_cache.put(chat_id, query, top_k, version, tuple(response))  # ✅ 검색 전에 읽은 버전으로 저장 (그 사이 바뀌었으면 다음 조회 때 버려짐)
+    return response
+
+async def search_similar_messages_async(chat_id, charac_id, query, top_k=5):
+    """search_similar_messages의 async 버전 (임베딩/검색을 이벤트 루프 밖에서 실행)"""
+    return await vector_executor.run_async(search_similar_messages, chat_id, charac_id, query, top_k)
+
+def search_messages_batch(requests, top_k=5):
+    """여러 (chat_id, 질문)을 한 번에 검색해서 구조화된 결과 반환
+
+    질문은 중복을 빼고 한 번에 임베딩하고, 채팅방마다 질문 행렬로 검색을 한 번만 한다.
+    반환: 입력 순서대로 {"chat_id", "query", "results": [{"doc_id", "message_id", "text", "distance", "score"}]}
+    (score는 코사인 유사도, 같은 문장은 가장 가까운 것만 남김)
+    """
+    requests = list(requests)
+    if not requests:
+        return []
+
+    queries = list(dict.fromkeys(query for _, query in requests))
+    query_vectors = encode_texts(queries)
+    faiss.normalize_L2(query_vectors)
+    query_rows = {query: row for row, query in enumerate(queries)}
+
+    # ✅ 채팅방별로 모아서 검색 (같은 채팅방의 같은 질문은 한 번만)
+    by_chat = {}
+    for chat_id, query in requests:
+        by_chat.setdefault(chat_id, {}).setdefault(query, len(by_chat[chat_id]))
+
+    results = {}
+    for chat_id, chat_queries in by_chat.items():
+        distances, labels, docs = search_chat_index(chat_id, query_vectors[[query_rows[query] for query in chat_queries]], top_k)
+        for query, row in chat_queries.items():
+            seen_texts = set()
+            matches = []
+            for distance, doc_id in zip(distances[row], labels[row]):
+                doc_id = int(doc_id)
+                if doc_id not in docs or docs[doc_id] in seen_texts:
+                    continue
+                text = docs[doc_id]
+                seen_texts.add(text)
+                matches.append({
+                    "doc_id": doc_id,
+                    "message_id": docs.get_message_id(doc_id) if hasattr(docs, "get_message_id") else None,  # ✅ 이전 형식 인덱스는 메시지 ID 없음
+                    "text": text,
+                    "distance": float(distance),
+                    "score": float(1 - distance / 2)  # ✅ 단위 벡터의 L2 제곱 거리 → 코사인 유사도
+                })
+            results[chat_id, query] = matches
+
+    return [{"chat_id": chat_id, "query": query, "results": results[chat_id, query]} for chat_id, query in requests]
 
-    return ["음... 이번 질문은 처음 듣는 것 같아요! 조금 더 설명해 주시면 좋을 것 같아요! 😊"]
+async def search_messages_batch_async(requests, top_k=5):
+    """search_messages_batch의 async 버전 (임베딩/검색을 이벤트 루프 밖에서 실행)"""
+    return await vector_executor.run_async(search_messages_batch, requests, top_k)
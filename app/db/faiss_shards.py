@@ -0,0 +1,598 @@
+import json
+import os
+import sqlite3
+import threading
+import zlib
+
+import faiss
+import numpy as np
+
+from db.dedup import text_hash
+from db.doc_sidecar import DocSidecar
+from db.embedders import LEGACY_EMBEDDING_DIMENSION, LEGACY_EMBEDDING_MODEL
+from db.file_locks import FileLocks
+from db.mmap_index import FAISS_MMAP, read_index_mmap, write_index_atomic
+
+# ✅ 통합(샤드) 벡터 인덱스 설정 (환경 변수 우선)
+FAISS_SHARD_DIR = os.getenv("FAISS_SHARD_DIR", "db/faiss_shards")
+FAISS_SHARD_COUNT = int(os.getenv("FAISS_SHARD_COUNT", "16"))
+FAISS_SHARD_FACTORY = os.getenv("FAISS_SHARD_FACTORY", "Flat")  # ✅ faiss.index_factory 문자열 (예: "Flat", "HNSW32", "IVF1024,Flat")
+FAISS_SHARD_MERGE_THRESHOLD = int(os.getenv("FAISS_SHARD_MERGE_THRESHOLD", "4096"))  # ✅ 델타가 이 개수를 넘으면 본 인덱스에 병합
+FAISS_SHARD_COMPACT_RATIO = float(os.getenv("FAISS_SHARD_COMPACT_RATIO", "0.3"))  # ✅ 삭제된 채팅방 벡터 비율이 이 값을 넘으면 샤드를 다시 작성 (0이면 끔)
+FAISS_SHARD_COMPACT_MIN = int(os.getenv("FAISS_SHARD_COMPACT_MIN", "1024"))  # ✅ 삭제된 벡터가 이보다 적으면 다시 작성하지 않음
+FAISS_SHARD_EF_SEARCH = int(os.getenv("FAISS_SHARD_EF_SEARCH", "128"))  # ✅ HNSW 검색 폭
+FAISS_SHARD_NPROBE = int(os.getenv("FAISS_SHARD_NPROBE", "16"))  # ✅ IVF 검색 리스트 수
+
+SEQ_BITS = 32  # ✅ 벡터 ID = (채팅방 키 << 32) | 채팅방 내 순번
+
+
+def make_vector_ids(chat_key, start_seq, count):
+    """채팅방 키와 순번으로 벡터 ID 생성 (채팅방의 벡터는 연속된 ID 구간에 모임)"""
+    return (np.int64(chat_key) << SEQ_BITS) | np.arange(start_seq, start_seq + count, dtype=np.int64)
+
+
+def chat_id_range(chat_key, min_seq=0):
+    """채팅방의 유효한 벡터 ID 구간 [시작, 끝)"""
+    return (chat_key << SEQ_BITS) | min_seq, (chat_key + 1) << SEQ_BITS
+
+
+class ShardChatDocs:
+    """샤드 사이드카에서 한 채팅방의 문서만 보여주는 읽기 전용 뷰 (키는 벡터 ID)"""
+
+    def __init__(self, shard, lo, hi, count):
+        self.shard = shard
+        self.lo = lo
+        self.hi = hi
+        self.count = count  # ✅ 레지스트리의 next_seq - min_seq (샤드를 훑지 않고 개수 확인)
+
+    def records(self):
+        """채팅방에 속한 사이드카 레코드 번호 (추가된 순서)"""
+        ids = self.shard["ids"]
+        return np.nonzero((ids >= self.lo) & (ids < self.hi))[0]
+
+    def get_record(self, vector_id):
+        return self.shard["docs"].get_record(self.shard["records"][int(vector_id)])
+
+    def get_message_id(self, vector_id):
+        return self.get_record(vector_id)[0]
+
+    def __getitem__(self, vector_id):
+        return self.get_record(vector_id)[1]
+
+    def __contains__(self, vector_id):
+        return self.lo <= vector_id < self.hi and int(vector_id) in self.shard["records"]
+
+    def hashes(self):
+        """채팅방 문서의 (벡터 ID 배열, 문장 해시 배열) (추가된 순서, 텍스트를 다시 읽지 않음)"""
+        records = self.records()
+        return self.shard["ids"][records], self.shard["hashes"][records]
+
+    def find_message(self, message_id):
+        """메시지 ID → 벡터 ID (없으면 None)
+
+        샤드의 (채팅방 키, 메시지 ID) → 벡터 ID 맵은 처음 찾을 때 만들고, 이후에는 늘어난 레코드만 이어서 읽는다.
+        """
+        shard = self.shard
+        ids, docs, messages = shard["ids"], shard["docs"], shard["messages"]
+        known = min(len(ids), len(docs))
+        for record in range(shard["message_count"], known):
+            vector_id = int(ids[record])
+            messages[(vector_id >> SEQ_BITS, docs.get_message_id(record))] = vector_id  # ✅ 재색인한 레코드가 나중에 와서 덮어씀
+        shard["message_count"] = max(shard["message_count"], known)
+
+        vector_id = messages.get((self.lo >> SEQ_BITS, message_id))
+        return vector_id if vector_id is not None and self.lo <= vector_id < self.hi else None
+
+    def __len__(self):
+        return self.count
+
+    def values(self):
+        docs = self.shard["docs"]
+        for record in self.records():
+            yield docs[int(record)]
+
+    def items(self):
+        """(벡터 ID, 텍스트)를 추가된 순서대로 순회"""
+        docs = self.shard["docs"]
+        for record in self.records():
+            yield int(self.shard["ids"][record]), docs[int(record)]
+
+
+class ShardedVectorStore:
+    """모든 채팅방 벡터를 소수의 샤드 인덱스(IndexIDMap2)에 모아 저장하는 백엔드
+
+    채팅방은 crc32(chat_id) % 샤드 수로 샤드가 정해지고, 벡터 ID에 채팅방 키가 들어가므로
+    IDSelectorRange 하나로 한 채팅방만 검색할 수 있다. 샤드마다 파일은 본 인덱스, 델타 로그,
+    벡터 ID 로그, 문장 해시 로그, 문서 사이드카뿐이며 채팅방 등록 정보와 커밋 지점은 SQLite 레지스트리에 둔다.
+    같은 호스트의 여러 워커가 함께 쓸 수 있도록 샤드 쓰기는 샤드별 잠금 파일로 한 워커씩만 하고,
+    메모리에 올린 샤드는 레지스트리의 커밋 상태와 비교해 다른 워커가 추가한 만큼 따라 읽는다.
+    삭제된 채팅방 벡터가 쌓이면 샤드를 다음 세대 파일로 다시 작성한다 (0세대는 이전 이름 그대로).
+    프로세스 안에서는 샤드마다 잠금이 따로 있어 다른 샤드의 검색/추가/병합/다시 작성을 막지 않는다.
+    레지스트리 잠금은 SQLite 연결을 쓰는 동안(채팅방 등록, 커밋 상태 읽기/쓰기)만 잡는다.
+    잠금 순서는 항상 샤드 잠금 → 샤드 잠금 파일 → 레지스트리 잠금이다.
+    """
+
+    def __init__(self, root=FAISS_SHARD_DIR, dimension=768, num_shards=FAISS_SHARD_COUNT, factory=FAISS_SHARD_FACTORY, model_name=None):
+        self.root = root
+        self.dimension = dimension
+        self.model_name = model_name  # ✅ 벡터를 만든 임베딩 모델 (None이면 확인하지 않음)
+        self.num_shards = num_shards
+        self.factory = factory
+        self.shards = {}  # ✅ {샤드 번호: 메모리에 올린 샤드 상태}
+        self.shard_locks = [threading.RLock() for _ in range(num_shards)]  # ✅ 샤드별 메모리 상태 잠금 (검색/추가/병합/다시 작성/삭제)
+        self.registry_lock = threading.RLock()  # ✅ SQLite 레지스트리 연결 잠금 (채팅방 등록, 샤드 커밋 상태)
+        self.file_locks = FileLocks(lambda shard_no: self._path(shard_no, "lock"))  # ✅ 샤드별 쓰기 잠금 (워커끼리도)
+
+        self._registry = None
+        self._registry_pid = None
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def registry(self):
+        """SQLite 레지스트리 연결 (fork 이후에는 프로세스마다 새로 연결, registry_lock을 잡고 사용)"""
+        if self._registry is None or self._registry_pid != os.getpid():
+            self._registry = sqlite3.connect(os.path.join(self.root, "registry.sqlite3"), check_same_thread=False)
+            self._registry_pid = os.getpid()
+            self._registry.executescript("""
+                CREATE TABLE IF NOT EXISTS chats (
+                    chat_id TEXT PRIMARY KEY, shard INTEGER, chat_key INTEGER,
+                    min_seq INTEGER DEFAULT 0, next_seq INTEGER DEFAULT 0, meta TEXT
+                );
+                CREATE TABLE IF NOT EXISTS shards (
+                    shard INTEGER PRIMARY KEY, records INTEGER, arena_bytes INTEGER, base_records INTEGER
+                );
+                CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+            """)
+            try:
+                self._registry.execute("ALTER TABLE shards ADD COLUMN generation INTEGER DEFAULT 0")  # ✅ 세대를 기록하기 전의 레지스트리
+            except sqlite3.OperationalError:
+                pass  # ✅ 이미 있음
+            self._check_embedding()
+        return self._registry
+
+    def _check_embedding(self):
+        """레지스트리에 기록된 임베딩 모델/차원이 현재와 다르면 샤드 벡터를 모두 비움
+
+        채팅방 메타데이터는 남겨 두므로 (이전 모델이 기록된 채로) 다음 색인 때 채팅방마다 전체 재색인된다.
+        여러 워커가 동시에 열어도 한 워커만 비우도록 쓰기 트랜잭션 안에서 확인한다.
+        """
+        if self.model_name is None:
+            return
+
+        current = {"embedding_model": self.model_name, "dimension": self.dimension}
+        registry = self._registry
+        with registry:
+            registry.execute("BEGIN IMMEDIATE")
+            row = registry.execute("SELECT value FROM settings WHERE key = 'embedding'").fetchone()
+            if row is not None:
+                stored = json.loads(row[0])
+            elif registry.execute("SELECT COUNT(*) FROM shards").fetchone()[0]:
+                stored = {"embedding_model": LEGACY_EMBEDDING_MODEL, "dimension": LEGACY_EMBEDDING_DIMENSION}  # ✅ 모델을 기록하기 전의 레지스트리
+            else:
+                stored = current
+            if stored == current and row is not None:
+                return
+
+            registry.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('embedding', ?)", (json.dumps(current),))
+            if stored != current:
+                registry.execute("DELETE FROM shards")
+                registry.execute("UPDATE chats SET min_seq = 0, next_seq = 0")
+
+        if stored != current:
+            for name in os.listdir(self.root):
+                if name.startswith("shard_") and not name.endswith(".lock"):
+                    os.remove(os.path.join(self.root, name))
+            print(f"⚠️ 임베딩 모델이 바뀌어 샤드 벡터를 비웠습니다 ({stored['embedding_model']} → {self.model_name}). 채팅방은 다음 색인 때 다시 색인됩니다.")
+
+    # ---------- 경로 ----------
+    def _path(self, shard_no, suffix, generation=0):
+        """샤드 파일 경로 (다시 작성할 때마다 세대 번호를 올린 새 파일에 씀, 0세대와 잠금 파일은 이전 이름 그대로)"""
+        if generation:
+            return os.path.join(self.root, f"shard_{shard_no}.g{generation}.{suffix}")
+        return os.path.join(self.root, f"shard_{shard_no}.{suffix}")
+
+    def _base_path(self, shard_no, base_records, generation=0):
+        """본 인덱스 파일 이름에 포함된 레코드 수를 넣어, 커밋된 것만 읽도록 함"""
+        return self._path(shard_no, f"{base_records}.bin", generation)
+
+    def _file(self, shard, suffix):
+        """메모리에 올린 샤드 세대의 파일 경로"""
+        return self._path(shard["no"], suffix, shard["generation"])
+
+    def _remove_generation(self, shard_no, generation, base_records):
+        """한 세대의 샤드 파일을 모두 삭제 (이미 매핑해서 읽고 있는 워커는 영향 없음)"""
+        for path in [self._path(shard_no, suffix, generation) for suffix in ("delta", "ids", "hashes", "docs", "offsets")] + [self._base_path(shard_no, base_records, generation)]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    # ---------- 레지스트리 ----------
+    def _shard_of(self, chat_id):
+        return zlib.crc32(chat_id.encode("utf-8")) % self.num_shards
+
+    def _chat(self, chat_id):
+        with self.registry_lock:
+            row = self.registry.execute(
+                "SELECT shard, chat_key, min_seq, next_seq, meta FROM chats WHERE chat_id = ?", (chat_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"shard": row[0], "chat_key": row[1], "min_seq": row[2], "next_seq": row[3], "meta": row[4]}
+
+    def _register(self, chat_id):
+        """처음 보는 채팅방에 샤드와 채팅방 키를 배정"""
+        with self.registry_lock:
+            chat = self._chat(chat_id)
+            if chat is not None:
+                return chat
+
+            shard_no = self._shard_of(chat_id)
+            (max_key,) = self.registry.execute("SELECT MAX(chat_key) FROM chats WHERE shard = ?", (shard_no,)).fetchone()
+            with self.registry:
+                self.registry.execute(
+                    "INSERT INTO chats (chat_id, shard, chat_key) VALUES (?, ?, ?)", (chat_id, shard_no, (max_key or 0) + 1)
+                )
+            return self._chat(chat_id)
+
+    def chat_version(self, chat_id):
+        """채팅방 벡터 버전 (추가/삭제할 때마다 바뀜, 등록되지 않은 채팅방은 None)"""
+        with self.registry_lock:
+            row = self.registry.execute("SELECT min_seq, next_seq FROM chats WHERE chat_id = ?", (chat_id,)).fetchone()
+            return tuple(row) if row else None
+
+    def get_meta(self, chat_id):
+        """채팅방 증분 색인 메타데이터 (없으면 None)"""
+        chat = self._chat(chat_id)
+        return json.loads(chat["meta"]) if chat and chat["meta"] else None
+
+    def set_meta(self, chat_id, meta):
+        """채팅방 증분 색인 메타데이터 저장"""
+        shard_no = self._shard_of(chat_id)
+        with self.shard_locks[shard_no], self.file_locks.hold(shard_no), self.registry_lock:
+            self._register(chat_id)
+            with self.registry:
+                self.registry.execute("UPDATE chats SET meta = ? WHERE chat_id = ?", (json.dumps(meta, ensure_ascii=False), chat_id))
+
+    # ---------- 샤드 로드 ----------
+    def _new_base(self):
+        return faiss.IndexIDMap2(faiss.index_factory(self.dimension, self.factory))
+
+    def _read_base(self, base_path):
+        """본 인덱스 읽기 (FAISS_MMAP이면 읽기 전용 memmap, 새 벡터는 델타에만 추가)"""
+        return read_index_mmap(base_path) if FAISS_MMAP else faiss.read_index(base_path)
+
+    def _read_hashes(self, shard_no, generation, docs, start, records):
+        """문장 해시 로그에서 [start, records) 레코드의 해시를 읽음 (해시 로그가 없는 이전 샤드는 문서에서 계산)"""
+        path = self._path(shard_no, "hashes", generation)
+        stored = min(max(os.path.getsize(path) // 8 - start, 0), records - start) if os.path.exists(path) and records > start else 0
+        hashes = np.fromfile(path, dtype="<i8", count=stored, offset=start * 8) if stored else np.empty(0, dtype=np.int64)
+        if stored < records - start:
+            missing = [text_hash(docs[record]) for record in range(start + stored, records)]
+            hashes = np.concatenate([hashes, np.asarray(missing, dtype=np.int64)])
+        return hashes.astype(np.int64)
+
+    def _load_shard(self, shard_no):
+        """샤드를 메모리에 올림 (본 인덱스 + 델타 + 벡터 ID 로그 + 문장 해시 로그 + 사이드카)
+
+        이미 올린 샤드는 레지스트리의 커밋 상태와 비교해서, 다른 워커가 델타에 추가했으면
+        늘어난 부분만 읽고 병합하거나 다시 작성했으면 샤드를 다시 읽는다. 읽는 사이 다른 워커가
+        샤드를 다시 작성해서 이전 세대 파일이 지워졌으면 새 세대로 다시 읽는다. 샤드 잠금을 잡고 호출한다.
+        """
+        while True:
+            row = self._shard_row(shard_no)
+            records, arena_bytes, base_records, generation = row if row else (0, 0, 0, 0)
+            generation = generation or 0
+
+            shard = self.shards.get(shard_no)
+            if shard is not None and shard["generation"] == generation and shard["base_records"] == base_records:
+                if len(shard["docs"]) == records:
+                    return shard
+                if len(shard["docs"]) < records:
+                    return self._catch_up(shard, records, arena_bytes)
+
+            try:
+                shard = self._read_shard(shard_no, records, arena_bytes, base_records, generation)
+            except (OSError, RuntimeError):
+                current = self._shard_row(shard_no)
+                if ((current[3] if current else 0) or 0) == generation:
+                    raise
+                continue
+            self.shards[shard_no] = shard
+            return shard
+
+    def _shard_row(self, shard_no):
+        """레지스트리에 커밋된 샤드 상태 (records, arena_bytes, base_records, generation)"""
+        with self.registry_lock:
+            return self.registry.execute("SELECT records, arena_bytes, base_records, generation FROM shards WHERE shard = ?", (shard_no,)).fetchone()
+
+    def _read_shard(self, shard_no, records, arena_bytes, base_records, generation):
+        """커밋된 상태의 샤드 파일을 모두 읽음"""
+        base_path = self._base_path(shard_no, base_records, generation)
+        base = self._read_base(base_path) if base_records and os.path.exists(base_path) else self._new_base()
+        ids = np.fromfile(self._path(shard_no, "ids", generation), dtype=np.int64, count=records) if records else np.empty(0, dtype=np.int64)
+
+        delta = faiss.IndexIDMap2(faiss.IndexFlatL2(self.dimension))
+        delta_count = records - base_records
+        if delta_count:
+            vectors = np.fromfile(self._path(shard_no, "delta", generation), dtype=np.float32, count=delta_count * self.dimension)
+            delta.add_with_ids(vectors.reshape(-1, self.dimension), ids[base_records:])
+        docs = DocSidecar(self._path(shard_no, "docs", generation), self._path(shard_no, "offsets", generation), records, arena_bytes)
+
+        return {
+            "no": shard_no,
+            "base": base,
+            "delta": delta,
+            "ids": ids,
+            "records": dict(zip(ids.tolist(), range(records))),  # ✅ {벡터 ID: 사이드카 레코드 번호}
+            "hashes": self._read_hashes(shard_no, generation, docs, 0, records),  # ✅ 레코드별 문장 해시 (중복 확인용)
+            "messages": {},  # ✅ {(채팅방 키, 메시지 ID): 벡터 ID} (ShardChatDocs.find_message가 채움)
+            "message_count": 0,  # ✅ messages에 반영한 레코드 수
+            "docs": docs,
+            "base_records": base_records,
+            "generation": generation
+        }
+
+    def _catch_up(self, shard, records, arena_bytes):
+        """다른 워커가 커밋한 델타 벡터/벡터 ID/문서를 메모리 샤드에 이어서 반영"""
+        known = len(shard["docs"])
+        ids = np.fromfile(self._file(shard, "ids"), dtype=np.int64, count=records)[known:]
+        vectors = np.fromfile(self._file(shard, "delta"), dtype=np.float32, count=(records - shard["base_records"]) * self.dimension)
+        vectors = vectors.reshape(-1, self.dimension)[known - shard["base_records"]:]
+
+        shard["delta"].add_with_ids(np.ascontiguousarray(vectors), ids)
+        shard["ids"] = np.concatenate([shard["ids"], ids])
+        shard["records"].update(zip(ids.tolist(), range(known, records)))
+        shard["docs"] = DocSidecar(self._file(shard, "docs"), self._file(shard, "offsets"), records, arena_bytes)
+        shard["hashes"] = np.concatenate([shard["hashes"], self._read_hashes(shard["no"], shard["generation"], shard["docs"], known, records)])
+        return shard
+
+    def _commit_shard(self, shard):
+        with self.registry_lock, self.registry:
+            self.registry.execute(
+                "INSERT OR REPLACE INTO shards (shard, records, arena_bytes, base_records, generation) VALUES (?, ?, ?, ?, ?)",
+                (shard["no"], len(shard["docs"]), shard["docs"].arena_bytes, shard["base_records"], shard["generation"])
+            )
+
+    # ---------- 쓰기 ----------
+    def add(self, chat_id, vectors, docs, hashes=None):
+        """채팅방 벡터와 (메시지 ID, 텍스트) 문서를 샤드 델타에 추가하고 새 벡터 ID 배열 반환
+
+        hashes: 문서마다 text_hash 값 (없으면 여기서 계산)
+        """
+        if not len(docs):
+            return np.empty(0, dtype=np.int64)
+        hashes = np.asarray(hashes if hashes is not None else [text_hash(text) for _, text in docs], dtype=np.int64)
+
+        shard_no = self._shard_of(chat_id)
+        with self.shard_locks[shard_no], self.file_locks.hold(shard_no):
+            chat = self._register(chat_id)
+            shard = self._load_shard(chat["shard"])
+            ids = make_vector_ids(chat["chat_key"], chat["next_seq"], len(docs))
+            records = len(shard["docs"])
+            delta_committed = (records - shard["base_records"]) * self.dimension * 4
+
+            # ✅ 델타 벡터 → 벡터 ID 로그 → 사이드카 순으로 추가하고 레지스트리로 커밋
+            with open(self._file(shard, "delta"), "ab") as f:
+                f.truncate(delta_committed)
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            with open(self._file(shard, "ids"), "ab") as f:
+                f.truncate(records * 8)
+                f.write(ids.tobytes())
+            with open(self._file(shard, "hashes"), "ab") as f:
+                if f.tell() < records * 8:
+                    f.truncate(0)  # ✅ 해시 로그가 없던 이전 샤드: 메모리에서 계산한 해시로 다시 씀
+                    f.write(shard["hashes"].astype("<i8").tobytes())
+                f.truncate(records * 8)
+                f.write(hashes.astype("<i8").tobytes())
+            shard["docs"].append(docs)
+
+            shard["delta"].add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32), ids)
+            shard["ids"] = np.concatenate([shard["ids"], ids])
+            shard["hashes"] = np.concatenate([shard["hashes"], hashes])
+            shard["records"].update(zip(ids.tolist(), range(records, records + len(ids))))
+
+            with self.registry_lock, self.registry:
+                self.registry.execute("UPDATE chats SET next_seq = ? WHERE chat_id = ?", (chat["next_seq"] + len(ids), chat_id))
+            self._commit_shard(shard)
+
+            if shard["delta"].ntotal >= FAISS_SHARD_MERGE_THRESHOLD:
+                self.merge(shard["no"])
+            return ids
+
+    def merge(self, shard_no):
+        """델타를 본 인덱스에 병합해 새 본 인덱스 파일로 저장 (학습이 필요한 인덱스는 이때 학습)"""
+        with self.shard_locks[shard_no], self.file_locks.hold(shard_no):
+            shard = self._load_shard(shard_no)
+            delta = shard["delta"]
+            if delta.ntotal == 0:
+                return
+
+            records = len(shard["docs"])
+            generation = shard["generation"]
+            old_path = self._base_path(shard_no, shard["base_records"], generation)
+            # ✅ 매핑된 본 인덱스에는 쓸 수 없으므로 파일에서 메모리 복사본을 읽어 병합
+            base = faiss.read_index(old_path) if FAISS_MMAP and shard["base_records"] and os.path.exists(old_path) else shard["base"]
+            vectors = delta.index.reconstruct_n(0, delta.ntotal)
+            delta_ids = faiss.vector_to_array(delta.id_map)
+            if not base.is_trained:
+                base.train(vectors)
+            base.add_with_ids(vectors, delta_ids)
+
+            write_index_atomic(base, self._base_path(shard_no, records, generation))
+            shard["base"] = self._read_base(self._base_path(shard_no, records, generation))
+            shard["base_records"] = records
+            shard["delta"] = faiss.IndexIDMap2(faiss.IndexFlatL2(self.dimension))
+            self._commit_shard(shard)
+
+            if os.path.exists(old_path) and old_path != self._base_path(shard_no, records, generation):
+                os.remove(old_path)
+            open(self._path(shard_no, "delta", generation), "wb").close()
+
+    def dead_records(self, shard_no):
+        """샤드에 남아 있는 삭제된 채팅방 벡터 수와 전체 레코드 수 (레지스트리만 읽음)"""
+        with self.registry_lock:
+            row = self.registry.execute("SELECT records FROM shards WHERE shard = ?", (shard_no,)).fetchone()
+            (live,) = self.registry.execute("SELECT COALESCE(SUM(next_seq - min_seq), 0) FROM chats WHERE shard = ?", (shard_no,)).fetchone()
+        records = row[0] if row else 0
+        return max(records - live, 0), records
+
+    def _live_mask(self, shard_no, ids):
+        """벡터 ID마다 아직 채팅방에 속한 벡터인지 (삭제되면 min_seq가 올라가서 이전 순번은 제외됨)"""
+        with self.registry_lock:
+            rows = self.registry.execute("SELECT chat_key, min_seq, next_seq FROM chats WHERE shard = ?", (shard_no,)).fetchall()
+        if not rows or not len(ids):
+            return np.zeros(len(ids), dtype=bool)
+
+        chats = np.array(sorted(rows), dtype=np.int64)
+        keys, seqs = ids >> SEQ_BITS, ids & ((1 << SEQ_BITS) - 1)
+        positions = np.minimum(np.searchsorted(chats[:, 0], keys), len(chats) - 1)
+        found = chats[positions]
+        return (found[:, 0] == keys) & (seqs >= found[:, 1]) & (seqs < found[:, 2])
+
+    def _vectors(self, shard, ids):
+        """벡터 ID 목록의 벡터를 본 인덱스와 델타에서 꺼냄 (ID 순서 그대로)"""
+        sources = [index for index in (shard["base"], shard["delta"]) if index.ntotal]
+        all_ids = np.concatenate([faiss.vector_to_array(index.id_map) for index in sources])
+        all_vectors = np.vstack([index.index.reconstruct_n(0, index.ntotal) for index in sources])
+        order = np.argsort(all_ids, kind="stable")
+        return all_vectors[order[np.searchsorted(all_ids[order], ids)]]
+
+    def maybe_compact(self, shard_no):
+        """삭제된 벡터가 FAISS_SHARD_COMPACT_RATIO / FAISS_SHARD_COMPACT_MIN을 넘으면 샤드를 다시 작성"""
+        dead, records = self.dead_records(shard_no)
+        if FAISS_SHARD_COMPACT_RATIO > 0 and dead >= FAISS_SHARD_COMPACT_MIN and dead >= records * FAISS_SHARD_COMPACT_RATIO:
+            self.compact(shard_no)
+
+    def compact(self, shard_no):
+        """삭제된 채팅방 벡터를 빼고 샤드를 다음 세대 파일로 다시 작성
+
+        남은 벡터로 본 인덱스를 새로 만들고(학습이 필요한 인덱스는 이때 학습) 벡터 ID 로그와 사이드카도
+        남은 레코드만으로 새로 쓴 뒤 레지스트리로 커밋하고 이전 세대 파일을 지운다. 벡터 ID는 그대로이므로
+        채팅방 버전과 검색 결과 캐시는 바뀌지 않는다.
+        """
+        with self.shard_locks[shard_no], self.file_locks.hold(shard_no):
+            shard = self._load_shard(shard_no)
+            keep = np.nonzero(self._live_mask(shard_no, shard["ids"]))[0]
+            if len(keep) == len(shard["ids"]):
+                return
+
+            generation = shard["generation"] + 1
+            ids = shard["ids"][keep]
+            vectors = self._vectors(shard, ids) if len(ids) else np.empty((0, self.dimension), dtype=np.float32)
+            docs = [shard["docs"].get_record(int(record)) for record in keep]
+
+            base = self._new_base()
+            base_records = len(ids)
+            if base_records and not base.is_trained:
+                try:
+                    base.train(vectors)
+                except RuntimeError:
+                    base_records = 0  # ✅ 학습하기에 벡터가 너무 적으면 델타에 두고 다음 병합 때 학습
+            if base_records:
+                base.add_with_ids(vectors, ids)
+                write_index_atomic(base, self._base_path(shard_no, base_records, generation))
+            with open(self._path(shard_no, "delta", generation), "wb") as f:
+                f.write(np.ascontiguousarray(vectors[base_records:]).tobytes())
+            with open(self._path(shard_no, "ids", generation), "wb") as f:
+                f.write(ids.tobytes())
+            with open(self._path(shard_no, "hashes", generation), "wb") as f:
+                f.write(shard["hashes"][keep].astype("<i8").tobytes())
+            sidecar = DocSidecar.write(self._path(shard_no, "docs", generation), self._path(shard_no, "offsets", generation), docs)
+
+            # ✅ 커밋: 이후 다른 워커는 세대가 바뀐 것을 보고 새 파일을 읽음
+            with self.registry_lock, self.registry:
+                self.registry.execute(
+                    "INSERT OR REPLACE INTO shards (shard, records, arena_bytes, base_records, generation) VALUES (?, ?, ?, ?, ?)",
+                    (shard_no, len(ids), sidecar.arena_bytes, base_records, generation)
+                )
+            self.shards.pop(shard_no, None)
+            self._load_shard(shard_no)
+            self._remove_generation(shard_no, shard["generation"], shard["base_records"])
+
+    def delete(self, chat_id):
+        """채팅방 벡터 삭제 (min_seq를 올려 검색에서 제외하고, 가능한 인덱스에서는 실제로 제거)"""
+        shard_no = self._shard_of(chat_id)
+        with self.shard_locks[shard_no], self.file_locks.hold(shard_no):
+            chat = self._chat(chat_id)
+            if chat is None:
+                return
+
+            lo, hi = chat_id_range(chat["chat_key"])
+            with self.registry_lock, self.registry:
+                self.registry.execute("UPDATE chats SET min_seq = next_seq, meta = NULL WHERE chat_id = ?", (chat_id,))
+
+            shard = self.shards.get(chat["shard"])
+            if shard is not None:
+                # ✅ 매핑된 본 인덱스는 건드리지 않음 (min_seq 필터로 제외, 쌓이면 샤드를 다시 작성)
+                for index in ((shard["delta"],) if FAISS_MMAP else (shard["base"], shard["delta"])):
+                    try:
+                        index.remove_ids(faiss.IDSelectorRange(lo, hi))
+                    except RuntimeError:
+                        pass  # ✅ HNSW 등 삭제를 지원하지 않는 인덱스는 min_seq 필터로만 제외
+
+            self.maybe_compact(chat["shard"])
+
+    # ---------- 읽기 ----------
+    def _search_params(self, index, selector):
+        """인덱스 종류에 맞는 검색 파라미터 (ID 선택자 포함)"""
+        inner = faiss.downcast_index(index.index)
+        if isinstance(inner, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=FAISS_SHARD_EF_SEARCH)
+        if isinstance(inner, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=FAISS_SHARD_NPROBE)
+        return faiss.SearchParameters(sel=selector)
+
+    def chat_docs(self, chat_id):
+        """채팅방 문서 뷰 반환 (등록되지 않은 채팅방은 빈 dict)"""
+        chat = self._chat(chat_id)
+        if chat is None:
+            return {}
+        lo, hi = chat_id_range(chat["chat_key"], chat["min_seq"])
+        with self.shard_locks[chat["shard"]]:
+            return ShardChatDocs(self._load_shard(chat["shard"]), lo, hi, chat["next_seq"] - chat["min_seq"])
+
+    def search(self, chat_id, query_vectors, k):
+        """한 채팅방 안에서만 검색 → (거리, 벡터 ID, 문서 뷰)"""
+        with self.shard_locks[self._shard_of(chat_id)]:
+            docs = self.chat_docs(chat_id)
+            empty = (np.full((len(query_vectors), k), np.inf, dtype=np.float32), np.full((len(query_vectors), k), -1, dtype=np.int64))
+            if not docs:
+                return empty + (docs,)
+
+            selector = faiss.IDSelectorRange(docs.lo, docs.hi)
+            scores, labels = [], []
+            for index in (docs.shard["base"], docs.shard["delta"]):
+                if index.ntotal:
+                    D, I = index.search(query_vectors, k, params=self._search_params(index, selector))
+                    scores.append(D)
+                    labels.append(I)
+
+            if not scores:
+                return empty + (docs,)
+
+            # ✅ 본 인덱스와 델타 결과를 거리순으로 합침
+            scores, labels = np.hstack(scores), np.hstack(labels)
+            scores[labels < 0] = np.inf
+            order = np.argsort(scores, axis=1)[:, :k]
+            return np.take_along_axis(scores, order, axis=1), np.take_along_axis(labels, order, axis=1), docs
+
+    def chat_index(self, chat_id):
+        """채팅방 벡터만 담은 IndexIDMap2 복사본 (기존 load_faiss_index 호환용)"""
+        with self.shard_locks[self._shard_of(chat_id)]:
+            index = faiss.IndexIDMap2(faiss.IndexFlatL2(self.dimension))
+            docs = self.chat_docs(chat_id)
+            if not docs:
+                return index
+
+            vector_ids = docs.shard["ids"][docs.records()]
+            vectors = []
+            for vector_id in vector_ids:
+                source = docs.shard["delta"] if docs.shard["records"][int(vector_id)] >= docs.shard["base_records"] else docs.shard["base"]
+                vectors.append(source.reconstruct(int(vector_id)))
+            if vectors:
+                index.add_with_ids(np.array(vectors, dtype=np.float32), vector_ids)
+            return index
+
+    def disk_usage(self):
+        """샤드 디렉터리의 파일 수와 전체 크기 (바이트)"""
+        files = [os.path.join(self.root, name) for name in os.listdir(self.root)]
+        return {"files": len(files), "bytes": sum(os.path.getsize(path) for path in files)}
@@ -0,0 +1,79 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl  # ✅ POSIX 전용 (Windows에서는 프로세스 안의 스레드끼리만 잠금)
+except ImportError:
+    fcntl = None
+
+
+class FileLocks:
+    """키(채팅방, 샤드)별 쓰기 잠금: 프로세스 안에서는 RLock, 프로세스끼리는 flock 잠금 파일
+
+    같은 호스트의 여러 워커가 같은 채팅방 파일을 동시에 쓰지 않도록 한다. 같은 스레드에서
+    다시 잡아도 멈추지 않고(재진입), 잠금 파일은 가장 바깥 hold()에서만 열고 닫는다.
+    잠금 파일은 지우지 않는다 (지운 뒤 다른 워커가 새 파일로 잠그면 서로를 배제하지 못함).
+    읽기는 잠그지 않는다. 파일은 모두 임시 파일에 쓴 뒤 교체하고, 읽는 쪽은 메타데이터의
+    버전 표시로 바뀐 것을 알아챈다.
+    """
+
+    def __init__(self, path_fn):
+        self.path_fn = path_fn  # ✅ 키 → 잠금 파일 경로
+        self.guard = threading.Lock()
+        self.pid = None
+        self.locks = {}  # ✅ {키: {"lock": RLock, "users": 기다리거나 잡고 있는 스레드 수, "depth": 재진입 깊이, "file": 잠금 파일}}
+        self.stats = {"acquired": 0, "contended": 0}
+
+    def _entry(self, key):
+        with self.guard:
+            if self.pid != os.getpid():
+                self.locks = {}  # ✅ fork 이전 프로세스의 잠금 상태는 물려받지 않음
+                self.pid = os.getpid()
+            entry = self.locks.setdefault(key, {"lock": threading.RLock(), "users": 0, "depth": 0, "file": None})
+            entry["users"] += 1
+            return entry
+
+    def _release_entry(self, key, entry):
+        with self.guard:
+            entry["users"] -= 1
+            if entry["users"] == 0 and self.locks.get(key) is entry:
+                del self.locks[key]  # ✅ 아무도 쓰지 않는 키는 메모리에서 내림
+
+    @contextmanager
+    def hold(self, key):
+        """키의 쓰기 잠금을 잡고 있는 동안 실행 (다른 스레드/워커는 기다림)"""
+        entry = self._entry(key)
+        try:
+            if not entry["lock"].acquire(blocking=False):
+                self.stats["contended"] += 1
+                entry["lock"].acquire()
+            try:
+                if entry["depth"] == 0 and fcntl is not None:
+                    path = self.path_fn(key)
+                    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                    entry["file"] = open(path, "a+b")
+                    try:
+                        fcntl.flock(entry["file"].fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        self.stats["contended"] += 1
+                        fcntl.flock(entry["file"].fileno(), fcntl.LOCK_EX)
+                entry["depth"] += 1
+                self.stats["acquired"] += 1
+                try:
+                    yield
+                finally:
+                    entry["depth"] -= 1
+                    if entry["depth"] == 0 and entry["file"] is not None:
+                        fcntl.flock(entry["file"].fileno(), fcntl.LOCK_UN)
+                        entry["file"].close()
+                        entry["file"] = None
+            finally:
+                entry["lock"].release()
+        finally:
+            self._release_entry(key, entry)
+
+    def get_stats(self):
+        """잠금 횟수, 다른 스레드/워커를 기다린 횟수"""
+        with self.guard:
+            return {**self.stats, "held": len(self.locks), "cross_process": fcntl is not None}
@@ -0,0 +1,113 @@
+import os
+import threading
+from collections import OrderedDict
+
+# ✅ 인덱스 캐시 설정 (환경 변수 우선)
+FAISS_INDEX_CACHE_BYTES = int(os.getenv("FAISS_INDEX_CACHE_BYTES", str(512 * 1024 * 1024)))  # ✅ 기본 512MB
+
+
+def estimate_vector_bytes(index):
+    """인덱스의 벡터 메모리 크기 추정 (벡터 개수 × 코드 크기)"""
+    if hasattr(index, "layers"):
+        return sum(estimate_vector_bytes(layer) for layer in index.layers())  # ✅ 본 인덱스 + 델타
+    try:
+        code_size = index.sa_code_size()
+    except RuntimeError:
+        code_size = index.d * 4  # ✅ sa_code_size를 지원하지 않는 인덱스는 float32 기준
+    return index.ntotal * code_size
+
+
+def estimate_docs_bytes(docs):
+    """문서 크기 (사이드카는 매핑된 바이트 수, dict는 텍스트 UTF-8 크기)"""
+    if hasattr(docs, "nbytes"):
+        return docs.nbytes
+    return sum(len(text.encode("utf-8")) for text in docs.values())
+
+
+class FaissIndexCache:
+    """채팅방별로 불러온 FAISS 인덱스와 문서를 보관하는 LRU 캐시
+
+    전체 크기(벡터 + 문서 바이트)가 max_bytes를 넘으면 가장 오래 사용하지 않은
+    채팅방부터 내보낸다. 인덱스가 바뀌면 put으로 새 항목을 넣어 캐시를 함께 갱신한다(write-through,
+    검색 중인 스레드가 쥔 이전 항목의 인덱스/문서는 바꾸지 않음).
+    항목마다 불러올 때의 저장 버전 표시(stamp)를 기록해, 다른 워커가 인덱스를 바꿨는지 비교한다.
+    """
+
+    def __init__(self, max_bytes=FAISS_INDEX_CACHE_BYTES, on_evict=None):
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict  # ✅ 항목이 빠질 때 호출 (chat_id)
+        self.entries = OrderedDict()  # ✅ {chat_id: {"index": ..., "docs": ..., "bytes": n, "stamp": 저장 버전 표시}}
+        self.bytes = 0
+        self.lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "stale": 0}
+
+    def get(self, chat_id):
+        """캐시된 항목 반환 (없으면 None)"""
+        with self.lock:
+            entry = self.entries.get(chat_id)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+
+            self.entries.move_to_end(chat_id)
+            self.stats["hits"] += 1
+            return entry
+
+    def put(self, chat_id, index, docs, stamp=None):
+        """인덱스와 문서를 캐시에 넣고 한도를 넘으면 오래된 항목부터 제거
+
+        같은 채팅방 항목을 바꾸는 것은 제거가 아니므로 on_evict를 호출하지 않는다
+        (채팅방별 부가 정보, 예: 방금 갱신한 문서 해시를 유지).
+        """
+        with self.lock:
+            previous = self.entries.pop(chat_id, None)
+            if previous is not None:
+                self.bytes -= previous["bytes"]
+            entry = {"index": index, "docs": docs, "bytes": estimate_vector_bytes(index) + estimate_docs_bytes(docs), "stamp": stamp}
+            self.entries[chat_id] = entry
+            self.bytes += entry["bytes"]
+            self._evict()
+            return entry
+
+    def restamp(self, chat_id, previous, stamp):
+        """직접 커밋한 뒤 버전 표시 갱신 (커밋 전 표시가 previous와 같던 항목만, 즉 디스크와 맞던 항목만)"""
+        with self.lock:
+            entry = self.entries.get(chat_id)
+            if entry is not None and entry["stamp"] == previous:
+                entry["stamp"] = stamp
+
+    def invalidate(self, chat_id):
+        """다른 워커가 바꿔서 디스크와 어긋난 항목 제거"""
+        with self.lock:
+            if self.pop(chat_id) is not None:
+                self.stats["stale"] += 1
+
+    def pop(self, chat_id):
+        """캐시에서 항목 제거 (삭제/무효화용, 제거 횟수에는 포함하지 않음)"""
+        with self.lock:
+            entry = self.entries.pop(chat_id, None)
+            if entry is not None:
+                self.bytes -= entry["bytes"]
+                if self.on_evict:
+                    self.on_evict(chat_id)
+            return entry
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self.entries:
+            chat_id, entry = self.entries.popitem(last=False)
+            self.bytes -= entry["bytes"]
+            self.stats["evictions"] += 1
+            if self.on_evict:
+                self.on_evict(chat_id)
+
+    def get_stats(self):
+        """캐시 적중/실패/제거 횟수와 현재 크기"""
+        with self.lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes
+            }
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from collections import deque
+
+# ✅ 색인 write-behind 큐 설정 (환경 변수 우선)
+INDEX_QUEUE_WORKERS = int(os.getenv("INDEX_QUEUE_WORKERS", "2"))  # ✅ 동시에 색인하는 채팅방 수
+INDEX_QUEUE_MAX_PENDING = int(os.getenv("INDEX_QUEUE_MAX_PENDING", "1000"))  # ✅ 대기 중인 채팅방이 이만큼이면 새 채팅방은 받지 않음
+
+
+class IndexQueue:
+    """채팅방 색인 요청을 모아서 응답 뒤에 처리하는 write-behind 큐
+
+    채팅방마다 대기 작업은 최대 하나다. 이미 대기 중인 채팅방에 요청이 또 오면 그 작업에 합쳐지고,
+    작업은 실행될 때 Firestore의 high-water mark 이후 메시지를 한 번에 증분 색인한다.
+    색인 중인 채팅방에 온 요청은 대기 작업으로 남았다가 지금 작업이 끝난 뒤 실행된다 (같은 채팅방은 동시에 색인하지 않음).
+    대기 중인 채팅방이 INDEX_QUEUE_MAX_PENDING개면 submit()이 False를 반환하고, 호출한 쪽이 직접 색인한다(backpressure).
+    작업 스레드는 처음 submit할 때 현재 프로세스에서 시작한다 (preload 모드에서 fork 후에도 안전).
+    """
+
+    def __init__(self, index_fn, workers=INDEX_QUEUE_WORKERS, max_pending=INDEX_QUEUE_MAX_PENDING):
+        self.index_fn = index_fn  # ✅ (chat_id, charac_id) → 증분 색인
+        self.workers = workers
+        self.max_pending = max_pending
+        self.condition = threading.Condition()
+        self.pid = None
+        self._reset()
+
+    def _reset(self):
+        self.pending = {}  # ✅ {chat_id: {"charac_id", "enqueued_at", "requests"}}
+        self.ready = deque()  # ✅ 바로 실행할 수 있는 채팅방 (색인 중이 아닌 대기 채팅방)
+        self.running = set()
+        self.stats = {"requested": 0, "coalesced": 0, "rejected": 0, "completed": 0, "failed": 0, "max_depth": 0, "lag_seconds": 0.0, "max_lag_seconds": 0.0, "last_lag_seconds": 0.0}
+
+    def _ensure_workers(self):
+        if self.pid == os.getpid():
+            return
+        self._reset()
+        self.pid = os.getpid()
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"index-queue-{i}", daemon=True).start()
+
+    def submit(self, chat_id, charac_id):
+        """채팅방 색인 예약 (대기 작업에 합쳐지거나 새로 추가되면 True, 큐가 가득 차면 False)"""
+        with self.condition:
+            self._ensure_workers()
+            self.stats["requested"] += 1
+
+            job = self.pending.get(chat_id)
+            if job is not None:
+                job["requests"] += 1
+                self.stats["coalesced"] += 1
+                return True
+
+            if len(self.pending) >= self.max_pending:
+                self.stats["rejected"] += 1
+                return False
+
+            self.pending[chat_id] = {"charac_id": charac_id, "enqueued_at": time.monotonic(), "requests": 1}
+            self.stats["max_depth"] = max(self.stats["max_depth"], len(self.pending))
+            if chat_id not in self.running:
+                self.ready.append(chat_id)
+                self.condition.notify_all()  # ✅ wait_idle()도 같은 condition을 기다리므로 모두 깨움
+            return True
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                while not self.ready:
+                    self.condition.wait()
+                chat_id = self.ready.popleft()
+                job = self.pending.pop(chat_id)
+                self.running.add(chat_id)
+
+            failed = False
+            try:
+                self.index_fn(chat_id, job["charac_id"])
+            except Exception as e:
+                failed = True
+                print(f"🚨 FAISS 색인 실패 ({chat_id}): {e}")
+
+            with self.condition:
+                self.running.discard(chat_id)
+                lag = time.monotonic() - job["enqueued_at"]  # ✅ 첫 요청부터 색인 완료까지 걸린 시간
+                self.stats["failed" if failed else "completed"] += 1
+                self.stats["lag_seconds"] += lag
+                self.stats["last_lag_seconds"] = lag
+                self.stats["max_lag_seconds"] = max(self.stats["max_lag_seconds"], lag)
+
+                # ✅ 색인하는 동안 새 요청이 왔으면 이어서 실행
+                if chat_id in self.pending:
+                    self.ready.append(chat_id)
+                self.condition.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """대기/실행 중인 작업이 모두 끝날 때까지 기다림 (끝나면 True)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while self.pending or self.running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+            return True
+
+    def get_stats(self):
+        """큐 길이, 합쳐진 요청 비율, 색인 지연 시간"""
+        with self.condition:
+            stats = dict(self.stats)
+            stats["depth"] = len(self.pending)
+            stats["running"] = len(self.running)
+        jobs = stats["completed"] + stats["failed"]
+        stats["workers"] = self.workers
+        stats["max_pending"] = self.max_pending
+        stats["coalescing_ratio"] = stats["coalesced"] / stats["requested"] if stats["requested"] else 0.0
+        stats["avg_lag_seconds"] = stats["lag_seconds"] / jobs if jobs else 0.0
+        return stats
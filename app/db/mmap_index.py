@@ -0,0 +1,94 @@
+import os
+
+import faiss
+import numpy as np
+
+# ✅ 읽기 전용 memmap 로드 설정 (환경 변수 우선)
+FAISS_MMAP = os.getenv("FAISS_MMAP", "1") == "1"  # ✅ 1이면 본 인덱스를 복사하지 않고 페이지 캐시에서 바로 읽음
+FAISS_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def read_index_mmap(index_path):
+    """인덱스 파일을 읽기 전용 memmap으로 열기
+
+    IndexFlatCodes 계열(Flat, SQ, PQ)은 코드 배열이 파일에 매핑되어 여러 워커가 같은
+    페이지 캐시를 공유한다. 그 밖의 인덱스 종류는 평소처럼 메모리로 복사해서 읽는다.
+    매핑된 인덱스에는 벡터를 추가/삭제하면 안 된다 (faiss가 프로세스를 중단시킴).
+    """
+    return faiss.read_index(index_path, FAISS_MMAP_FLAGS)
+
+
+def write_index_atomic(index, index_path):
+    """임시 파일에 쓴 뒤 교체 (이미 매핑해서 읽고 있는 워커는 이전 파일을 그대로 사용)"""
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"  # ✅ 워커마다 다른 임시 파일 (서로의 임시 파일을 덮어쓰지 않음)
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, index_path)
+
+
+class LayeredIndex:
+    """읽기 전용 본 인덱스 + 메모리 델타 인덱스
+
+    본 인덱스(.bin)는 memmap으로 열어 두고, 새 벡터는 작은 IndexFlatL2 델타에만 추가한다.
+    벡터 ID는 본 인덱스 다음부터 이어지므로 기존 문서 ID(0, 1, 2, ...)와 그대로 맞는다.
+    델타는 merge_faiss_delta에서 to_index()로 합쳐 새 본 인덱스 파일로 저장된다.
+    캐시된 인덱스는 여러 스레드가 동시에 검색하므로 제자리에서 바꾸지 않고 with_vectors()로
+    델타만 복사한 새 인덱스를 만들어 교체한다 (faiss는 동시 읽기만 안전).
+    """
+
+    def __init__(self, base, index_path=None, delta=None):
+        self.base = base
+        self.index_path = index_path  # ✅ 병합할 때 본 인덱스를 쓰기 가능한 복사본으로 다시 읽을 경로
+        self.delta = delta if delta is not None else faiss.IndexFlatL2(base.d)
+        self.d = base.d
+
+    @property
+    def ntotal(self):
+        return self.base.ntotal + self.delta.ntotal
+
+    def layers(self):
+        return (self.base, self.delta)
+
+    def add(self, vectors):
+        """새 벡터는 델타 인덱스에만 추가"""
+        self.delta.add(vectors)
+
+    def with_vectors(self, vectors):
+        """벡터를 추가한 새 인덱스 (본 인덱스는 공유하고 델타만 복사, 델타 크기는 병합 임계값까지)"""
+        delta = faiss.IndexFlatL2(self.d)
+        if self.delta.ntotal:
+            delta.add(self.delta.reconstruct_n(0, self.delta.ntotal))
+        delta.add(vectors)
+        return LayeredIndex(self.base, self.index_path, delta)
+
+    def search(self, x, k):
+        """본 인덱스와 델타를 각각 검색해 거리순으로 합침"""
+        results = []
+        for offset, index in ((0, self.base), (self.base.ntotal, self.delta)):
+            if index.ntotal:
+                D, I = index.search(x, min(k, index.ntotal))
+                results.append((D, np.where(I >= 0, I + offset, -1)))
+
+        if not results:
+            return np.empty((len(x), 0), dtype=np.float32), np.empty((len(x), 0), dtype=np.int64)
+
+        D = np.hstack([D for D, _ in results])
+        I = np.hstack([I for _, I in results])
+        order = np.argsort(D, axis=1)[:, :k]
+        return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+    def reconstruct_n(self, i0, n):
+        vectors = [index.reconstruct_n(0, index.ntotal) for index in self.layers() if index.ntotal]
+        vectors = np.vstack(vectors) if vectors else np.empty((0, self.d), dtype=np.float32)
+        return vectors[i0:i0 + n]
+
+    def to_index(self):
+        """델타를 합친 쓰기 가능한 인덱스 (본 인덱스는 파일에서 메모리로 복사해 읽음)"""
+        if self.index_path and os.path.exists(self.index_path) and self.base.ntotal:
+            index = faiss.read_index(self.index_path)
+        elif self.base.ntotal:
+            index = faiss.clone_index(self.base)  # ✅ 파일이 없는 메모리 본 인덱스 (FAISS_MMAP=0)
+        else:
+            index = faiss.IndexFlatL2(self.d)
+        if self.delta.ntotal:
+            index.add(self.delta.reconstruct_n(0, self.delta.ntotal))
+        return index
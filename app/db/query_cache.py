@@ -0,0 +1,85 @@
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# ✅ 검색 결과 캐시 설정 (환경 변수 우선)
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "4096"))  # ✅ 보관할 (채팅방, 질문) 결과 수 (0이면 끔)
+
+WHITESPACE = re.compile(r"\s+")
+TRAILING_PUNCTUATION = re.compile(r"[\s?!.,~…？！。]+$")
+
+
+def normalize_query(query):
+    """질문 정규화: 유니코드 NFKC, 소문자, 공백 하나로, 끝의 물음표/느낌표/물결 등 제거
+
+    "내 취미가 뭐였지?"와 "내 취미가  뭐였지"는 같은 키가 된다.
+    """
+    query = unicodedata.normalize("NFKC", query).lower()
+    query = WHITESPACE.sub(" ", query).strip()
+    return TRAILING_PUNCTUATION.sub("", query)
+
+
+class QueryResultCache:
+    """(채팅방, 정규화한 질문, top_k) → 검색 결과 LRU 캐시
+
+    결과마다 검색할 때의 인덱스 버전을 함께 저장하고, 조회할 때 현재 버전과 다르면
+    (새 메시지 색인, 병합, 압축, 삭제, 다른 워커의 커밋) 버리고 다시 검색한다.
+    같은 질문을 다시 하면 임베딩과 FAISS 검색을 모두 건너뛴다.
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # ✅ {(chat_id, 질문, top_k): (인덱스 버전, 결과)}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0}
+
+    def get(self, chat_id, query, top_k, version):
+        """현재 인덱스 버전으로 캐시된 결과 (없거나 버전이 다르면 None)"""
+        if self.max_entries <= 0:
+            return None
+
+        key = (chat_id, normalize_query(query), top_k)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[1]
+
+            if entry is not None:
+                del self.entries[key]  # ✅ 인덱스가 바뀐 뒤의 결과는 버림
+                self.stats["stale"] += 1
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, chat_id, query, top_k, version, results):
+        """검색 결과 저장 (version: 검색하기 전에 읽은 인덱스 버전)"""
+        if self.max_entries <= 0:
+            return
+
+        key = (chat_id, normalize_query(query), top_k)
+        with self.lock:
+            self.entries[key] = (version, results)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def forget(self, chat_id):
+        """채팅방의 결과를 모두 제거 (채팅방 삭제용)"""
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == chat_id]:
+                del self.entries[key]
+
+    def get_stats(self):
+        """캐시 적중/실패/버전 불일치/제거 횟수와 현재 크기"""
+        with self.lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "max_entries": self.max_entries
+            }
@@ -0,0 +1,82 @@
+import os
+
+from db.chat_profiles import PROFILE_TRIGGER
+
+# ✅ 대화 메모리 요약 백엔드 설정 (환경 변수 우선)
+CHAT_MEMORY_SUMMARIZER = os.getenv("CHAT_MEMORY_SUMMARIZER", "extractive")  # ✅ "extractive" | "gemini"
+CHAT_MEMORY_SUMMARY_MODEL = os.getenv("CHAT_MEMORY_SUMMARY_MODEL", "gemini-2.0-flash")
+CHAT_MEMORY_SUMMARY_MAX_CHARS = int(os.getenv("CHAT_MEMORY_SUMMARY_MAX_CHARS", "400"))  # ✅ 요약 한 개의 최대 길이
+
+
+class Summarizer:
+    """오래된 대화 묶음 → 요약 문장 하나
+
+    요약은 채팅방 인덱스에 일반 문서처럼 임베딩되어 검색되므로, 사실(취미, 직업 등)이
+    빠지지 않도록 짧은 평서문으로 만든다.
+    """
+
+    name = None
+
+    def summarize(self, texts):
+        """대화 문장 목록(오래된 순) → 요약 문자열"""
+        raise NotImplementedError
+
+
+class ExtractiveSummarizer(Summarizer):
+    """모델 없이 원문 문장을 골라 잇는 결정적 요약 (테스트/로컬용)
+
+    프로필 문구(나는 ..., 내 취미는 ... 등)가 들어간 문장을 먼저, 나머지는 긴 문장 순으로
+    max_sentences개를 고른 뒤 원래 순서대로 잇는다. 같은 입력이면 항상 같은 결과가 나온다.
+    """
+
+    name = "extractive"
+
+    def __init__(self, max_sentences=5, max_chars=CHAT_MEMORY_SUMMARY_MAX_CHARS):
+        self.max_sentences = max_sentences
+        self.max_chars = max_chars
+
+    def summarize(self, texts):
+        sentences = list(dict.fromkeys(text.strip() for text in texts if text and text.strip()))
+        ranked = sorted(range(len(sentences)), key=lambda i: (not PROFILE_TRIGGER.search(sentences[i]), -len(sentences[i]), i))
+        chosen = sorted(ranked[:self.max_sentences])
+        return " / ".join(sentences[i] for i in chosen)[:self.max_chars]
+
+
+class GeminiSummarizer(Summarizer):
+    """Gemini로 대화 묶음을 요약 (GEMINI_API_KEY 필요)"""
+
+    name = "gemini"
+
+    def __init__(self, model_name=CHAT_MEMORY_SUMMARY_MODEL, max_chars=CHAT_MEMORY_SUMMARY_MAX_CHARS):
+        import google.generativeai as genai
+
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY가 설정되지 않았습니다.")
+        genai.configure(api_key=api_key)
+
+        self.model = genai.GenerativeModel(model_name)
+        self.max_chars = max_chars
+
+    def summarize(self, texts):
+        conversation = "\n".join(f"- {text}" for text in texts)
+        prompt = f"""
+        다음은 사용자와 반려동물 캐릭터가 나눈 오래된 대화입니다.
+        사용자에 대한 사실(이름, 취미, 직업, 사는 곳, 좋아하는 것, 약속 등)이 빠지지 않도록
+        {self.max_chars}자 이내의 짧은 평서문으로 요약하세요. 요약만 출력하세요.
+
+        {conversation}
+        """
+        response = self.model.generate_content([prompt])
+        summary = ' '.join((response.text or "").split())
+        # ✅ 응답이 비면 결정적 요약으로 대체 (요약 없이 메시지를 버리지 않도록)
+        return summary[:self.max_chars] if summary else ExtractiveSummarizer(max_chars=self.max_chars).summarize(texts)
+
+
+def get_summarizer(backend=CHAT_MEMORY_SUMMARIZER):
+    """설정에 맞는 요약 백엔드 생성"""
+    if backend == "extractive":
+        return ExtractiveSummarizer()
+    if backend == "gemini":
+        return GeminiSummarizer()
+    raise ValueError(f"알 수 없는 CHAT_MEMORY_SUMMARIZER: {backend}")
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ✅ 벡터 작업 전용 스레드 풀 설정 (환경 변수 우선)
+VECTOR_EXECUTOR_WORKERS = int(os.getenv("VECTOR_EXECUTOR_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+class VectorExecutor:
+    """임베딩/FAISS 추가·검색·저장 같은 CPU 작업을 이벤트 루프 밖에서 실행하는 전용 스레드 풀
+
+    FAISS와 PyTorch/ONNX Runtime은 연산 중 GIL을 놓기 때문에 스레드 풀로도 병렬로 돈다
+    (프로세스 풀은 로드한 모델과 인덱스 캐시를 프로세스마다 따로 가져야 해서 쓰지 않음).
+    풀 크기가 CPU 작업 동시 실행 수의 상한이 되고, 초과한 요청은 큐에서 기다린다.
+    풀 안에서 다시 run()을 호출하면 바로 실행해서 풀이 스스로를 기다리며 멈추지 않게 한다.
+    """
+
+    def __init__(self, max_workers=VECTOR_EXECUTOR_WORKERS):
+        self.max_workers = max_workers
+        self.local = threading.local()
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vector-worker", initializer=self._mark_worker)
+        self.lock = threading.Lock()
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "active": 0, "queue_wait_seconds": 0.0, "max_queue_wait_seconds": 0.0}
+
+    def _mark_worker(self):
+        self.local.worker = True
+
+    def in_worker(self):
+        """현재 스레드가 이 풀의 작업 스레드인지 여부"""
+        return getattr(self.local, "worker", False)
+
+    def _call(self, submitted_at, fn, args, kwargs):
+        wait = time.monotonic() - submitted_at
+        with self.lock:
+            self.stats["active"] += 1
+            self.stats["queue_wait_seconds"] += wait
+            self.stats["max_queue_wait_seconds"] = max(self.stats["max_queue_wait_seconds"], wait)
+
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            with self.lock:
+                self.stats["failed"] += 1
+            raise
+        finally:
+            with self.lock:
+                self.stats["active"] -= 1
+                self.stats["completed"] += 1
+        return result
+
+    def submit(self, fn, *args, **kwargs):
+        """작업을 풀에 넣고 concurrent.futures.Future 반환"""
+        with self.lock:
+            self.stats["submitted"] += 1
+        return self.pool.submit(self._call, time.monotonic(), fn, args, kwargs)
+
+    def run(self, fn, *args, **kwargs):
+        """동기 코드용: 풀에서 실행하고 결과를 기다림 (풀 안에서 호출하면 바로 실행)"""
+        if self.in_worker():
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def run_async(self, fn, *args, **kwargs):
+        """async 라우트용: 이벤트 루프를 막지 않고 풀에서 실행한 결과를 await"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def get_stats(self):
+        """풀 크기, 대기/실행 중인 작업 수와 평균 큐 대기 시간"""
+        with self.lock:
+            stats = dict(self.stats)
+        stats["max_workers"] = self.max_workers
+        stats["pending"] = stats["submitted"] - stats["completed"] - stats["active"]
+        stats["avg_queue_wait_seconds"] = stats["queue_wait_seconds"] / stats["completed"] if stats["completed"] else 0.0
+        return stats
+
+
+vector_executor = VectorExecutor()
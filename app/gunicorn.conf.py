@@ -0,0 +1,16 @@
+# ✅ 여러 워커 실행 설정 (app 디렉토리에서: gunicorn main:app -c gunicorn.conf.py)
+# preload_app=True이면 마스터가 임베딩 모델을 한 번만 로드하고 워커들이 fork로 공유한다.
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:7000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("PRELOAD_APP", "1") == "1"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+
+def when_ready(server):
+    """마스터가 앱을 불러온 뒤, 워커를 fork하기 직전에 호출됨"""
+    if preload_app:
+        from core.preload import freeze_preloaded
+        freeze_preloaded()
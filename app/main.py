@@ -12,7 +12,8 @@ from firebase_admin import credentials, firestore
 from core import db
 
 # FAISS 벡터 DB 관련 모듈 추가
-from db.faiss_db import ensure_faiss_directory, load_existing_faiss_indices
+from db.faiss_db import ensure_faiss_directory, load_existing_faiss_indices, start_faiss_prefetch, FAISS_EAGER_LOAD
+from db.catalog_cache import start_catalog_listeners
 
 # from routes import (
 #     chat_send_message_router, chat_history_router, chat_list_router, clear_chat_router,
@@ -57,6 +58,12 @@ async def log_middleware(request: Request, call_next):
 
     response = await call_next(request)
 
+    # ✅ 스트리밍(SSE) 응답은 본문을 모으지 않고 바로 흘려보냄 (본문 없이 로그만 남김)
+    if response.headers.get("content-type", "").startswith("text/event-stream"):
+        task = BackgroundTask(log_info, req_method, req_url, req_headers, req_body, response.status_code, dict(response.headers), b"<stream>")
+        response.background = task
+        return response
+
     res_status = response.status_code
     res_headers = dict(response.headers)
     res_body = b''
@@ -82,8 +89,19 @@ app.add_middleware(
 # 서버 시작 시 FAISS 저장 디렉토리 자동 생성
 ensure_faiss_directory()
 
-# 서버 시작 시 기존 FAISS 인덱스 자동 로드
-load_existing_faiss_indices()
+# 서버 시작 시 기존 FAISS 인덱스 자동 로드 (FAISS_EAGER_LOAD=1일 때만, 기본은 처음 조회할 때 로드)
+if FAISS_EAGER_LOAD:
+    load_existing_faiss_indices()
+
+# 서버가 요청을 받기 시작한 뒤 최근 채팅방 인덱스를 백그라운드에서 미리 로드
+@app.on_event("startup")
+async def start_faiss_warmup():
+    start_faiss_prefetch()
+
+# 워커마다 기준 데이터(성격, 동물, 외모) 스냅샷 리스너 시작 (CATALOG_LISTENER=1일 때)
+@app.on_event("startup")
+async def start_catalog_watch():
+    start_catalog_listeners()
 
 # API 라우트 등록 (각 기능별 엔드포인트 연결)
 app.include_router(user_router)
@@ -91,6 +109,7 @@ app.include_router(chat_send_message_router, prefix="/chat")
 app.include_router(chat_history_router, prefix="/chat")
 app.include_router(chat_list_router, prefix="/chat")
 app.include_router(clear_chat_router, prefix="/chat")
+app.include_router(chat_stream_router, prefix="/chat")
 app.include_router(characters_router, prefix="/pets")
 app.include_router(base_router, prefix="/home")
 app.include_router(image_router, prefix="/home")
@@ -99,6 +118,8 @@ app.include_router(register_router, prefix="/home")
 app.include_router(login_router, prefix="/home")
 app.include_router(show_image_router, prefix="/image")
 app.include_router(create_router, prefix="/create")
+app.include_router(metrics_router, prefix="/status")
+app.include_router(ready_router, prefix="/status")
 
 # FastAPI 실행 (로컬 환경에서 직접 실행할 경우)
 if __name__ == "__main__":
@@ -3,6 +3,7 @@ from .chat.send_message import router as chat_send_message_router
 from .chat.chat_history import router as chat_history_router
 from .chat.chat_list import router as chat_list_router
 from .chat.clear_chat import router as clear_chat_router
+from .chat.stream_message import router as chat_stream_router
 
 # Pets Router 설정
 from .pets.characters import router as characters_router
@@ -19,4 +20,8 @@ from .home.register import router as register_router
 from .image.ShowImageRoutes import router as show_image_router
 
 from .create.CreateRouter import router as create_router
-from .home.login import router as login_router
\ No newline at end of file
+from .home.login import router as login_router
+
+# Status Router 설정
+from .status.metrics import router as metrics_router
+from .status.ready import router as ready_router
\ No newline at end of file
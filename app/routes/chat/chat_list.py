@@ -1,11 +1,10 @@
 from fastapi import APIRouter, HTTPException
 from firebase_admin import firestore
+from core.firebase import db  # ✅ 프로세스별로 처음 사용할 때 생성 (fork 안전)
 
 # ✅ FastAPI 라우터 생성
 router = APIRouter()
 
-# ✅ Firestore 클라이언트 연결
-db = firestore.client()
 
 # ✅ 로깅 설정
 
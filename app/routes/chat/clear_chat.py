@@ -1,9 +1,8 @@
 from fastapi import APIRouter, HTTPException
 from firebase_admin import firestore
+from core.firebase import db  # ✅ 프로세스별로 처음 사용할 때 생성 (fork 안전)
 from db.faiss_db import delete_faiss_index  # ✅ 추가
 
-# ✅ Firestore 클라이언트 생성
-db = firestore.client()
 
 # ✅ FastAPI 라우터 설정
 router = APIRouter()
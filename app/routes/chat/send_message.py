@@ -1,13 +1,13 @@
 import os
 from fastapi import APIRouter, HTTPException, Query
-from services.chat_service import generate_ai_response, get_character_data, initialize_chat
+from fastapi.concurrency import run_in_threadpool
+from services.chat_service import generate_ai_response, get_character_data, initialize_chat, load_chat_context
 from firebase_admin import firestore
-from db.faiss_db import store_chat_in_faiss  # ✅ 채팅방별 FAISS 저장
+from core.firebase import db  # ✅ 프로세스별로 처음 사용할 때 생성 (fork 안전)
 
 # Suppress debug messages from python_multipart
 
 router = APIRouter()
-db = firestore.client()
 
 @router.post("/send_message",
              tags=["chat"], 
@@ -25,16 +25,19 @@ async def chat_with_ai(
 
     chat_id = f"{user_id}-{charac_id}"
 
+    # ✅ 채팅방/캐릭터/사용자 문서를 한 번에 읽기 (이후 단계는 다시 읽지 않음)
+    context = await run_in_threadpool(load_chat_context, user_id, charac_id)
+
     # ✅ 캐릭터 데이터 가져오기
-    character_data = get_character_data(user_id, charac_id)
+    character_data = get_character_data(user_id, charac_id, context)
     if character_data is None:
         raise HTTPException(status_code=404, detail="Character data not found")
 
     # ✅ 채팅방이 존재하지 않으면 자동 생성
-    initialize_chat(user_id, charac_id, character_data)  # 🔥 여기에 추가
+    await run_in_threadpool(initialize_chat, user_id, charac_id, character_data, context)  # 🔥 여기에 추가
 
-    # ✅ AI 응답 생성
-    ai_response, error = generate_ai_response(user_id, charac_id, user_input)
+    # ✅ AI 응답 생성 (LLM은 비동기 클라이언트로, Firestore/벡터 검색은 스레드에서 실행)
+    ai_response, error = await generate_ai_response(user_id, charac_id, user_input, context)
     if error:
         raise HTTPException(status_code=500, detail=error)
 
@@ -51,8 +54,7 @@ async def chat_with_ai(
     except Exception as e:
         raise HTTPException(status_code=500, detail="Firestore 저장 중 오류 발생")
 
-    # ✅ Firestore 저장 후 해당 채팅방의 FAISS 벡터 DB에 저장
-    store_chat_in_faiss(chat_id, charac_id)  # 🔥 채팅방별 벡터 DB 저장
+    # ✅ FAISS 벡터 DB 저장은 generate_ai_response가 색인 큐에 예약함 (응답 뒤에 처리)
 
     response = {"response": ai_response}
     return response
\ No newline at end of file
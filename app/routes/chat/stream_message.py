@@ -0,0 +1,116 @@
+import json
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from services.chat_service import stream_ai_response, get_character_data, initialize_chat, load_chat_context
+from firebase_admin import firestore
+from core.firebase import db  # ✅ 프로세스별로 처음 사용할 때 생성 (fork 안전)
+
+router = APIRouter()
+
+
+def update_last_message(chat_id: str, charac_id: str, ai_response: str):
+    """Firestore `chats/{chat_id}` 문서의 `last_message` 업데이트 (대화 유지용)"""
+    db.collection("chats").document(chat_id).set(
+        {
+            "last_message": {"content": ai_response, "sender": charac_id},
+            "last_active_at": firestore.SERVER_TIMESTAMP
+        },
+        merge=True,
+    )
+
+
+async def stream_chat_turn(user_id: str, charac_id: str, user_input: str, context=None):
+    """한 턴의 스트리밍 이벤트 (끝까지 받은 응답만 저장되며, done 이벤트 전에 last_message도 갱신)"""
+    chat_id = f"{user_id}-{charac_id}"
+    async for event, data in stream_ai_response(user_id, charac_id, user_input, context):
+        if event == "done":
+            try:
+                await run_in_threadpool(update_last_message, chat_id, charac_id, data)
+            except Exception:
+                yield "error", "Firestore 저장 중 오류 발생"
+                return
+        yield event, data
+
+
+async def prepare_chat(user_id: str, charac_id: str):
+    """문서를 한 번에 읽고 캐릭터 데이터 확인 후 채팅방이 없으면 생성 (send_message와 같은 순서)
+
+    읽은 문서(ChatContext)를 돌려주어 프롬프트 구성에서 다시 읽지 않게 한다.
+    """
+    context = await run_in_threadpool(load_chat_context, user_id, charac_id)
+    character_data = get_character_data(user_id, charac_id, context)
+    if character_data is None:
+        raise HTTPException(status_code=404, detail="Character data not found")
+    await run_in_threadpool(initialize_chat, user_id, charac_id, character_data, context)
+    return context
+
+
+def format_sse(event: str, data: dict):
+    """Server-Sent Events 한 건"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/send_message/stream",
+             tags=["chat"],
+             summary="AI 응답 스트리밍 (SSE)",
+             description="AI 응답을 토큰이 생성되는 대로 Server-Sent Events로 보냅니다. 이벤트: token, done, error")
+async def chat_with_ai_stream(
+    user_input: str = Query(..., description="User input"),
+    user_id: str = Query(..., description="User ID"),
+    charac_id: str = Query(..., description="Character ID")
+):
+    """
+    ✅ `/chat/send_message`의 스트리밍 버전
+    - `event: token` → `{"text": 조각}` (Gemini가 보낸 그대로)
+    - `event: done` → `{"response": 후처리한 전체 응답}` (저장되는 내용과 같음)
+    - `event: error` → `{"detail": 오류 메시지}`
+    """
+    if not user_input.strip():
+        raise HTTPException(status_code=400, detail="Empty message not allowed")
+
+    context = await prepare_chat(user_id, charac_id)
+
+    async def events():
+        async for event, data in stream_chat_turn(user_id, charac_id, user_input, context):
+            if event == "token":
+                yield format_sse(event, {"text": data})
+            elif event == "done":
+                yield format_sse(event, {"response": data})
+            else:
+                yield format_sse(event, {"detail": data})
+
+    # ✅ 프록시(nginx 등)가 응답을 모아 두지 않도록 버퍼링 끔
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.websocket("/ws/{user_id}/{charac_id}")
+async def chat_with_ai_websocket(websocket: WebSocket, user_id: str, charac_id: str):
+    """
+    ✅ WebSocket 스트리밍 채팅
+    - 클라이언트 → `{"message": "..."}`
+    - 서버 → `{"type": "token", "text": 조각}` … `{"type": "done", "response": 전체 응답}` 또는 `{"type": "error", "detail": ...}`
+    """
+    await websocket.accept()
+    try:
+        while True:
+            user_input = (await websocket.receive_json()).get("message", "")
+            if not user_input.strip():
+                await websocket.send_json({"type": "error", "detail": "Empty message not allowed"})
+                continue
+
+            try:
+                context = await prepare_chat(user_id, charac_id)  # ✅ 메시지마다 새로 읽음 (그사이 바뀐 닉네임 등 반영)
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "detail": e.detail})
+                continue
+
+            async for event, data in stream_chat_turn(user_id, charac_id, user_input, context):
+                if event == "token":
+                    await websocket.send_json({"type": event, "text": data})
+                elif event == "done":
+                    await websocket.send_json({"type": event, "response": data})
+                else:
+                    await websocket.send_json({"type": event, "detail": data})
+    except WebSocketDisconnect:
+        pass
@@ -1,11 +1,11 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Query
-from services.chat_service import generate_ai_response, get_character_data, initialize_chat
+from fastapi.concurrency import run_in_threadpool
+from services.chat_service import generate_ai_response, get_character_data, initialize_chat, load_chat_context
 from firebase_admin import firestore
-from db.faiss_db import store_chat_in_faiss  # ✅ 채팅방별 FAISS 저장
+from core.firebase import db  # ✅ 프로세스별로 처음 사용할 때 생성 (fork 안전)
 import json
 
 router = APIRouter()
-db = firestore.client()
 
 # WebSocket을 통해 연결된 클라이언트 관리
 test_active_connections = []
@@ -18,7 +18,7 @@ async def websocket_endpoint(websocket: WebSocket, chat_id: str):
     try:
         # ✅ 클라이언트가 처음 접속할 때 기존 메시지 가져오기
         chat_ref = db.collection("chats").document(chat_id)
-        chat_data = chat_ref.get()
+        chat_data = await run_in_threadpool(chat_ref.get)
         if (chat_data.exists):
             messages = chat_data.to_dict().get("messages", [])
             await websocket.send_text(json.dumps({"chat_id": chat_id, "messages": messages}))
@@ -30,7 +30,7 @@ async def websocket_endpoint(websocket: WebSocket, chat_id: str):
             message = message_data.get("message")
 
             # Firestore에 메시지 저장
-            chat_ref.update({"messages": firestore.ArrayUnion([{ "user_id": user_id, "message": message }])})
+            await run_in_threadpool(chat_ref.update, {"messages": firestore.ArrayUnion([{ "user_id": user_id, "message": message }])})
             
             # 모든 클라이언트에게 메시지 전송
             for conn in test_active_connections:
@@ -53,16 +53,19 @@ async def chat_with_ai(
 
     chat_id = f"{user_id}-{charac_id}"
 
+    # ✅ 채팅방/캐릭터/사용자 문서를 한 번에 읽기 (이후 단계는 다시 읽지 않음)
+    context = await run_in_threadpool(load_chat_context, user_id, charac_id)
+
     # ✅ 캐릭터 데이터 가져오기
-    character_data = get_character_data(user_id, charac_id)
+    character_data = get_character_data(user_id, charac_id, context)
     if character_data is None:
         raise HTTPException(status_code=404, detail="Character data not found")
 
     # ✅ 채팅방이 존재하지 않으면 자동 생성
-    initialize_chat(user_id, charac_id, character_data)  # 🔥 여기에 추가
+    await run_in_threadpool(initialize_chat, user_id, charac_id, character_data, context)  # 🔥 여기에 추가
 
     # ✅ AI 응답 생성
-    ai_response, error = generate_ai_response(user_id, charac_id, user_input)
+    ai_response, error = await generate_ai_response(user_id, charac_id, user_input, context)
     if error:
         raise HTTPException(status_code=500, detail=error)
 
@@ -79,8 +82,7 @@ async def chat_with_ai(
     except Exception as e:
         raise HTTPException(status_code=500, detail="Firestore 저장 중 오류 발생")
 
-    # ✅ Firestore 저장 후 해당 채팅방의 FAISS 벡터 DB에 저장
-    store_chat_in_faiss(chat_id, charac_id)  # 🔥 채팅방별 벡터 DB 저장
+    # ✅ FAISS 벡터 DB 저장은 generate_ai_response가 색인 큐에 예약함 (응답 뒤에 처리)
 
     # ✅ WebSocket을 통해 메시지 전송
     for conn in test_active_connections:
@@ -1,30 +1,24 @@
-from fastapi import APIRouter, HTTPException
-from core.firebase import db
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from db.catalog_cache import catalog_cache
 
 
 router = APIRouter()
 
+
+def build_metadata(appearance_traits, personality_traits):
+    """외모 목록 전체와 성격 목록(id, name) 응답 구성"""
+    appearance_list = [data for _, data in appearance_traits.docs]
+    personality_list = [{"id": data["id"], "name": data["name"]} for _, data in personality_traits.docs]
+    return {"result": True, "appearance_list": appearance_list, "personaliry_list": personality_list}
+
 @router.get("/get_metadata", tags=["create"], summary="외모,성격 특징 가져오기", description="외모,성격 특징을 가져옵니다")
 async def get_appearance():
 
     try:
-        collection = db.collection("appearance_traits").get()
-        appearance_list = []
-        for doc in collection:
-            appearance_list.append(doc.to_dict())
-
-        collection = db.collection("personality_traits").get()
-        personality_list = []
-        for doc in collection:
-            doc_dict = doc.to_dict()
-            personality_list.append({
-                "id": doc_dict["id"],
-                "name": doc_dict['name'],
-            })
-
-        response = {"result": True, "appearance_list": appearance_list, "personaliry_list": personality_list}
-        return response
+        # ✅ 기준 데이터 캐시에서 만들어 둔 JSON을 그대로 반환 (평소에는 Firestore를 읽지 않음)
+        body = await run_in_threadpool(catalog_cache.serialized, "create_metadata", ("appearance_traits", "personality_traits"), build_metadata)
+        return Response(content=body, media_type="application/json")
 
     except Exception as e:
         raise HTTPException(status_code=500, detail="Metadata retrieval failed")
-
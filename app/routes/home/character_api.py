@@ -1,14 +1,17 @@
 import os
 import uuid
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Response
+from fastapi.concurrency import run_in_threadpool
 from firebase_admin import firestore
+from core.firebase import db  # ✅ 프로세스별로 처음 사용할 때 생성 (fork 안전)
+from db.catalog_cache import catalog_cache
+from db.doc_cache import get_cached_doc, invalidate_doc
 from typing import Annotated, List, Optional
 from pydantic import BaseModel
 
 # ✅ 로깅 설정
 
 router = APIRouter()
-db = firestore.client()
 
 BASE_STORAGE_FOLDER = "C:/animal-storage"  # ------------- 삭제 예정
 
@@ -33,6 +36,10 @@ class AnimalResponse(BaseModel):
 class AnimalsListResponse(BaseModel):
     animals: List[AnimalResponse]  # 🔹 리스트 응답 구조
 
+def build_animals_list(animals):
+    """`animals` 컬렉션 → AnimalsListResponse 형식 (id, korean만)"""
+    return {"animals": [{"id": doc_id, "korean": data["korean"]} for doc_id, data in animals.docs]}
+
 # ================================================================
 # 🔹 캐릭터 닉네임 추가/수정 API (/nickname) + 채팅방 자동 생성 추가
 # ================================================================
@@ -47,15 +54,14 @@ async def update_character_nickname(
 ):
 
     try:
-        # 🔹 Firestore에서 기존 캐릭터 문서 확인
+        # 🔹 Firestore에서 기존 캐릭터 문서 확인 (고쳐 쓰기 전이므로 캐시를 건너뛰고 읽음)
         character_ref = db.collection("characters").document(character_id)
-        character_doc = character_ref.get()
+        character_data = get_cached_doc("characters", character_id, strict=True)
         
-        if not character_doc.exists:
+        if character_data is None:
             raise HTTPException(status_code=404, detail="Character ID not found in Firestore")
         
         # 🔹 캐릭터 데이터 가져오기
-        character_data = character_doc.to_dict()
         user_id = character_data.get("user_id")
         status = character_data.get("status", "unknown")  # 기본값 "unknown" 설정
         character_path = character_data.get("character_path", "").strip()  # 기본값 빈 문자열 설정
@@ -72,6 +78,7 @@ async def update_character_nickname(
             "nickname": nickname,  # 🔹 닉네임 업데이트
             "nickname_create_at": firestore.SERVER_TIMESTAMP,  # 🔹 업데이트된 시간 기록
         })
+        invalidate_doc("characters", character_id)  # 🔹 캐시된 이전 닉네임 제거
 
         # 🔹 채팅방 문서 참조 생성
         chat_ref = db.collection("chats").document(character_id)
@@ -173,15 +180,14 @@ async def upload_character_image(
 ):
 
     try:
-        # 🔹 Firestore에서 기존 characterId 문서 확인
+        # 🔹 Firestore에서 기존 characterId 문서 확인 (고쳐 쓰기 전이므로 캐시를 건너뛰고 읽음)
         character_ref = db.collection("characters").document(character_id)
-        character_doc = character_ref.get()
+        character_data = get_cached_doc("characters", character_id, strict=True)
 
-        if not character_doc.exists:
+        if character_data is None:
             raise HTTPException(status_code=404, detail="Character ID not found in Firestore")
 
         # 🔹 Firestore 문서에서 `user_id` 가져오기
-        character_data = character_doc.to_dict()
         user_id = character_data.get("user_id")
         if not user_id:
             raise HTTPException(status_code=500, detail="User ID is missing in Firestore document")
@@ -205,6 +211,7 @@ async def upload_character_image(
             "updatedAt": firestore.SERVER_TIMESTAMP,  # 🔹 업데이트된 시간 기록
             "status": "completed"  # 🔹 상태 변경
         })
+        invalidate_doc("characters", character_id)  # 🔹 캐시된 이전 상태(pending) 제거
 
         response = {
             "characterId": character_id,
@@ -231,12 +238,9 @@ async def upload_character_image(
 async def get_animals():
 
     try:
-        # 🔹 Firestore에서 `animals` 컬렉션의 모든 문서 조회
-        animals_ref = db.collection("animals").stream()
-        animals_list = [{"id": doc.id, **doc.to_dict()} for doc in animals_ref]
-
-        response = {"animals": animals_list}
-        return response
+        # 🔹 기준 데이터 캐시에서 만들어 둔 JSON을 그대로 반환 (평소에는 Firestore를 읽지 않음)
+        body = await run_in_threadpool(catalog_cache.serialized, "animals", ("animals",), build_animals_list)
+        return Response(content=body, media_type="application/json")
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -2,11 +2,13 @@ import os
 import uuid
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form
 from firebase_admin import firestore
+from core.firebase import db  # ✅ 프로세스별로 처음 사용할 때 생성 (fork 안전)
+from db.catalog_cache import CATALOG_COLLECTIONS, get_catalog
+from db.doc_cache import get_cached_doc, invalidate_doc
 from pydantic import BaseModel, Field
 from typing import Annotated
 
 router = APIRouter()
-db = firestore.client()
 
 # 🔹 기본 저장 경로 (사용자별 폴더 적용)
 BASE_STORAGE_FOLDER = "C:/animal-storage"
@@ -23,13 +25,21 @@ class ImageUploadResponse(BaseModel):
     message: str = Field(..., example="Original image stored successfully on the server!", description="API 응답 메시지")
 
 def get_document_id_by_field(collection_name, field_name, value):
-    # 🔹 Firestore에서 특정 필드 값을 기준으로 문서 조회
-    query = db.collection(collection_name).where(field_name, "==", value).stream()
+    # 🔹 기준 데이터(성격, 동물, 외모)는 캐시의 조회표에서 찾기
+    if collection_name in CATALOG_COLLECTIONS:
+        doc_id = get_catalog(collection_name).find_id(field_name, value)
+        if doc_id is not None:
+            print(f"✅ Found Document ID: {doc_id}")
+            return doc_id
 
-    # 🔹 첫 번째 결과만 반환 (여러 개일 경우 첫 번째만 선택)
-    for doc in query:
-        print(f"✅ Found Document ID: {doc.id}")
-        return doc.id
+    # 🔹 그 밖의 컬렉션은 Firestore에서 특정 필드 값을 기준으로 문서 조회
+    else:
+        query = db.collection(collection_name).where(field_name, "==", value).stream()
+
+        # 🔹 첫 번째 결과만 반환 (여러 개일 경우 첫 번째만 선택)
+        for doc in query:
+            print(f"✅ Found Document ID: {doc.id}")
+            return doc.id
 
     # 🔹 결과가 없을 경우
     print("❌ 해당 값에 해당하는 문서를 찾을 수 없습니다.")
@@ -61,8 +71,7 @@ async def upload_original_image(
 
     try:
         # 🔹 Firestore에서 `users` 컬렉션에서 `user_id` 확인
-        user_ref = db.collection("users").document(user_id)
-        if not user_ref.get().exists:
+        if get_cached_doc("users", user_id) is None:
             raise HTTPException(status_code=400, detail="User not found in Firestore")
         
         appearance_id = get_document_id_by_field("appearance_traits", "korean", appearance)
@@ -102,6 +111,7 @@ async def upload_original_image(
             "create_at": firestore.SERVER_TIMESTAMP,  # 🔹 생성 시각 추가
             "status": "pending"
         })
+        invalidate_doc("characters", character_id)  # 🔹 없는 문서로 캐시돼 있었을 수 있음
 
         response = {
             "characterId": character_id,  # 🔹 `{user_id}-{animaltype}{번호}` 반환
@@ -3,12 +3,13 @@ import bcrypt
 import datetime
 from fastapi import APIRouter, HTTPException, Form
 from firebase_admin import firestore
+from core.firebase import db  # ✅ 프로세스별로 처음 사용할 때 생성 (fork 안전)
+from db.doc_cache import get_cached_doc, invalidate_doc
 from pydantic import BaseModel
 from typing import Annotated
 import os
 
 router = APIRouter()
-db = firestore.client()
 
 # 🔹 JWT 설정
 SECRET_KEY = "mysecretkey123"  # 🔥 환경 변수 또는 Firebase 설정에서 불러올 것
@@ -56,13 +57,13 @@ def login_user(
 
     try:
         # 🔹 Firestore에서 사용자 조회
+        # 🔹 비밀번호 확인은 캐시를 건너뛰고 Firestore에서 읽음
         user_ref = db.collection("users").document(user_id)
-        user_doc = user_ref.get()
+        user_data = get_cached_doc("users", user_id, strict=True)
 
-        if not user_doc.exists:
+        if user_data is None:
             raise HTTPException(status_code=404, detail="User not found")
 
-        user_data = user_doc.to_dict()
         stored_hashed_password = user_data.get("hashed_password")
 
         # 🔹 비밀번호 검증
@@ -78,6 +79,7 @@ def login_user(
 
         # 🔹 마지막 로그인 시간 업데이트
         user_ref.update({"last_login": firestore.SERVER_TIMESTAMP})
+        invalidate_doc("users", user_id)
 
         response = UserLoginResponse(
             access_token=access_token,
@@ -1,11 +1,12 @@
 import bcrypt
 from fastapi import APIRouter, HTTPException, Form, Depends
 from firebase_admin import firestore
+from core.firebase import db  # ✅ 프로세스별로 처음 사용할 때 생성 (fork 안전)
+from db.doc_cache import get_cached_doc, invalidate_doc
 from pydantic import BaseModel, Field
 from typing import Annotated
 
 router = APIRouter()
-db = firestore.client()
 
 # ==========================
 # 🔹 비밀번호 해싱 및 검증 함수
@@ -44,7 +45,7 @@ def register_user(
 
         # Firestore에서 user_id 중복 체크
         user_ref = db.collection("users").document(user_id)
-        if user_ref.get().exists:
+        if get_cached_doc("users", user_id, strict=True) is not None:
             raise HTTPException(status_code=400, detail="User ID already exists")
 
         # 비밀번호 해싱
@@ -56,6 +57,7 @@ def register_user(
             "hashed_password": hashed_pw,
             "create_at": firestore.SERVER_TIMESTAMP
         })
+        invalidate_doc("users", user_id)  # 없는 사용자로 캐시돼 있었을 수 있음
 
         return {"userId": user_id, "message": f"User {user_nickname} registered successfully!"}
     except Exception as e:
@@ -0,0 +1,45 @@
+from fastapi import APIRouter
+from services.chat_service import get_stream_stats, get_chat_read_stats
+from services.llm_client import get_llm_stats
+from db.catalog_cache import get_catalog_cache_stats
+from db.doc_cache import get_doc_cache_stats
+from db.faiss_db import get_embedding_cache_stats, get_embedding_batcher_stats, get_index_cache_stats, get_vector_executor_stats, get_index_queue_stats, get_index_lock_stats, get_query_cache_stats
+
+# ✅ FastAPI 라우터 생성
+router = APIRouter()
+
+@router.get("/metrics",
+            tags=["status"],
+            summary="서버 내부 지표 조회",
+            description="임베딩 캐시 등 서버 내부 캐시의 적중/실패 통계를 반환합니다.")
+async def get_metrics():
+    """
+    ✅ 서버 내부 지표를 반환하는 API
+    - `embedding_cache`: 문장 임베딩 캐시의 메모리/디스크 적중, 실패 횟수와 크기
+    - `embedding_batcher`: 임베딩 마이크로 배치 횟수와 평균 배치 크기
+    - `index_cache`: 채팅방별 FAISS 인덱스 캐시의 적중, 실패, 제거 횟수와 메모리 사용량 (stale: 다른 워커가 바꿔서 버린 항목 수)
+    - `vector_executor`: 임베딩/FAISS 작업 전용 스레드 풀의 대기·실행 중인 작업 수와 큐 대기 시간
+    - `index_queue`: 채팅방 색인 write-behind 큐의 길이(depth), 합쳐진 요청 비율(coalescing_ratio), 색인 지연 시간(lag)
+    - `query_cache`: 같은 질문의 검색 결과 캐시 적중률(hit_rate)과 인덱스가 바뀌어 버린 결과 수(stale)
+    - `index_locks`: 채팅방 쓰기 잠금 횟수와 다른 스레드/워커를 기다린 횟수(contended)
+    - `ai_stream`: 스트리밍 응답 수와 첫 토큰까지 걸린 시간(TTFT) 평균/p50/p95/최대
+    - `chat_reads`: 턴당 Firestore 왕복 횟수(avg_round_trips)와 기다린 시간
+    - `catalog_cache`: 성격/동물/외모 기준 데이터 캐시의 적중 횟수, Firestore에서 읽은 문서 수, 리스너 갱신 횟수
+    - `doc_cache`: 사용자/캐릭터 문서 캐시의 적중률(hit_rate), TTL이 지나 다시 읽은 횟수(stale), 쓰기 후 무효화 횟수, 캐시를 건너뛴 읽기(strict_reads)
+    - `llm`: LLM 호출 수, 재시도/시간 초과 횟수, 입력/출력 토큰 수, 호출 지연 시간 평균/p50/p95
+    """
+    response = {
+        "embedding_cache": get_embedding_cache_stats(),
+        "embedding_batcher": get_embedding_batcher_stats(),
+        "index_cache": get_index_cache_stats(),
+        "vector_executor": get_vector_executor_stats(),
+        "index_queue": get_index_queue_stats(),
+        "query_cache": get_query_cache_stats(),
+        "index_locks": get_index_lock_stats(),
+        "ai_stream": get_stream_stats(),
+        "chat_reads": get_chat_read_stats(),
+        "catalog_cache": get_catalog_cache_stats(),
+        "doc_cache": get_doc_cache_stats(),
+        "llm": get_llm_stats()
+    }
+    return response
@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+from db.faiss_db import get_warmup_status
+
+# ✅ FastAPI 라우터 생성
+router = APIRouter()
+
+@router.get("/ready",
+            tags=["status"],
+            summary="서버 준비 상태 조회",
+            description="서버가 요청을 받을 수 있는지와 FAISS 인덱스 워밍업 진행 상황을 반환합니다.")
+async def get_ready():
+    """
+    ✅ 서버 준비 상태를 반환하는 API
+    - `ready`: 요청 처리 가능 여부 (인덱스는 처음 조회할 때 불러오므로 항상 true)
+    - `warmup`: 최근 채팅방 인덱스 미리 불러오기 진행 상황 (state, total, loaded, skipped)
+    """
+    response = {
+        "ready": True,
+        "warmup": get_warmup_status()
+    }
+    return response
@@ -1,23 +1,25 @@
 from firebase_admin import firestore
+from core.firebase import db  # ✅ 프로세스별로 처음 사용할 때 생성 (fork 안전)
 from fastapi import HTTPException
 from datetime import datetime
 from services import initialize_chat
 from db.faiss_db import delete_faiss_index  # ✅ FAISS 벡터 삭제 함수 추가
+from db.doc_cache import get_cached_doc, invalidate_doc
 
 
-db = firestore.client()
 
 def delete_character(user_id: str, charac_id: str):
     """🔥 캐릭터를 삭제하면 연결된 채팅방 및 FAISS 데이터도 삭제"""
 
     char_ref = db.collection("characters").document(f"{user_id}-{charac_id}")
-    char_doc = char_ref.get()
 
-    if not char_doc.exists:
+    # ✅ 삭제 전 확인은 캐시를 건너뛰고 Firestore에서 읽음
+    if get_cached_doc("characters", f"{user_id}-{charac_id}", strict=True) is None:
         raise HTTPException(status_code=404, detail="Character not found")
 
-    # ✅ Firestore에서 캐릭터 데이터 삭제
+    # ✅ Firestore에서 캐릭터 데이터 삭제 (캐시에서도 제거해서 채팅이 바로 막히게 함)
     char_ref.delete()
+    invalidate_doc("characters", f"{user_id}-{charac_id}")
     print(f"✅ Character {charac_id} deleted")
 
     # ✅ Firestore에서 연결된 채팅방 및 메시지 삭제
@@ -1,37 +1,146 @@
 from firebase_admin import firestore
-import google.generativeai as genai
+from core.firebase import db  # ✅ 프로세스별로 처음 사용할 때 생성 (fork 안전)
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 from fastapi import HTTPException
-from db.faiss_db import search_similar_messages, store_chat_in_faiss
+from fastapi.concurrency import run_in_threadpool
+from db.faiss_db import search_similar_messages, enqueue_chat_indexing
+from db.vector_executor import vector_executor
+from db.catalog_cache import get_catalog
+from db.doc_cache import doc_cache, get_cached_doc
+from services.llm_client import get_llm_client
 from datetime import datetime, timedelta
 import pytz
+import threading
 import time
+from collections import deque
 
 
 # 환경 변수 설정
 env_path = os.path.join(os.path.dirname(__file__), "..", ".env")
 load_dotenv(dotenv_path=env_path)
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY가 설정되지 않았습니다.")
+# ✅ Gemini 설정(GEMINI_API_KEY, GEMINI_MODEL)과 호출은 services.llm_client가 담당 (LLM_PROVIDER=fake면 키 없이 실행)
 
-genai.configure(api_key=GEMINI_API_KEY)
-db = firestore.client()
-GEMINI_MODEL = "gemini-2.0-flash-thinking-exp-01-21"
 
-def initialize_chat(user_id: str, charac_id: str, character_data: dict):
-    """🔥 채팅방이 존재하지 않으면 Firestore에 자동 생성"""
+class StreamStats:
+    """스트리밍 응답 통계: 첫 토큰까지 걸린 시간(TTFT)과 전체 생성 시간 (최근 window개로 분위수 계산)
+
+    끝난 스트림은 completed(끝까지 보냄) / failed(오류) / cancelled(클라이언트가 도중에 끊음) 중 하나로 센다.
+    """
+
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.ttft = deque(maxlen=window)
+        self.stats = {"started": 0, "completed": 0, "failed": 0, "cancelled": 0, "first_tokens": 0, "ttft_seconds": 0.0, "max_ttft_seconds": 0.0, "last_ttft_seconds": 0.0, "total_seconds": 0.0}
+
+    def record_start(self):
+        with self.lock:
+            self.stats["started"] += 1
+
+    def record_first_token(self, started):
+        ttft = time.perf_counter() - started
+        with self.lock:
+            self.ttft.append(ttft)
+            self.stats["first_tokens"] += 1
+            self.stats["ttft_seconds"] += ttft
+            self.stats["last_ttft_seconds"] = ttft
+            self.stats["max_ttft_seconds"] = max(self.stats["max_ttft_seconds"], ttft)
+
+    def record_end(self, started, outcome="completed"):
+        with self.lock:
+            self.stats[outcome] += 1
+            self.stats["total_seconds"] += time.perf_counter() - started
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            samples = sorted(self.ttft)
+        finished = stats["completed"] + stats["failed"] + stats["cancelled"]
+        stats["avg_ttft_seconds"] = stats["ttft_seconds"] / stats["first_tokens"] if stats["first_tokens"] else 0.0
+        stats["p50_ttft_seconds"] = samples[len(samples) // 2] if samples else 0.0
+        stats["p95_ttft_seconds"] = samples[min(int(len(samples) * 0.95), len(samples) - 1)] if samples else 0.0
+        stats["avg_total_seconds"] = stats["total_seconds"] / finished if finished else 0.0
+        return stats
+
+
+stream_stats = StreamStats()  # ✅ /status/metrics의 ai_stream
+
+class ChatContext:
+    """한 턴 동안 쓰는 Firestore 문서 묶음 (채팅방, 캐릭터, 사용자)
+
+    요청 처음에 load_chat_context()로 한 번에 읽어 initialize_chat → 프롬프트 구성까지 넘겨주므로
+    같은 문서를 다시 읽지 않는다. 문서 내용은 dict이고 없는 문서는 None.
+    """
+
+    def __init__(self, user_id: str, charac_id: str, chat_data, character_data, user_data):
+        self.user_id = user_id
+        self.charac_id = charac_id
+        self.chat_id = f"{user_id}-{charac_id}"
+        self.chat_exists = chat_data is not None
+        self.character = character_data  # ✅ 캐릭터가 삭제됐으면 None
+        self.user = user_data
+
+
+class ChatReadStats:
+    """턴마다 Firestore를 몇 번 왕복하며 얼마나 기다렸는지 (프롬프트 구성까지)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {"turns": 0, "round_trips": 0, "wait_seconds": 0.0}
+
+    def record(self, round_trips, wait):
+        with self.lock:
+            self.stats["round_trips"] += round_trips
+            self.stats["wait_seconds"] += wait
+
+    def record_turn(self):
+        with self.lock:
+            self.stats["turns"] += 1
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        turns = stats["turns"]
+        stats["avg_round_trips"] = stats["round_trips"] / turns if turns else 0.0
+        stats["avg_wait_seconds"] = stats["wait_seconds"] / turns if turns else 0.0
+        return stats
+
+
+chat_read_stats = ChatReadStats()  # ✅ /status/metrics의 chat_reads
+
+
+def load_chat_context(user_id: str, charac_id: str):
+    """🔥 채팅방/캐릭터/사용자 문서를 get_all로 한 번에 읽기 (Firestore 왕복 1번)
+
+    캐릭터/사용자 문서는 문서 캐시에 있으면 읽지 않고, 채팅방 문서(매 턴 바뀜)는 항상 읽는다.
+    """
+    chat_id = f"{user_id}-{charac_id}"
+
+    started = time.perf_counter()
+    docs = doc_cache.get_all([("characters", chat_id), ("users", user_id)], uncached=[("chats", chat_id)])
+    chat_read_stats.record_turn()
+    chat_read_stats.record(1, time.perf_counter() - started)
+
+    return ChatContext(user_id, charac_id, docs[f"chats/{chat_id}"], docs[f"characters/{chat_id}"], docs[f"users/{user_id}"])
+
+
+def initialize_chat(user_id: str, charac_id: str, character_data: dict, context: ChatContext = None):
+    """🔥 채팅방이 존재하지 않으면 Firestore에 자동 생성 (context가 있으면 이미 읽은 문서 사용)"""
 
     chat_id = f"{user_id}-{charac_id}"
     chat_ref = db.collection("chats").document(chat_id)
-    chat_doc = chat_ref.get()
+
+    if context is None:
+        chat_exists = chat_ref.get().exists
+        character_exists = get_cached_doc("characters", chat_id) is not None
+    else:
+        chat_exists = context.chat_exists
+        character_exists = context.character is not None
 
     # ✅ 채팅방이 존재하지 않고, 캐릭터가 삭제된 상태면 생성 안 함
-    character_ref = db.collection("characters").document(f"{user_id}-{charac_id}")
-    if not character_ref.get().exists:
+    if not character_exists:
         print(f"🚨 Character {charac_id} not found. Skipping chat creation.")
         return
 
@@ -45,7 +154,7 @@ def initialize_chat(user_id: str, charac_id: str, character_data: dict):
         }
 
     # ✅ 채팅방이 없을 경우에만 생성
-    if not chat_doc.exists:
+    if not chat_exists:
         chat_data = {
             "chat_id": chat_id,
             "user_id": user_id,
@@ -61,38 +170,20 @@ def initialize_chat(user_id: str, charac_id: str, character_data: dict):
 
         chat_ref.set(chat_data)
 
-        # ✅ 저장 후 Firestore에서 다시 확인
-        chat_doc = chat_ref.get()
-        chat_data_saved = chat_doc.to_dict()
-        # print(f"✅ Firestore 저장 확인: {chat_data_saved}")
-
-    # ✅ 채팅방이 없을 경우에만 생성
-    if not chat_doc.exists:
-        chat_data = {
-            "chat_id": chat_id,
-            "user_id": user_id,
-            "nickname": character_data.get("nickname", "이름 없음"),
-            "personality": character_data.get("personality", "default"),
-            "animaltype": character_data.get("animaltype", "미확인"),
-            "create_at": firestore.SERVER_TIMESTAMP,
-            "last_active_at": firestore.SERVER_TIMESTAMP,
-            "last_message": None
-        }
-
-        # 🚨 Firestore 저장 전 로그 확인
-        # print(f"🔥 Firestore 저장 직전 데이터: {chat_data}")
+        if context is not None:
+            context.chat_exists = True
 
-        chat_ref.set(chat_data)
 
 
+def get_character_data(user_id: str, charac_id: str, context: ChatContext = None):
+    """Firestore에서 캐릭터 데이터 가져오기 (characters 컬렉션 사용, context가 있으면 다시 읽지 않음)"""
 
-def get_character_data(user_id: str, charac_id: str):
-    """Firestore에서 캐릭터 데이터 가져오기 (characters 컬렉션 사용)"""
-    
-    character_ref = db.collection("characters").document(f"{user_id}-{charac_id}")
-    character_doc = character_ref.get()
+    if context is None:
+        character_data = get_cached_doc("characters", f"{user_id}-{charac_id}")
+    else:
+        character_data = context.character
 
-    if character_doc is None or not character_doc.exists:
+    if character_data is None:
         print(f"❌ Firestore: 캐릭터 정보 없음 → 기본값 사용 (user_id: {user_id}, charac_id: {charac_id})")
         return {
             "nickname": "이름 없음",
@@ -102,8 +193,6 @@ def get_character_data(user_id: str, charac_id: str):
             "speech_style": ""
         }
 
-    character_data = character_doc.to_dict()
-
     # ✅ animaltype 필드 기본값 설정
     animaltype = character_data.get("animaltype", "미확인")
 
@@ -121,12 +210,11 @@ def get_character_data(user_id: str, charac_id: str):
 
 
 def get_personality_data(personality_id: str):
-    """🔥 Firestore에서 성격 데이터를 가져오는 함수"""
+    """🔥 성격 데이터를 가져오는 함수 (personality_traits 기준 데이터 캐시에서 조회)"""
     try:
-        personality_ref = db.collection("personality_traits").document(personality_id)
-        personality_doc = personality_ref.get()
+        personality_data = get_catalog("personality_traits").get(personality_id)
 
-        if not personality_doc.exists:
+        if personality_data is None:
             print(f"⚠️ Firestore: personality_id={personality_id} 문서를 찾을 수 없음. 기본 데이터 사용.")
             return {
                 "description": "기본 성격",
@@ -138,7 +226,7 @@ def get_personality_data(personality_id: str):
                 "speech_style": "기본 말투"
             }
 
-        return personality_doc.to_dict()
+        return dict(personality_data)
 
     except Exception as e:
         print(f"🚨 Firestore에서 personality_id={personality_id} 데이터를 가져오는 중 오류 발생: {str(e)}")
@@ -178,41 +266,40 @@ def save_message(chat_id: str, sender: str, content: str, is_response=False):
     doc_ref = messages_ref.add(message_data)[1]
     return doc_ref
 
-def generate_ai_response(user_id: str, charac_id: str, user_input: str):
-    """🔥 RAG 기반 AI 응답 생성 (FAISS 벡터 검색 적용)"""
+def build_system_prompt(user_id: str, charac_id: str, user_input: str, context: ChatContext = None):
+    """🔥 캐릭터/사용자/성격 정보와 FAISS 검색 문맥으로 Gemini 프롬프트 구성 (캐릭터가 없으면 None)
+
+    context가 없으면 채팅방/캐릭터/사용자 문서를 한 번에 읽는다. 성격 데이터는 기준 데이터 캐시에서
+    가져오므로 평소에는 Firestore를 읽지 않는다 (캐시가 비었을 때는 벡터 검색과 동시에 읽음).
+    """
     chat_id = f"{user_id}-{charac_id}"  # ✅ 채팅방 ID
 
-    # ✅ Firestore에서 캐릭터 데이터 가져오기
-    character_ref = db.collection("characters").document(chat_id)
-    character_doc = character_ref.get()
+    # ✅ 캐릭터/사용자 데이터 (요청 처음에 읽은 문서 재사용)
+    if context is None:
+        context = load_chat_context(user_id, charac_id)
 
-    if not character_doc.exists:
-        return None, "Character data not found"
+    character_data = context.character
+    if character_data is None:
+        return None
 
-    character_data = character_doc.to_dict()
     personality_id = character_data.get("personality", "default")
     animaltype = character_data.get("animaltype", "알 수 없음")
     nickname = character_data.get("nickname", "이름 없음")
 
-    # ✅ Firestore에서 사용자 닉네임 가져오기
-    user_ref = db.collection("users").document(user_id)
-    user_doc = user_ref.get()
+    # ✅ 사용자 닉네임 (닉네임이나 사용자가 없으면 기본 user_id 사용)
+    user_nickname = (context.user or {}).get("user_nickname", user_id)
 
-    if user_doc.exists:
-        user_data = user_doc.to_dict()
-        user_nickname = user_data.get("user_nickname", user_id)  # 닉네임 없으면 기본 user_id 사용
-    else:
-        user_nickname = user_id  # 사용자가 없으면 기본값 설정
+    # ✅ 벡터 검색으로 문맥 가져오기 (채팅방별 FAISS 검색, 벡터 작업 전용 풀에서 실행)
+    search = vector_executor.submit(search_similar_messages, chat_id, charac_id, user_input, top_k=3)  # ✅ 인자 수정
 
-    # ✅ Firestore에서 성격(personality) 데이터 가져오기
+    # ✅ 검색이 도는 동안 성격(personality) 데이터 가져오기 (기준 데이터 캐시)
     personality_data = get_personality_data(personality_id)
 
     speech_style = personality_data.get("speech_style", "기본 말투")
     species_speech_pattern = personality_data.get("species_speech_pattern", {}).get(animaltype, "")
     emoji_style = personality_data.get("emoji_style", "")
 
-    # ✅ 벡터 검색으로 문맥 가져오기 (채팅방별 FAISS 검색)
-    similar_messages = search_similar_messages(chat_id, charac_id, user_input, top_k=3)  # ✅ 인자 수정
+    similar_messages = search.result()
 
     retrieved_context = "\n".join(similar_messages)
 
@@ -252,31 +339,107 @@ def generate_ai_response(user_id: str, charac_id: str, user_input: str):
     "{user_input}"
 
     """
+    return system_prompt
+
+def clean_ai_response(text: str):
+    """🔥 Gemini 응답 후처리 (인사말 제거, 공백 정리)"""
+    ai_response = text.strip()
+    ai_response = ai_response.replace("안녕하세요!", "").replace("반갑습니다!", "")
+    return ' '.join(ai_response.split())
+
+def finish_ai_turn(user_id: str, charac_id: str, user_input: str, ai_response: str):
+    """🔥 한 턴이 끝나면 사용자 메시지/AI 응답 저장 후 색인 예약"""
+    chat_id = f"{user_id}-{charac_id}"
+
+    # ✅ 사용자 메시지 Firestore 저장
+    save_message(chat_id, user_id, user_input)
+
+    # ✅ AI 응답 Firestore 저장 (1초 차이 적용)
+    save_message(chat_id, "AI", ai_response, is_response=True)  # 🔥 AI 응답은 1초 뒤로 설정
+
+    # ✅ FAISS 벡터 DB에 새로운 대화 저장 (채팅방별 색인 큐에 예약, 응답은 색인을 기다리지 않음)
+    enqueue_chat_indexing(chat_id, charac_id)
+
+async def generate_ai_response(user_id: str, charac_id: str, user_input: str, context: ChatContext = None):
+    """🔥 RAG 기반 AI 응답 생성 (FAISS 벡터 검색 적용)
+
+    Firestore 조회/저장과 벡터 검색은 스레드 풀에서, LLM 호출은 공유 비동기 클라이언트로 실행한다.
+    context: 라우트에서 이미 읽은 문서 (없으면 여기서 읽음)
+    """
+    system_prompt = await run_in_threadpool(build_system_prompt, user_id, charac_id, user_input, context)
+    if system_prompt is None:
+        return None, "Character data not found"
 
     try:
-        # ✅ Gemini API 호출
-        model = genai.GenerativeModel(GEMINI_MODEL)
-        response = model.generate_content([system_prompt])
+        # ✅ LLM 호출 (제한 시간/재시도 포함)
+        response = await get_llm_client().generate(system_prompt)
 
         if not response.text:
             return None, "Empty response from Gemini API"
 
         # ✅ AI 응답 처리
-        ai_response = response.text.strip()
-        ai_response = ai_response.replace("안녕하세요!", "").replace("반갑습니다!", "")
-        ai_response = ' '.join(ai_response.split())
+        ai_response = clean_ai_response(response.text)
 
-        # ✅ 사용자 메시지 Firestore 저장
-        save_message(chat_id, user_id, user_input)
-
-        # ✅ AI 응답 Firestore 저장 (1초 차이 적용)
-        save_message(chat_id, "AI", ai_response, is_response=True)  # 🔥 AI 응답은 1초 뒤로 설정
-
-        # ✅ FAISS 벡터 DB에 새로운 대화 저장 (채팅방별 저장)
-        store_chat_in_faiss(chat_id, charac_id)
+        await run_in_threadpool(finish_ai_turn, user_id, charac_id, user_input, ai_response)
 
         return ai_response, None
 
     except Exception as e:
         print(f"🚨 Error in generate_ai_response: {str(e)}")
-        return None, f"API Error: {str(e)}"
\ No newline at end of file
+        return None, f"API Error: {str(e)}"
+
+async def stream_ai_response(user_id: str, charac_id: str, user_input: str, context: ChatContext = None):
+    """🔥 generate_ai_response의 스트리밍 버전 (Gemini 토큰이 도착하는 대로 이벤트를 내보냄)
+
+    이벤트: ("token", 조각 텍스트) … ("done", 후처리한 전체 응답) 또는 ("error", 메시지)
+    조각은 Gemini가 보낸 그대로이고, 저장/색인은 스트림이 끝까지 간 뒤 후처리한 전체 응답으로 한 번만 한다
+    (클라이언트가 도중에 끊으면 저장하지 않음).
+    첫 토큰까지 걸린 시간(TTFT)은 요청 시작(프롬프트 구성 포함)부터 잰다.
+    """
+    started = time.perf_counter()
+    stream_stats.record_start()
+    outcome = "cancelled"  # ✅ 결과를 정하기 전에 빠져나가면(CancelledError/GeneratorExit) 클라이언트가 끊은 것
+
+    try:
+        system_prompt = await run_in_threadpool(build_system_prompt, user_id, charac_id, user_input, context)
+        if system_prompt is None:
+            outcome = "failed"
+            yield "error", "Character data not found"
+            return
+
+        chunks = []
+        try:
+            # ✅ LLM 스트리밍 호출 (첫 토큰 전까지만 재시도)
+            async for text in get_llm_client().stream(system_prompt):
+                if not chunks:
+                    stream_stats.record_first_token(started)
+                chunks.append(text)
+                yield "token", text
+
+            ai_response = clean_ai_response("".join(chunks))
+            if not ai_response:
+                outcome = "failed"
+                yield "error", "Empty response from Gemini API"
+                return
+
+            await run_in_threadpool(finish_ai_turn, user_id, charac_id, user_input, ai_response)
+            outcome = "completed"
+            yield "done", ai_response
+
+        except Exception as e:
+            print(f"🚨 Error in stream_ai_response: {str(e)}")
+            outcome = "failed"
+            yield "error", f"API Error: {str(e)}"
+    except Exception:
+        outcome = "failed"  # ✅ 프롬프트 구성 중 오류는 그대로 올려 보냄
+        raise
+    finally:
+        stream_stats.record_end(started, outcome)  # ✅ 어떻게 끝나든 한 번만 기록
+
+def get_stream_stats():
+    """스트리밍 응답 수와 첫 토큰까지 걸린 시간(TTFT) 통계 반환"""
+    return stream_stats.get_stats()
+
+def get_chat_read_stats():
+    """턴당 Firestore 왕복 횟수, 읽은 문서 수, 기다린 시간 통계 반환"""
+    return chat_read_stats.get_stats()
\ No newline at end of file
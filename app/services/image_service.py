@@ -8,6 +8,7 @@ import io
 from PIL import Image
 import random
 from core.firebase import db
+from db.doc_cache import get_cached_doc
 import routes.home.character_api as home_charac
 
 COMFYUI_SERVER_URL = "127.0.0.1:8188"  # ComfyUI 서버 URL
@@ -27,13 +28,11 @@ async def fetch_character_info(charac_id: str) -> dict:
     :return: {"animal_type": str, "appearance": str, "image_path": str}
     """
     # Firestore 컬렉션 'characters'에서 해당 캐릭터 문서를 조회
-    doc_ref = db.collection("characters").document(charac_id)
-    doc = doc_ref.get()
-    if not doc.exists:
+    data = get_cached_doc("characters", charac_id)
+    if data is None:
         raise ValueError(f"캐릭터 정보를 찾을 수 없습니다. (ID: {charac_id})")
-    print(doc.to_dict())
+    print(data)
 
-    data = doc.to_dict()
     return {
         "animal_type": data.get("animaltype"),
         "appearance": data.get("appearance"),
@@ -74,11 +73,9 @@ async def json_update(animal_type: str, appearance: str, image_path: str):
     return workflow_data
 
 async def get_character(character_id:str):
-    doc_ref = db.collection("characters").document(character_id)
-    doc = doc_ref.get()
-    if not doc.exists:
+    data = get_cached_doc("characters", character_id)
+    if data is None:
         raise ValueError(f"캐릭터 정보를 찾을 수 없습니다. (ID: {character_id})")
-    data = doc.to_dict()
     return data
 
 
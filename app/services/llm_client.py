@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+
+# 환경 변수 설정
+env_path = os.path.join(os.path.dirname(__file__), "..", ".env")
+load_dotenv(dotenv_path=env_path)
+
+# ✅ LLM 호출 설정 (환경 변수 우선)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")  # ✅ "gemini" | "fake" (오프라인 부하 테스트용)
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-thinking-exp-01-21")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))  # ✅ 호출 한 번의 제한 시간 (스트리밍은 첫 토큰까지)
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))  # ✅ 시간 초과/일시적 오류일 때 다시 시도하는 횟수
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))  # ✅ 재시도 대기 시간 기준 (시도마다 2배, 0 ~ 상한 사이 무작위)
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "4"))
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "300"))  # ✅ 가짜 제공자의 첫 토큰까지 지연 시간
+LLM_FAKE_TOKEN_MS = float(os.getenv("LLM_FAKE_TOKEN_MS", "20"))  # ✅ 가짜 제공자의 토큰 사이 지연 시간
+
+# ✅ 다시 시도할 만한 오류 (google.api_core 예외 이름, 패키지를 직접 import하지 않음)
+RETRYABLE_ERRORS = {"DeadlineExceeded", "ServiceUnavailable", "ResourceExhausted", "InternalServerError", "TooManyRequests", "Aborted"}
+
+
+class LLMResult:
+    """LLM 응답 텍스트와 토큰 수"""
+
+    def __init__(self, text, input_tokens=0, output_tokens=0):
+        self.text = text
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+
+class LLMProvider:
+    """LLM 제공자 인터페이스
+
+    generate()는 전체 응답을, stream()은 (텍스트 조각, 토큰 수 또는 None)을 비동기로 내보낸다.
+    토큰 수는 마지막 조각에만 (input_tokens, output_tokens)로 붙는다.
+    """
+
+    name = None
+
+    async def generate(self, prompt):
+        raise NotImplementedError
+
+    async def stream(self, prompt):
+        raise NotImplementedError
+        yield
+
+
+class GeminiProvider(LLMProvider):
+    """Gemini (google.generativeai) 제공자
+
+    GenerativeModel을 프로세스마다 한 번만 만들어 재사용한다. 비동기 호출은 SDK의 gRPC asyncio 채널
+    하나(HTTP/2 keep-alive, 요청 다중화)를 공유하므로 요청마다 연결을 새로 맺지 않는다.
+    """
+
+    name = "gemini"
+
+    def __init__(self, model_name=GEMINI_MODEL):
+        import google.generativeai as genai
+
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY가 설정되지 않았습니다.")
+        genai.configure(api_key=api_key)
+
+        self.model = genai.GenerativeModel(model_name)
+
+    def _usage(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        return (getattr(usage, "prompt_token_count", 0) or 0, getattr(usage, "candidates_token_count", 0) or 0)
+
+    async def generate(self, prompt):
+        response = await self.model.generate_content_async([prompt])
+        return LLMResult(response.text, *self._usage(response))
+
+    async def stream(self, prompt):
+        response = await self.model.generate_content_async([prompt], stream=True)
+        usage = (0, 0)
+        async for chunk in response:
+            usage = self._usage(chunk) if getattr(chunk, "usage_metadata", None) else usage
+            try:
+                text = chunk.text
+            except ValueError:
+                continue  # ✅ 텍스트가 없는 조각 (안전 필터 메타데이터 등)
+            if text:
+                yield text, None
+        yield "", usage
+
+
+class FakeProvider(LLMProvider):
+    """네트워크 없이 같은 프롬프트에는 항상 같은 답을 내는 가짜 제공자 (부하 테스트/로컬 실행용)
+
+    첫 토큰까지 latency_ms, 이후 토큰마다 token_ms만큼 기다린다. 토큰 = 공백으로 나눈 단어.
+    """
+
+    name = "fake"
+    REPLIES = [
+        "멍멍! 오늘도 같이 있어서 좋아 🐶",
+        "그랬구나! 더 이야기해 줄래? 🐾",
+        "나도 그거 좋아해! 다음에 또 하자 😊",
+        "음… 잘 모르겠지만 알려주면 꼭 기억할게!"
+    ]
+
+    def __init__(self, latency_ms=LLM_FAKE_LATENCY_MS, token_ms=LLM_FAKE_TOKEN_MS):
+        self.latency = latency_ms / 1000
+        self.token_delay = token_ms / 1000
+
+    def _reply(self, prompt):
+        digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=8).digest()
+        return self.REPLIES[int.from_bytes(digest, "little") % len(self.REPLIES)]
+
+    async def generate(self, prompt):
+        reply = self._reply(prompt)
+        words = reply.split()
+        await asyncio.sleep(self.latency + self.token_delay * max(len(words) - 1, 0))
+        return LLMResult(reply, len(prompt.split()), len(words))
+
+    async def stream(self, prompt):
+        words = self._reply(prompt).split()
+        await asyncio.sleep(self.latency)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            yield (" " if i else "") + word, None
+        yield "", (len(prompt.split()), len(words))
+
+
+class LLMClient:
+    """제공자 하나를 감싸 제한 시간, 재시도(지터 지수 백오프), 호출 통계를 더하는 비동기 클라이언트
+
+    스트리밍은 첫 토큰 전까지만 다시 시도한다 (이미 보낸 조각을 되돌릴 수 없으므로).
+    """
+
+    def __init__(self, provider, timeout=LLM_TIMEOUT_SECONDS, max_retries=LLM_MAX_RETRIES):
+        self.provider = provider
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=1000)  # ✅ 최근 호출 지연 시간 (분위수 계산용)
+        self.stats = {"calls": 0, "completed": 0, "failed": 0, "retries": 0, "timeouts": 0, "input_tokens": 0, "output_tokens": 0, "latency_seconds": 0.0}
+
+    def is_retryable(self, error):
+        return isinstance(error, asyncio.TimeoutError) or type(error).__name__ in RETRYABLE_ERRORS
+
+    async def backoff(self, attempt):
+        """재시도 전 대기 (full jitter: 0 ~ min(상한, 기준 × 2^시도) 사이 무작위)"""
+        with self.lock:
+            self.stats["retries"] += 1
+        await asyncio.sleep(random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt)))
+
+    def record(self, started, failed=False, timed_out=False, tokens=(0, 0)):
+        latency = time.perf_counter() - started
+        with self.lock:
+            self.stats["calls"] += 1
+            self.stats["failed" if failed else "completed"] += 1
+            self.stats["timeouts"] += timed_out
+            self.stats["input_tokens"] += tokens[0]
+            self.stats["output_tokens"] += tokens[1]
+            self.stats["latency_seconds"] += latency
+            self.latencies.append(latency)
+
+    async def generate(self, prompt, timeout=None):
+        """전체 응답 생성 (시도마다 timeout초 제한, 일시적 오류는 max_retries번까지 다시 시도)"""
+        timeout = timeout or self.timeout
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(self.provider.generate(prompt), timeout)
+            except Exception as e:
+                self.record(started, failed=True, timed_out=isinstance(e, asyncio.TimeoutError))
+                if attempt == self.max_retries or not self.is_retryable(e):
+                    raise
+                await self.backoff(attempt)
+                continue
+            self.record(started, tokens=(result.input_tokens, result.output_tokens))
+            return result
+
+    async def stream(self, prompt, timeout=None):
+        """텍스트 조각을 도착하는 대로 내보냄 (timeout은 첫 토큰까지의 제한 시간)"""
+        timeout = timeout or self.timeout
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            chunks = self.provider.stream(prompt).__aiter__()
+            try:
+                first = await asyncio.wait_for(chunks.__anext__(), timeout)
+            except StopAsyncIteration:
+                self.record(started)
+                return
+            except Exception as e:
+                await chunks.aclose()
+                self.record(started, failed=True, timed_out=isinstance(e, asyncio.TimeoutError))
+                if attempt == self.max_retries or not self.is_retryable(e):
+                    raise
+                await self.backoff(attempt)
+                continue
+            break
+
+        tokens = (0, 0)
+        try:
+            text, usage = first
+            while True:
+                if usage is not None:
+                    tokens = usage
+                if text:
+                    yield text
+                try:
+                    text, usage = await chunks.__anext__()
+                except StopAsyncIteration:
+                    break
+        except Exception:
+            self.record(started, failed=True, tokens=tokens)
+            raise
+        finally:
+            await chunks.aclose()  # ✅ 소비하는 쪽이 도중에 멈춰도 제공자 스트림을 닫음
+        self.record(started, tokens=tokens)
+
+    def get_stats(self):
+        """호출 수, 재시도/시간 초과 횟수, 토큰 수, 지연 시간 평균/p50/p95"""
+        with self.lock:
+            stats = dict(self.stats)
+            samples = sorted(self.latencies)
+        stats["provider"] = self.provider.name
+        stats["avg_latency_seconds"] = stats["latency_seconds"] / stats["calls"] if stats["calls"] else 0.0
+        stats["p50_latency_seconds"] = samples[len(samples) // 2] if samples else 0.0
+        stats["p95_latency_seconds"] = samples[min(int(len(samples) * 0.95), len(samples) - 1)] if samples else 0.0
+        return stats
+
+
+def get_provider(name=LLM_PROVIDER):
+    """설정에 맞는 LLM 제공자 생성"""
+    if name == "gemini":
+        return GeminiProvider()
+    if name == "fake":
+        return FakeProvider()
+    raise ValueError(f"알 수 없는 LLM_PROVIDER: {name}")
+
+
+llm_client = None  # ✅ 프로세스마다 처음 호출할 때 생성 (gRPC asyncio 채널은 fork 이전 것을 쓸 수 없음)
+llm_client_pid = None
+
+
+def get_llm_client():
+    """프로세스 전체가 공유하는 LLM 클라이언트"""
+    global llm_client, llm_client_pid
+    if llm_client is None or llm_client_pid != os.getpid():
+        llm_client = LLMClient(get_provider())
+        llm_client_pid = os.getpid()
+    return llm_client
+
+
+def get_llm_stats():
+    """LLM 호출 통계 (아직 호출 전이면 제공자 이름만)"""
+    if llm_client is None or llm_client_pid != os.getpid():
+        return {"provider": LLM_PROVIDER, "calls": 0}
+    return llm_client.get_stats()
@@ -0,0 +1,35 @@
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+# ✅ 서버처럼 app/ 기준으로 import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ✅ db/faiss, db/embedding_cache 등 상대 경로 파일이 작업 트리에 생기지 않도록 임시 디렉토리에서 실행
+os.chdir(tempfile.mkdtemp(prefix="animalgoback-tests-"))
+
+from benchmarks.memory_firestore import install_memory_firestore  # noqa: E402
+
+firestore_store = install_memory_firestore()  # ✅ db.faiss_db보다 먼저 설치
+
+
+@pytest.fixture
+def add_messages():
+    """chats/{chat_id}/messages에 메시지를 추가하는 함수 (메시지마다 다른 timestamp)"""
+    from firebase_admin import firestore
+
+    def add(chat_id, count, start=0):
+        messages = firestore_store.collection(f"chats/{chat_id}/messages")
+        for i in range(start, start + count):
+            messages.add({"content": f"메시지 {i}", "sender": "user", "timestamp": firestore.SERVER_TIMESTAMP})
+            time.sleep(0.001)
+    return add
+
+
+@pytest.fixture
+def memory_firestore():
+    """core.firebase.db가 쓰는 메모리 Firestore (문서 내용과 읽기/쓰기 횟수 확인용)"""
+    return firestore_store
@@ -0,0 +1,40 @@
+"""회원가입/로그인 API 테스트 (main과 같은 라우터와 경로, 메모리 Firestore 사용)"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes import login_router, register_router
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(register_router, prefix="/home")
+    app.include_router(login_router, prefix="/home")
+    return TestClient(app)
+
+
+def test_register_then_login(client, memory_firestore):
+    form = {"user_id": "auth-user1", "password": "pw1234", "confirm_password": "pw1234", "user_nickname": "민수"}
+    response = client.post("/home/register", data=form)
+    assert response.status_code == 200, response.text
+    assert memory_firestore.docs["users/auth-user1"]["user_nickname"] == "민수"
+
+    response = client.post("/home/register", data=form)
+    assert response.status_code == 500  # ✅ 중복 ID (라우트가 HTTPException을 500으로 감쌈)
+    assert "already exists" in response.json()["detail"]
+
+    response = client.post("/home/login", data={"user_id": "auth-user1", "password": "pw1234"})
+    assert response.status_code == 200, response.text
+    assert response.json()["user_nickname"] == "민수"
+    assert "last_login" in memory_firestore.docs["users/auth-user1"]
+
+
+def test_login_rejects_wrong_password_and_unknown_user(client):
+    client.post("/home/register", data={"user_id": "auth-user2", "password": "pw", "confirm_password": "pw", "user_nickname": "지수"})
+
+    response = client.post("/home/login", data={"user_id": "auth-user2", "password": "wrong"})
+    assert "Invalid password" in response.json()["detail"]
+
+    response = client.post("/home/login", data={"user_id": "auth-nobody", "password": "pw"})
+    assert "User not found" in response.json()["detail"]
@@ -0,0 +1,35 @@
+"""채팅방 프로필 저장소 테스트 (바뀐 슬롯만 저장, TTL/LRU 캐시)"""
+from db import chat_profiles
+from db.chat_profiles import ChatProfileStore
+
+
+def test_stale_worker_writes_only_changed_slots(memory_firestore):
+    chat_id = "user5-cat1"
+    ChatProfileStore().update(chat_id, {"이름": "철수"}, {})
+    worker_a, worker_b = ChatProfileStore(), ChatProfileStore()
+    worker_a.get(chat_id)
+    worker_b.get(chat_id)  # ✅ 둘 다 이름이 "철수"인 프로필을 캐시해 둠
+
+    worker_a.update(chat_id, {"이름": "민수"}, {})
+    assert worker_b.update(chat_id, {"취미": "등산"}, {"말투": "반말"}) == {"user.취미": "등산", "character.말투": "반말"}
+
+    doc = memory_firestore.collection(chat_profiles.PROFILE_COLLECTION).document(chat_id).get().to_dict()
+    assert doc["user"] == {"이름": "민수", "취미": "등산"}  # ✅ 다른 워커가 쓴 슬롯을 덮어쓰지 않음
+    assert doc["character"] == {"말투": "반말"}
+    worker_a.delete(chat_id)
+
+
+def test_cache_expires_and_evicts(memory_firestore, monkeypatch):
+    store = ChatProfileStore(max_entries=2, ttl=60)
+    store.update("chat-a", {"이름": "민수"}, {})
+    ChatProfileStore().update("chat-a", {"취미": "등산"}, {})  # ✅ 다른 워커의 쓰기
+    assert "취미" not in store.get("chat-a")["user"]  # ✅ TTL 안에서는 캐시 그대로
+
+    now = chat_profiles.time.monotonic()
+    monkeypatch.setattr(chat_profiles.time, "monotonic", lambda: now + 61)
+    assert store.get("chat-a")["user"] == {"이름": "민수", "취미": "등산"}
+
+    store.get("chat-b")
+    store.get("chat-c")
+    assert list(store.profiles) == ["chat-b", "chat-c"]  # ✅ 가장 오래 쓰지 않은 chat-a 제거
+    store.delete("chat-a")
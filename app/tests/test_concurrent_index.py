@@ -0,0 +1,57 @@
+"""같은 채팅방을 검색하는 동안 색인해도 캐시된 인덱스/문서를 제자리에서 바꾸지 않는지 테스트"""
+import threading
+
+import numpy as np
+import pytest
+
+from db import faiss_db
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_concurrent_search_and_store(monkeypatch, add_messages, mmap):
+    monkeypatch.setattr(faiss_db, "FAISS_MMAP", mmap)
+    monkeypatch.setattr(faiss_db, "FAISS_DELTA_MERGE_THRESHOLD", 8)  # ✅ 검색하는 동안 병합도 일어나도록
+    chat_id, charac_id = f"user3-dog{int(mmap)}", f"dog{int(mmap)}"
+    add_messages(chat_id, 20)
+    faiss_db.store_chat_in_faiss(chat_id, charac_id)
+    faiss_db.get_chat_index(chat_id)
+
+    # ✅ 검색 중인 스레드가 쥔 항목은 색인 뒤에도 그대로
+    held_index, held_docs = faiss_db.get_chat_index(chat_id)
+    held_count = held_index.ntotal
+    add_messages(chat_id, 5, start=20)
+    faiss_db.store_chat_in_faiss(chat_id, charac_id)
+    assert held_index.ntotal == held_count and len(held_docs) == held_count
+    index, docs = faiss_db.get_chat_index(chat_id)
+    assert index is not held_index and index.ntotal == len(docs) == held_count + 5
+
+    queries = np.random.default_rng(0).standard_normal((4, faiss_db.dimension)).astype(np.float32)
+    errors, stop = [], threading.Event()
+
+    def search():
+        try:
+            while not stop.is_set():
+                scores, labels, docs = faiss_db.search_chat_index(chat_id, queries, 5)
+                for label in labels.ravel():
+                    if label >= 0:
+                        assert label in docs
+                        docs[int(label)]
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=search) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        for turn in range(10):
+            add_messages(chat_id, 3, start=100 + turn * 3)
+            faiss_db.store_chat_in_faiss(chat_id, charac_id)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert not errors
+    index, docs = faiss_db.get_chat_index(chat_id)
+    assert index.ntotal == len(docs) == 55
+    faiss_db.delete_faiss_index(chat_id)
@@ -0,0 +1,50 @@
+"""임베딩 디스크 캐시 테스트 (여러 워커가 함께 쓰는 파일, 크기 제한)"""
+import os
+
+import numpy as np
+
+from db.embedding_cache import RECORD_SIZE, EmbeddingCache
+
+
+def encode(texts):
+    return np.array([[len(text), sum(map(ord, text)) % 997, 1, 0] for text in texts], dtype=np.float32)
+
+
+def disk_records(cache):
+    return os.path.getsize(cache.index_path) // RECORD_SIZE
+
+
+def test_workers_see_each_others_rows_and_do_not_append_twice(tmp_path):
+    worker_a = EmbeddingCache("model", 4, str(tmp_path), max_memory_items=0)
+    worker_b = EmbeddingCache("model", 4, str(tmp_path), max_memory_items=0)
+
+    worker_a.get_many(["안녕"], encode)
+    calls = []
+    worker_b.get_many(["안녕"], lambda texts: calls.append(texts) or encode(texts))
+    assert calls == []  # ✅ 다른 워커가 추가한 행을 읽어서 다시 인코딩하지 않음
+    assert worker_b.get_stats()["disk_hits"] == 1
+
+    # ✅ worker_b가 인코딩하는 사이 worker_a가 같은 키를 먼저 추가해도 디스크에는 한 번만 기록
+    def encode_racing(texts):
+        worker_a.get_many(texts, encode)
+        return encode(texts)
+
+    worker_b.get_many(["반가워"], encode_racing)
+    assert disk_records(worker_a) == 2
+    assert np.array_equal(EmbeddingCache("model", 4, str(tmp_path)).get_many(["반가워"], None), encode(["반가워"]))
+
+
+def test_disk_rows_are_capped(tmp_path):
+    worker_a = EmbeddingCache("model", 4, str(tmp_path), max_memory_items=0, max_disk_rows=4)
+    worker_b = EmbeddingCache("model", 4, str(tmp_path), max_memory_items=0, max_disk_rows=4)
+    worker_a.get_many(["가", "나", "다"], encode)
+    worker_b.get_many(["다"], None)  # ✅ 다시 작성하기 전 파일을 매핑해 둔 워커
+
+    worker_a.get_many(["라", "마", "바"], encode)  # ✅ 6행 > 4행: 최근 1행 + 새 3행만 남김
+    assert worker_a.get_stats()["disk_compactions"] == 1
+    assert disk_records(worker_a) == 4
+    assert os.path.getsize(worker_a.matrix_path) == 4 * 4 * 4
+
+    assert np.array_equal(worker_b.get_many(["다", "바"], None), encode(["다", "바"]))  # ✅ 다시 작성된 파일을 처음부터 읽음
+    assert worker_b.get_stats()["disk_items"] == 4
+    assert np.array_equal(worker_b.get_many(["가"], encode), encode(["가"]))
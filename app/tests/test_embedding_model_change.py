@@ -0,0 +1,27 @@
+"""임베딩 모델이 바뀐 채팅방 인덱스 테스트"""
+import os
+
+from db import faiss_db
+
+
+def test_model_change_forces_full_rebuild(monkeypatch, add_messages):
+    chat_id, charac_id = "user2-cat1", "cat1"
+    add_messages(chat_id, 5)
+    before = faiss_db.store_chat_in_faiss(chat_id, charac_id)
+    assert before["embedding_model"] == faiss_db.EMBEDDING_MODEL_NAME
+    assert before["dimension"] == faiss_db.dimension
+
+    monkeypatch.setattr(faiss_db, "EMBEDDING_MODEL_NAME", "other-model")
+    faiss_db.index_cache.pop(chat_id)
+
+    # ✅ 다른 모델의 벡터는 읽지 않음
+    index, docs = faiss_db.get_chat_index(chat_id)
+    assert index.ntotal == 0 and len(docs) == 0
+
+    after = faiss_db.store_chat_in_faiss(chat_id, charac_id)
+    assert after["embedding_model"] == "other-model"
+    assert after["generation"] == before["generation"] + 1
+    assert after["ntotal"] == 5
+    assert not os.path.exists(faiss_db.get_faiss_docs_path(chat_id, before["generation"]))
+
+    faiss_db.delete_faiss_index(chat_id)
@@ -0,0 +1,125 @@
+"""샤드 벡터 저장소 테스트 (삭제된 채팅방 벡터 정리, 샤드별 잠금)"""
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from db import faiss_shards
+from db.faiss_shards import ShardedVectorStore
+
+
+def add_chat(store, chat_id, count, seed):
+    vectors = np.random.default_rng(seed).standard_normal((count, 8)).astype(np.float32)
+    store.add(chat_id, vectors, [(f"{chat_id}-m{i}", f"{chat_id} 메시지 {i}") for i in range(count)])
+    return vectors
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_delete_compacts_shard_once_dead_ratio_is_reached(tmp_path, monkeypatch, mmap):
+    monkeypatch.setattr(faiss_shards, "FAISS_MMAP", mmap)
+    monkeypatch.setattr(faiss_shards, "FAISS_SHARD_MERGE_THRESHOLD", 16)
+    monkeypatch.setattr(faiss_shards, "FAISS_SHARD_COMPACT_MIN", 10)
+    monkeypatch.setattr(faiss_shards, "FAISS_SHARD_COMPACT_RATIO", 0.3)
+    root = str(tmp_path / "shards")
+    store = ShardedVectorStore(root, 8, num_shards=1)
+
+    add_chat(store, "chat-a", 12, seed=1)  # ✅ 병합되어 본 인덱스에 들어감
+    add_chat(store, "chat-b", 4, seed=2)
+    kept = add_chat(store, "chat-c", 6, seed=3)  # ✅ 델타에 남음
+    other_worker = ShardedVectorStore(root, 8, num_shards=1)
+    other_worker.search("chat-c", kept[:1], 1)  # ✅ 다시 작성하기 전 세대를 올려 둔 워커
+
+    store.delete("chat-b")  # ✅ 4 / 22: 아직 다시 작성하지 않음
+    assert store.dead_records(0) == (4, 22)
+    assert store.shards[0]["generation"] == 0
+
+    store.delete("chat-a")  # ✅ 16 / 22: 다시 작성
+    assert store.dead_records(0) == (0, 6)
+    shard = store.shards[0]
+    assert shard["generation"] == 1
+    assert len(shard["docs"]) == 6
+    assert not [name for name in os.listdir(root) if name.startswith("shard_0.") and not name.endswith(".lock") and ".g1." not in name]
+
+    for worker in (store, other_worker, ShardedVectorStore(root, 8, num_shards=1)):
+        _, labels, docs = worker.search("chat-c", kept, 1)
+        assert (labels[:, 0] - docs.lo).tolist() == list(range(6))
+        assert [text for _, text in docs.items()] == [f"chat-c 메시지 {i}" for i in range(6)]
+        assert len(worker.chat_docs("chat-a")) == 0
+
+    add_chat(store, "chat-a", 2, seed=4)  # ✅ 다시 작성한 세대에 이어서 추가
+    assert len(other_worker.chat_docs("chat-a")) == 2
+
+
+def test_hashes_and_message_ids_are_kept_next_to_sidecar(tmp_path, monkeypatch):
+    monkeypatch.setattr(faiss_shards, "FAISS_SHARD_MERGE_THRESHOLD", 10 ** 6)
+    monkeypatch.setattr(faiss_shards, "FAISS_SHARD_COMPACT_MIN", 1)
+    root = str(tmp_path / "shards")
+    store = ShardedVectorStore(root, 8, num_shards=1)
+    add_chat(store, "chat-a", 3, seed=1)
+    add_chat(store, "chat-b", 4, seed=2)
+    expected = [faiss_shards.text_hash(f"chat-b 메시지 {i}") for i in range(4)]
+
+    def no_rehash(text):
+        raise AssertionError("저장된 문서의 해시를 다시 계산함")
+
+    monkeypatch.setattr(faiss_shards, "text_hash", no_rehash)
+    other_worker = ShardedVectorStore(root, 8, num_shards=1)
+    ids, hashes = other_worker.chat_docs("chat-b").hashes()
+    assert hashes.tolist() == expected
+    assert other_worker.chat_docs("chat-b").find_message("chat-b-m2") == ids[2]
+    assert other_worker.chat_docs("chat-b").find_message("chat-a-m2") is None
+
+    store.delete("chat-a")  # ✅ 다시 작성한 세대에도 해시가 그대로 옮겨짐
+    assert store.shards[0]["generation"] == 1
+    for worker in (store, other_worker, ShardedVectorStore(root, 8, num_shards=1)):
+        docs = worker.chat_docs("chat-b")
+        assert docs.hashes()[1].tolist() == expected
+        assert docs.find_message("chat-b-m3") == ids[3]
+
+
+def test_busy_shard_does_not_block_other_shards(tmp_path, monkeypatch):
+    monkeypatch.setattr(faiss_shards, "FAISS_SHARD_MERGE_THRESHOLD", 8)
+    store = ShardedVectorStore(str(tmp_path / "shards"), 8, num_shards=2)
+    chats = {}
+    for i in range(20):
+        chats.setdefault(store._shard_of(f"chat-{i}"), f"chat-{i}")
+    busy_chat, free_chat = chats[0], chats[1]
+    add_chat(store, busy_chat, 4, seed=1)
+    kept = add_chat(store, free_chat, 4, seed=2)
+
+    # ✅ 한 샤드가 병합/다시 작성 중이어도 다른 샤드의 검색과 추가는 기다리지 않음
+    with store.shard_locks[0]:
+        done = threading.Event()
+
+        def use_free_shard():
+            store.search(free_chat, kept, 1)
+            add_chat(store, free_chat, 2, seed=3)
+            done.set()
+
+        worker = threading.Thread(target=use_free_shard)
+        worker.start()
+        assert done.wait(5)
+        worker.join()
+
+    errors = []
+
+    def search(chat_id, vectors):
+        try:
+            for _ in range(30):
+                _, labels, docs = store.search(chat_id, vectors, 1)
+                assert all(label in docs for label in labels[:, 0])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=search, args=(chat_id, kept)) for chat_id in (busy_chat, free_chat)]
+    for thread in threads:
+        thread.start()
+    for i in range(10):
+        add_chat(store, (busy_chat, free_chat)[i % 2], 3, seed=10 + i)  # ✅ 병합도 함께 일어남
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(store.chat_docs(busy_chat)) == 4 + 15
+    assert len(store.chat_docs(free_chat)) == 4 + 2 + 15
@@ -0,0 +1,39 @@
+"""FAISS 인덱스 LRU 캐시 테스트"""
+import faiss
+import numpy as np
+
+from db.index_cache import FaissIndexCache
+
+
+def make_index(count, dimension=4):
+    index = faiss.IndexFlatL2(dimension)
+    if count:
+        index.add(np.ones((count, dimension), dtype=np.float32))
+    return index
+
+
+def test_replacing_entry_does_not_call_on_evict():
+    evicted = []
+    cache = FaissIndexCache(max_bytes=10 ** 6, on_evict=evicted.append)
+
+    cache.put("chat-a", make_index(1), {0: "안녕"})
+    cache.put("chat-a", make_index(2), {0: "안녕", 1: "반가워"})
+
+    assert evicted == []
+    assert cache.get("chat-a")["index"].ntotal == 2
+    assert cache.bytes == cache.entries["chat-a"]["bytes"]  # ✅ 이전 항목 크기는 빠짐
+
+
+def test_on_evict_called_for_lru_and_invalidation():
+    evicted = []
+    one_entry = 2 * 16 + len("안녕".encode("utf-8"))
+    cache = FaissIndexCache(max_bytes=one_entry, on_evict=evicted.append)
+
+    cache.put("chat-a", make_index(2), {0: "안녕"})
+    cache.put("chat-b", make_index(2), {0: "안녕"})  # ✅ 한도 초과로 chat-a 제거
+    assert evicted == ["chat-a"]
+    assert cache.stats["evictions"] == 1
+
+    cache.invalidate("chat-b")
+    assert evicted == ["chat-a", "chat-b"]
+    assert cache.bytes == 0
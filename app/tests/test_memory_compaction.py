@@ -0,0 +1,34 @@
+"""대화 메모리 압축 테스트 (메모리 Firestore + 실제 FAISS 인덱스)"""
+from db import faiss_db
+
+
+def test_compaction_advances_checked_at(monkeypatch, add_messages):
+    monkeypatch.setattr(faiss_db, "CHAT_MEMORY_COMPACTION", True)
+    monkeypatch.setattr(faiss_db, "CHAT_MEMORY_RECENT_MESSAGES", 20)
+    monkeypatch.setattr(faiss_db, "CHAT_MEMORY_SUMMARY_CHUNK", 5)
+    monkeypatch.setattr(faiss_db, "CHAT_MEMORY_MAX_AGE_DAYS", 30)
+    chat_id, charac_id = "user1-dog1", "dog1"
+
+    add_messages(chat_id, 30)
+    faiss_db.index_chat_memory(chat_id, charac_id)
+    first = faiss_db.load_faiss_meta(chat_id)["compaction"]
+    assert first["runs"] == 1
+    assert first["checked_at"] is not None
+
+    add_messages(chat_id, 10, start=30)
+    faiss_db.index_chat_memory(chat_id, charac_id)
+    second = faiss_db.load_faiss_meta(chat_id)["compaction"]
+    assert second["runs"] == 2
+    assert second["checked_at"] > first["checked_at"]  # ✅ 다시 만든 인덱스의 메타에도 확인 시각이 저장됨
+
+    # ✅ 방금 확인했으므로 기간 기준 압축은 CHAT_MEMORY_CHECK_INTERVAL 동안 다시 돌지 않음
+    assert not faiss_db.memory_compaction_due(faiss_db.load_faiss_meta(chat_id))
+
+    faiss_db.delete_faiss_index(chat_id)
+
+
+def test_compaction_is_opt_in(monkeypatch):
+    monkeypatch.setattr(faiss_db, "CHAT_MEMORY_COMPACTION", False)
+    meta = faiss_db.new_faiss_meta()
+    meta["ntotal"] = 10 ** 6
+    assert not faiss_db.memory_compaction_due(meta)
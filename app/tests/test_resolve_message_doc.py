@@ -0,0 +1,31 @@
+"""메시지 ID → 문서 ID 조회 테스트 (중복 메시지는 대표 메시지의 문서)"""
+from db import faiss_db
+from db.doc_sidecar import DocSidecar
+
+
+def test_resolve_message_doc_reads_only_new_records(monkeypatch, add_messages, memory_firestore):
+    chat_id, charac_id = "user4-dog1", "dog1"
+    add_messages(chat_id, 6)
+    add_messages(chat_id, 2)  # ✅ "메시지 0", "메시지 1"과 같은 문장 → 저장하지 않고 대표 메시지로 기록
+    faiss_db.store_chat_in_faiss(chat_id, charac_id)
+
+    messages = memory_firestore.collection(f"chats/{chat_id}/messages")
+    message_ids = [doc.id for doc in messages.order_by("timestamp").stream()]
+    _, docs = faiss_db.get_chat_index(chat_id)
+    for position, message_id in enumerate(message_ids):
+        assert docs[faiss_db.resolve_message_doc(chat_id, message_id)] == f"메시지 {position % 6}"
+    assert faiss_db.resolve_message_doc(chat_id, "없는 메시지") is None
+
+    reads = []
+    original = DocSidecar.get_message_id
+    monkeypatch.setattr(DocSidecar, "get_message_id", lambda self, doc_id: reads.append(doc_id) or original(self, doc_id))
+    faiss_db.resolve_message_doc(chat_id, message_ids[3])
+    assert reads == []  # ✅ 이미 읽은 문서는 다시 훑지 않음
+
+    add_messages(chat_id, 2, start=6)
+    faiss_db.store_chat_in_faiss(chat_id, charac_id)
+    new_id = [doc.id for doc in messages.order_by("timestamp").stream()][-1]
+    reads.clear()
+    assert faiss_db.get_chat_index(chat_id)[1][faiss_db.resolve_message_doc(chat_id, new_id)] == "메시지 7"
+    assert reads == [6, 7]  # ✅ 늘어난 문서만 이어서 읽음
+    faiss_db.delete_faiss_index(chat_id)
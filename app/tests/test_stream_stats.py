@@ -0,0 +1,45 @@
+"""스트리밍 응답 통계 테스트 (클라이언트가 도중에 끊은 스트림도 끝난 것으로 기록)"""
+import asyncio
+
+from services import chat_service
+
+
+class TokenStream:
+    async def stream(self, prompt):
+        yield "안녕"
+        await asyncio.sleep(10)  # ✅ 다음 토큰을 기다리는 동안 취소됨
+        yield "하세요"
+
+
+def test_disconnected_stream_is_recorded_as_cancelled(monkeypatch):
+    stats = chat_service.StreamStats()
+    monkeypatch.setattr(chat_service, "stream_stats", stats)
+    monkeypatch.setattr(chat_service, "build_system_prompt", lambda *args: "프롬프트")
+    monkeypatch.setattr(chat_service, "get_llm_client", TokenStream)
+
+    async def disconnect_after_first_token():
+        events = chat_service.stream_ai_response("user1", "dog1", "안녕")
+        assert await events.__anext__() == ("token", "안녕")
+        await events.aclose()  # ✅ 웹소켓이 끊기면 GeneratorExit
+
+    async def cancel_while_streaming():
+        async def consume():
+            async for _ in chat_service.stream_ai_response("user1", "dog1", "안녕"):
+                pass
+
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(disconnect_after_first_token())
+    asyncio.run(cancel_while_streaming())
+
+    result = stats.get_stats()
+    assert result["started"] == 2
+    assert result["cancelled"] == 2
+    assert result["completed"] == result["failed"] == 0
+    assert result["avg_total_seconds"] > 0